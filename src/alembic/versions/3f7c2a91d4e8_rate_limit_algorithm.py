@@ -0,0 +1,26 @@
+"""rate_limit_algorithm
+
+Revision ID: 3f7c2a91d4e8
+Revises: eae5d699dd99
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f7c2a91d4e8'
+down_revision: Union[str, None] = 'eae5d699dd99'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('rate_limit', sa.Column('algorithm', sa.String(), server_default='fixed_window', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('rate_limit', 'algorithm')
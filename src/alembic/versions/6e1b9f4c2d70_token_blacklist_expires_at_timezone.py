@@ -0,0 +1,39 @@
+"""token_blacklist_expires_at_timezone
+
+Revision ID: 6e1b9f4c2d70
+Revises: d5a7e3c19b42
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1b9f4c2d70'
+down_revision: Union[str, None] = 'd5a7e3c19b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The naive times were written in the local time of the server, read here in the session time zone.
+    op.alter_column(
+        'token_blacklist',
+        'expires_at',
+        existing_type=sa.DateTime(),
+        type_=sa.DateTime(timezone=True),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'token_blacklist',
+        'expires_at',
+        existing_type=sa.DateTime(timezone=True),
+        type_=sa.DateTime(),
+        existing_nullable=False,
+    )
@@ -0,0 +1,40 @@
+"""token_blacklist_hash
+
+Revision ID: 8c4d2b6f1a37
+Revises: 3f7c2a91d4e8
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4d2b6f1a37'
+down_revision: Union[str, None] = '3f7c2a91d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('token_blacklist', sa.Column('token_hash', sa.String(length=64), nullable=True))
+    op.execute("UPDATE token_blacklist SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex')")
+    op.alter_column('token_blacklist', 'token_hash', existing_type=sa.String(length=64), nullable=False)
+    op.drop_index(op.f('ix_token_blacklist_token'), table_name='token_blacklist')
+    op.drop_column('token_blacklist', 'token')
+    op.create_index(op.f('ix_token_blacklist_token_hash'), 'token_blacklist', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_token_blacklist_expires_at'), 'token_blacklist', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    # Tokens cannot be recovered from their hash: the rows are kept with the hash in place of the token, so they
+    # no longer match any token and only wait for their expiration.
+    op.add_column('token_blacklist', sa.Column('token', sa.String(), nullable=True))
+    op.execute("UPDATE token_blacklist SET token = token_hash")
+    op.alter_column('token_blacklist', 'token', existing_type=sa.String(), nullable=False)
+    op.drop_index(op.f('ix_token_blacklist_expires_at'), table_name='token_blacklist')
+    op.drop_index(op.f('ix_token_blacklist_token_hash'), table_name='token_blacklist')
+    op.drop_column('token_blacklist', 'token_hash')
+    op.create_index(op.f('ix_token_blacklist_token'), 'token_blacklist', ['token'], unique=True)
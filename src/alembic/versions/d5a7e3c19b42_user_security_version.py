@@ -0,0 +1,26 @@
+"""user_security_version
+
+Revision ID: d5a7e3c19b42
+Revises: 8c4d2b6f1a37
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a7e3c19b42'
+down_revision: Union[str, None] = '8c4d2b6f1a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('security_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'security_version')
@@ -1,79 +1,41 @@
 from typing import Annotated, Any
 
-from fastapi import Depends, HTTPException, Request
+from fastapi import Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..core.config import settings
 from ..core.db.database import async_get_db
-from ..core.exceptions.http_exceptions import ForbiddenException, RateLimitException, UnauthorizedException
+from ..core.exceptions.http_exceptions import ForbiddenException, UnauthorizedException
 from ..core.logger import logging
-from ..core.security import oauth2_scheme, verify_token
-from ..core.utils.rate_limit import is_rate_limited
-from ..crud.crud_rate_limit import crud_rate_limits
-from ..crud.crud_tier import crud_tiers
-from ..crud.crud_users import crud_users
-from ..models.user import User
-from ..schemas.rate_limit import sanitize_path
+from ..core.security import Principal, get_principal, oauth2_scheme, resolve_principal
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_LIMIT = settings.DEFAULT_RATE_LIMIT_LIMIT
-DEFAULT_PERIOD = settings.DEFAULT_RATE_LIMIT_PERIOD
-
 
 async def get_current_user(
-        token: Annotated[str, Depends(oauth2_scheme)], db: Annotated[AsyncSession, Depends(async_get_db)]
+        request: Request,
+        token: Annotated[str, Depends(oauth2_scheme)],
+        db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, Any] | None:
-    token_data = await verify_token(token, db)
-    if token_data is None:
+    principal = get_principal(request.scope)
+    if principal.token != token:
+        principal = Principal(token)
+
+    user = await resolve_principal(principal, db)
+    if user is None:
         logger.error("User not authenticated.")
         raise UnauthorizedException("User not authenticated.")
 
-    # help me debug logging, my mental health depends on u
-    logger.debug(f"Token data: {token_data}")
-    logger.debug(f"Token data type: {type(token_data)}")
-
-    identifier = token_data.username_or_email
-    logger.debug(f"Extracted identifier: {identifier}")
-    logger.debug(f"User {identifier} authenticated.")
-
-    if identifier.isdigit():  # Проверка на ИНН
-        logger.debug("Trying to get user by INN")
-        user = await crud_users.get(db=db, inn=identifier, is_deleted=False)
-    elif "@" in identifier:  # Проверка на email
-        logger.debug("Trying to get user by email")
-        user = await crud_users.get(db=db, email=identifier, is_deleted=False)
-    else:  # Считаем что это username
-        logger.debug("Trying to get user by username")
-        user = await crud_users.get(db=db, username=identifier, is_deleted=False)
-
-    if user:
-        logger.debug(f"Found user: {user}")
-        return user
-    logger.error("User not found.")
-    raise UnauthorizedException("User not authenticated.")
+    logger.debug(f"User {principal.token_data.username_or_email} authenticated.")  # type: ignore
+    return user
 
 
 async def get_optional_user(request: Request, db: AsyncSession = Depends(async_get_db)) -> dict | None:
-    token = request.headers.get("Authorization")
-    if not token:
+    principal = get_principal(request.scope)
+    if principal.token is None:
         return None
 
     try:
-        token_type, _, token_value = token.partition(" ")
-        if token_type.lower() != "bearer" or not token_value:
-            return None
-
-        token_data = await verify_token(token_value, db)
-        if token_data is None:
-            return None
-
-        return await get_current_user(token_value, db=db)
-
-    except HTTPException as http_exc:
-        if http_exc.status_code != 401:
-            logger.error(f"Unexpected HTTPException in get_optional_user: {http_exc.detail}")
-        return None
+        return await resolve_principal(principal, db)
 
     except Exception as exc:
         logger.error(f"Unexpected error in get_optional_user: {exc}")
@@ -85,33 +47,3 @@ async def get_current_superuser(current_user: Annotated[dict, Depends(get_curren
         raise ForbiddenException("You do not have enough privileges.")
 
     return current_user
-
-
-async def rate_limiter(
-        request: Request, db: Annotated[AsyncSession, Depends(async_get_db)],
-        user: User | None = Depends(get_optional_user)
-) -> None:
-    path = sanitize_path(request.url.path)
-    if user:
-        user_id = user["id"]
-        tier = await crud_tiers.get(db, id=user["tier_id"])
-        if tier:
-            rate_limit = await crud_rate_limits.get(db=db, tier_id=tier["id"], path=path)
-            if rate_limit:
-                limit, period = rate_limit["limit"], rate_limit["period"]
-            else:
-                logger.warning(
-                    f"User {user_id} with tier '{tier['name']}' has no specific rate limit for path '{path}'. \
-                        Applying default rate limit."
-                )
-                limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
-        else:
-            logger.warning(f"User {user_id} has no assigned tier. Applying default rate limit.")
-            limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
-    else:
-        user_id = request.client.host
-        limit, period = DEFAULT_LIMIT, DEFAULT_PERIOD
-
-    is_limited = await is_rate_limited(db=db, user_id=user_id, path=path, limit=limit, period=period)
-    if is_limited:
-        raise RateLimitException("Rate limit exceeded.")
@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 
+from .jwks import router as jwks_router
 from .login import router as login_router
 from .logout import router as logout_router
+from .metrics import router as metrics_router
 from .posts import router as posts_router
 from .rate_limits import router as rate_limits_router
 from .tasks import router as tasks_router
@@ -17,6 +19,7 @@ from .docs.passport import router as passport
 
 router = APIRouter(prefix="/v1")
 router.include_router(login_router)
+router.include_router(jwks_router)
 router.include_router(logout_router)
 router.include_router(users_router)
 router.include_router(posts_router)
@@ -29,3 +32,4 @@ router.include_router(news_router)
 router.include_router(startup)
 router.include_router(grants)
 router.include_router(passport)
+router.include_router(metrics_router)
@@ -0,0 +1,23 @@
+from typing import Any
+
+from fastapi import APIRouter, Request
+
+from ...core import security
+from ...core.config import settings
+from ...middleware.client_cache_middleware import cache_control
+
+router = APIRouter(tags=["login"])
+
+
+@router.get("/.well-known/jwks.json")
+@cache_control("public", max_age=settings.JWKS_MAX_AGE)
+async def read_jwks(request: Request) -> dict[str, list[dict[str, Any]]]:
+    """Public keys verifying the tokens of this service, as a JSON Web Key Set.
+
+    Other services verify tokens locally with these keys, picked by the `kid` header of the token. The set is
+    empty when tokens are signed with a shared secret (`ALGORITHM` HS256), which is never published.
+    """
+    if security.signing_keys is None:
+        return {"keys": []}
+
+    return security.signing_keys.jwks()
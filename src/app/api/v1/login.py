@@ -9,8 +9,11 @@ from ...core.config import settings
 from ...core.db.database import async_get_db
 from ...core.exceptions.http_exceptions import UnauthorizedException
 from ...core.schemas import Token, AnonymousSessionResponse, AnonymousSession
+from ...crud.crud_users import crud_users
 from ...core.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_TYPE,
+    access_token_claims,
     authenticate_user,
     create_access_token,
     create_refresh_token,
@@ -30,12 +33,8 @@ async def login_for_access_token(
     if not user:
         raise UnauthorizedException("Wrong credentials")
 
-    # Используем id для sub в токене вместо username
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = await create_access_token(
-        data={"sub": str(user.get('username') if user.get('username') else user.get('inn'))},
-        expires_delta=access_token_expires
-    )
+    access_token = await create_access_token(data=access_token_claims(user), expires_delta=access_token_expires)
 
     refresh_token = await create_refresh_token(data={"sub": str(user["id"])})
     max_age = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
@@ -72,8 +71,13 @@ async def refresh_access_token(request: Request, db: AsyncSession = Depends(asyn
         raise UnauthorizedException("Refresh token missing.")
 
     user_data = await verify_token(refresh_token, db)
-    if not user_data:
+    if not user_data or user_data.token_type != REFRESH_TOKEN_TYPE or not user_data.username_or_email.isdigit():
+        raise UnauthorizedException("Invalid refresh token.")
+
+    # The subject of refresh tokens is the user ID (see `login_for_access_token`).
+    user = await crud_users.get(db=db, id=int(user_data.username_or_email), is_deleted=False)
+    if user is None:
         raise UnauthorizedException("Invalid refresh token.")
 
-    new_access_token = await create_access_token(data={"sub": user_data.username_or_email})
+    new_access_token = await create_access_token(data=access_token_claims(user))
     return {"access_token": new_access_token, "token_type": "bearer"}
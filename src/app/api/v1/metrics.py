@@ -0,0 +1,30 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, Request
+
+from ...api.dependencies import get_current_superuser
+from ...core.utils import cache, rate_limit
+
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(get_current_superuser)])
+
+
+@router.get("/cache")
+async def read_cache_metrics(request: Request) -> dict[str, dict[str, Any]]:
+    """Cache hit/miss counts, Redis latency and payload size histograms per `key_prefix` template.
+
+    Counts are totals across all workers since the last reset, and include up to `CACHE_METRICS_FLUSH_INTERVAL`
+    seconds of lag for the workers other than the one serving this request.
+    """
+    return await cache.metrics_report()
+
+
+@router.delete("/cache")
+async def reset_cache_metrics(request: Request) -> dict[str, str]:
+    await cache.metrics.reset(cache.client, cache.breaker)  # type: ignore
+    return {"message": "Cache metrics reset"}
+
+
+@router.get("/breakers")
+async def read_circuit_breakers(request: Request) -> dict[str, dict[str, Any]]:
+    """State of the circuit breakers in front of the cache and rate limiter Redis instances, for this worker."""
+    return {"cache": cache.breaker.snapshot(), "rate_limit": rate_limit.breaker.snapshot()}
@@ -1,19 +1,22 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ....core.db.database import async_get_db
-from ....crud.pased_data.grant import crud_grant
+from ....core.utils import cached_reads
+from ....middleware.client_cache_middleware import cache_control
 
 router = APIRouter(prefix="/parsed_data", tags=["grants"])
 
 
 @router.get("/grants/")
+@cache_control("private", max_age=60)
 async def get_grants(
+        request: Request,
         db: Annotated[AsyncSession, Depends(async_get_db)],
         # skip: int = 0,
         # limit: int = 100
 ):
     # return await crud_grant.get(db, skip=skip, limit=limit)
-    return await crud_grant.get_multi(db)
+    return await cached_reads.read_grants(request, db=db)
@@ -1,15 +1,17 @@
-from typing import Annotated, Any
+from typing import Annotated
 
 from fastapi import APIRouter, Depends, Request
-from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
+from fastcrud.paginated import PaginatedListResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
 from ...core.exceptions.http_exceptions import ForbiddenException, NotFoundException
-from ...core.utils.cache import cache
+from ...core.utils import cached_reads
+from ...core.utils.cache import cache, invalidate_keys, invalidate_tags
+from ...core.utils.user_cache import get_user
 from ...crud.crud_posts import crud_posts
-from ...crud.crud_users import crud_users
+from ...middleware.client_cache_middleware import cache_control
 from ...schemas.post import PostCreate, PostCreateInternal, PostRead, PostUpdate
 from ...schemas.user import UserRead
 
@@ -24,7 +26,7 @@ async def write_post(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> PostRead:
-    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
     if db_user is None:
         raise NotFoundException("User not found")
 
@@ -36,15 +38,13 @@ async def write_post(
 
     post_internal = PostCreateInternal(**post_internal_dict)
     created_post: PostRead = await crud_posts.create(db=db, object=post_internal)
+    await invalidate_tags(f"{username}_posts")
+    await invalidate_keys(f"{username}_post_cache:{created_post.id}")
     return created_post
 
 
 @router.get("/{username}/posts", response_model=PaginatedListResponse[PostRead])
-@cache(
-    key_prefix="{username}_posts:page_{page}:items_per_page:{items_per_page}",
-    resource_id_name="username",
-    expiration=60,
-)
+@cache_control("public")
 async def read_posts(
     request: Request,
     username: str,
@@ -52,43 +52,19 @@ async def read_posts(
     page: int = 1,
     items_per_page: int = 10,
 ) -> dict:
-    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
-    if not db_user:
-        raise NotFoundException("User not found")
-
-    posts_data = await crud_posts.get_multi(
-        db=db,
-        offset=compute_offset(page, items_per_page),
-        limit=items_per_page,
-        schema_to_select=PostRead,
-        created_by_user_id=db_user["id"],
-        is_deleted=False,
-    )
-
-    response: dict[str, Any] = paginated_response(crud_data=posts_data, page=page, items_per_page=items_per_page)
-    return response
+    return await cached_reads.read_posts(request, username=username, db=db, page=page, items_per_page=items_per_page)
 
 
 @router.get("/{username}/post/{id}", response_model=PostRead)
-@cache(key_prefix="{username}_post_cache", resource_id_name="id")
+@cache_control("public")
 async def read_post(
     request: Request, username: str, id: int, db: Annotated[AsyncSession, Depends(async_get_db)]
 ) -> dict:
-    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
-    if db_user is None:
-        raise NotFoundException("User not found")
-
-    db_post: PostRead | None = await crud_posts.get(
-        db=db, schema_to_select=PostRead, id=id, created_by_user_id=db_user["id"], is_deleted=False
-    )
-    if db_post is None:
-        raise NotFoundException("Post not found")
-
-    return db_post
+    return await cached_reads.read_post(request, username=username, id=id, db=db)
 
 
 @router.patch("/{username}/post/{id}")
-@cache("{username}_post_cache", resource_id_name="id", pattern_to_invalidate_extra=["{username}_posts:*"])
+@cache("{username}_post_cache", resource_id_name="id", tags_to_invalidate=["{username}_posts"])
 async def patch_post(
     request: Request,
     username: str,
@@ -97,7 +73,7 @@ async def patch_post(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
     if db_user is None:
         raise NotFoundException("User not found")
 
@@ -113,7 +89,7 @@ async def patch_post(
 
 
 @router.delete("/{username}/post/{id}")
-@cache("{username}_post_cache", resource_id_name="id", to_invalidate_extra={"{username}_posts": "{username}"})
+@cache("{username}_post_cache", resource_id_name="id", tags_to_invalidate=["{username}_posts"])
 async def erase_post(
     request: Request,
     username: str,
@@ -121,7 +97,7 @@ async def erase_post(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
     if db_user is None:
         raise NotFoundException("User not found")
 
@@ -138,11 +114,11 @@ async def erase_post(
 
 
 @router.delete("/{username}/db_post/{id}", dependencies=[Depends(get_current_superuser)])
-@cache("{username}_post_cache", resource_id_name="id", to_invalidate_extra={"{username}_posts": "{username}"})
+@cache("{username}_post_cache", resource_id_name="id", tags_to_invalidate=["{username}_posts"])
 async def erase_db_post(
     request: Request, username: str, id: int, db: Annotated[AsyncSession, Depends(async_get_db)]
 ) -> dict[str, str]:
-    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
     if db_user is None:
         raise NotFoundException("User not found")
 
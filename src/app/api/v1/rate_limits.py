@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ...api.dependencies import get_current_superuser
 from ...core.db.database import async_get_db
 from ...core.exceptions.http_exceptions import DuplicateValueException, NotFoundException, RateLimitException
+from ...core.utils.rate_limit_rules import bump_rules_version
 from ...crud.crud_rate_limit import crud_rate_limits
 from ...crud.crud_tier import crud_tiers
 from ...schemas.rate_limit import RateLimitCreate, RateLimitCreateInternal, RateLimitRead, RateLimitUpdate
@@ -31,6 +32,7 @@ async def write_rate_limit(
 
     rate_limit_internal = RateLimitCreateInternal(**rate_limit_internal_dict)
     created_rate_limit: RateLimitRead = await crud_rate_limits.create(db=db, object=rate_limit_internal)
+    await bump_rules_version()
     return created_rate_limit
 
 
@@ -100,6 +102,7 @@ async def patch_rate_limit(
         raise DuplicateValueException("There is already a rate limit with this name")
 
     await crud_rate_limits.update(db=db, object=values, id=db_rate_limit["id"])
+    await bump_rules_version()
     return {"message": "Rate Limit updated"}
 
 
@@ -116,4 +119,5 @@ async def erase_rate_limit(
         raise NotFoundException("Rate Limit not found")
 
     await crud_rate_limits.delete(db=db, id=db_rate_limit["id"])
+    await bump_rules_version()
     return {"message": "Rate Limit deleted"}
@@ -1,16 +1,17 @@
 from typing import Any
 
 from arq.jobs import Job as ArqJob
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
 
-from ...api.dependencies import rate_limiter
 from ...core.utils import queue
+from ...middleware.rate_limit_middleware import rate_limited
 from ...schemas.job import Job
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
-@router.post("/task", response_model=Job, status_code=201, dependencies=[Depends(rate_limiter)])
+@router.post("/task", response_model=Job, status_code=201)
+@rate_limited
 async def create_task(message: str) -> dict[str, str]:
     """Create a new background task.
 
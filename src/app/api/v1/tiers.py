@@ -1,13 +1,17 @@
-from typing import Annotated, Any
+from typing import Annotated
 
 from fastapi import APIRouter, Depends, Request
-from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
+from fastcrud.paginated import PaginatedListResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser
 from ...core.db.database import async_get_db
 from ...core.exceptions.http_exceptions import DuplicateValueException, NotFoundException
+from ...core.utils import cached_reads
+from ...core.utils.cache import cache, invalidate_keys, invalidate_tags
+from ...core.utils.rate_limit_rules import bump_rules_version
 from ...crud.crud_tier import crud_tiers
+from ...middleware.client_cache_middleware import cache_control
 from ...schemas.tier import TierCreate, TierCreateInternal, TierRead, TierUpdate
 
 router = APIRouter(tags=["tiers"])
@@ -24,31 +28,28 @@ async def write_tier(
 
     tier_internal = TierCreateInternal(**tier_internal_dict)
     created_tier: TierRead = await crud_tiers.create(db=db, object=tier_internal)
+    await invalidate_keys(f"tier:{tier_internal.name}")
+    await invalidate_tags("tiers")
+    await bump_rules_version()
     return created_tier
 
 
 @router.get("/tiers", response_model=PaginatedListResponse[TierRead])
+@cache_control("public")
 async def read_tiers(
     request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], page: int = 1, items_per_page: int = 10
 ) -> dict:
-    tiers_data = await crud_tiers.get_multi(
-        db=db, offset=compute_offset(page, items_per_page), limit=items_per_page, schema_to_select=TierRead
-    )
-
-    response: dict[str, Any] = paginated_response(crud_data=tiers_data, page=page, items_per_page=items_per_page)
-    return response
+    return await cached_reads.read_tiers(request, db=db, page=page, items_per_page=items_per_page)
 
 
 @router.get("/tier/{name}", response_model=TierRead)
+@cache_control("public")
 async def read_tier(request: Request, name: str, db: Annotated[AsyncSession, Depends(async_get_db)]) -> dict:
-    db_tier: TierRead | None = await crud_tiers.get(db=db, schema_to_select=TierRead, name=name)
-    if db_tier is None:
-        raise NotFoundException("Tier not found")
-
-    return db_tier
+    return await cached_reads.read_tier(request, name=name, db=db)
 
 
 @router.patch("/tier/{name}", dependencies=[Depends(get_current_superuser)])
+@cache(key_prefix="tier", resource_id_name="name", tags_to_invalidate=["tiers"])
 async def patch_tier(
     request: Request, values: TierUpdate, name: str, db: Annotated[AsyncSession, Depends(async_get_db)]
 ) -> dict[str, str]:
@@ -57,14 +58,19 @@ async def patch_tier(
         raise NotFoundException("Tier not found")
 
     await crud_tiers.update(db=db, object=values, name=name)
+    if values.name is not None and values.name != name:
+        await invalidate_keys(f"tier:{values.name}")
+    await bump_rules_version()
     return {"message": "Tier updated"}
 
 
 @router.delete("/tier/{name}", dependencies=[Depends(get_current_superuser)])
+@cache(key_prefix="tier", resource_id_name="name", tags_to_invalidate=["tiers"])
 async def erase_tier(request: Request, name: str, db: Annotated[AsyncSession, Depends(async_get_db)]) -> dict[str, str]:
     db_tier = await crud_tiers.get(db=db, schema_to_select=TierRead, name=name)
     if db_tier is None:
         raise NotFoundException("Tier not found")
 
     await crud_tiers.delete(db=db, name=name)
+    await bump_rules_version()
     return {"message": "Tier deleted"}
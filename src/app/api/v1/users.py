@@ -1,3 +1,4 @@
+from datetime import UTC, datetime
 from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, Request
@@ -7,16 +8,37 @@ from uuid import UUID
 
 from ...api.dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
+from ...core.exceptions.http_exceptions import (
+    BadRequestException,
+    DuplicateValueException,
+    ForbiddenException,
+    NotFoundException,
+)
 from ...core.security import blacklist_token, get_password_hash, oauth2_scheme
 from ...crud.crud_rate_limit import crud_rate_limits
 from ...crud.crud_tier import crud_tiers
 from ...crud.crud_users import crud_users
 from ...models.tier import Tier
 from ...schemas.tier import TierRead
-from ...schemas.user import UserCreate, UserCreateInternal, UserRead, UserTierUpdate, UserUpdate, UserType
-from ...core.security import create_access_token
+from ...schemas.user import (
+    UserCreate,
+    UserCreateInternal,
+    UserRead,
+    UserTierUpdate,
+    UserType,
+    UserUpdate,
+    UserUpdateInternal,
+)
+from ...core.security import access_token_claims, create_access_token
 from ...core.schemas import Token
+from ...core.utils.cache import invalidate_tags
+from ...core.utils.rate_limit import read_usage
+from ...core.utils.user_cache import get_user, invalidate_user
+from ...core.utils.user_versions import bump_security_version
+from ...core.utils.rate_limit_rules import DEFAULT_RULE, RateLimitRule, rules
+from ...middleware.client_cache_middleware import cache_control
+from ...middleware.rate_limit_middleware import RouteIndex
+from ...schemas.rate_limit import RateLimitUsage
 
 router = APIRouter(tags=["users"])
 
@@ -45,20 +67,22 @@ async def write_user(
             raise DuplicateValueException("Phone is already registered")
 
     user_internal_dict = user.model_dump()
-    user_internal_dict["hashed_password"] = get_password_hash(password=user_internal_dict["password"])
+    user_internal_dict["hashed_password"] = await get_password_hash(password=user_internal_dict["password"])
     del user_internal_dict["password"]
 
     user_internal = UserCreateInternal(**user_internal_dict)
     created_user: UserRead = await crud_users.create(db=db, object=user_internal)
+    await invalidate_user(UserRead.model_validate(created_user, from_attributes=True))
+    if created_user.username:
+        await invalidate_tags(f"{created_user.username}_posts")
 
-    access_token = await create_access_token(
-        data={"sub": created_user.username if created_user.username else str(created_user.inn)}
-    )
+    access_token = await create_access_token(data=access_token_claims(created_user))
 
     return Token(access_token=access_token, token_type="bearer")
 
 
 @router.get("/users", response_model=PaginatedListResponse[UserRead])
+@cache_control("public")
 async def read_users(
     request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], page: int = 1, items_per_page: int = 10
 ) -> dict:
@@ -75,15 +99,24 @@ async def read_users(
 
 
 @router.get("/user/me/", response_model=UserRead)
-async def read_users_me(request: Request, current_user: Annotated[UserRead, Depends(get_current_user)]) -> UserRead:
-    return current_user
+@cache_control("private", max_age=0, vary=["Authorization"])
+async def read_users_me(
+    request: Request,
+    current_user: Annotated[UserRead, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+) -> dict:
+    # `current_user` may only hold the claims of the access token: read the full profile.
+    db_user: dict | None = await get_user(db, schema_to_select=UserRead, id=current_user["id"])
+    if db_user is None:
+        raise NotFoundException("User not found")
+
+    return db_user
 
 
 @router.get("/user/{username}", response_model=UserRead)
+@cache_control("public")
 async def read_user(request: Request, username: str, db: Annotated[AsyncSession, Depends(async_get_db)]) -> dict:
-    db_user: UserRead | None = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
+    db_user: dict | None = await get_user(db, schema_to_select=UserRead, username=username)
     if db_user is None:
         raise NotFoundException("User not found")
 
@@ -102,33 +135,39 @@ async def patch_user(
     if db_user is None:
         raise NotFoundException("User not found")
 
-    if db_user.id != current_user.id:
+    if db_user["id"] != current_user["id"]:
         raise ForbiddenException()
 
     update_data = {}
 
-    if values.username is not None and values.username != db_user.username:
-        if current_user.type == UserType.ORGANIZATION:
-            raise ValidationException("Organizations cannot have username")
+    if values.username is not None and values.username != db_user["username"]:
+        if db_user["user_type"] == UserType.ORGANIZATION:
+            raise BadRequestException("Organizations cannot have username")
         existing_username = await crud_users.exists(db=db, username=values.username)
         if existing_username:
             raise DuplicateValueException("Username not available")
         update_data["username"] = values.username
 
-    if values.email is not None and values.email != db_user.email:
+    if values.email is not None and values.email != db_user["email"]:
         existing_email = await crud_users.exists(db=db, email=values.email)
         if existing_email:
             raise DuplicateValueException("Email is already registered")
         update_data["email"] = values.email
 
-    if values.name is not None and values.name != db_user.name:
+    if values.name is not None and values.name != db_user["name"]:
         update_data["name"] = values.name
 
-    if values.profile_image_url is not None and values.profile_image_url != db_user.profile_image_url:
+    if values.profile_image_url is not None and values.profile_image_url != db_user["profile_image_url"]:
         update_data["profile_image_url"] = values.profile_image_url
 
     if update_data:
-        await crud_users.update(db=db, object=UserUpdateInternal(**update_data), id=user_id)
+        await crud_users.update(
+            db=db, object=UserUpdateInternal(**update_data, updated_at=datetime.now(UTC)), id=db_user["id"]
+        )
+        await invalidate_user(db_user, {"id": db_user["id"], **update_data})
+        if "username" in update_data:
+            await invalidate_tags(f"{db_user['username']}_posts", f"{update_data['username']}_posts")
+            await bump_security_version(db, db_user["id"])
 
     return {"message": "User updated"}
 
@@ -149,6 +188,8 @@ async def erase_user(
         raise ForbiddenException()
 
     await crud_users.delete(db=db, username=username)
+    await invalidate_user(db_user)
+    await bump_security_version(db, db_user["id"])
     await blacklist_token(token=token, db=db)
     return {"message": "User deleted"}
 
@@ -160,11 +201,14 @@ async def erase_db_user(
     db: Annotated[AsyncSession, Depends(async_get_db)],
     token: str = Depends(oauth2_scheme),
 ) -> dict[str, str]:
-    db_user = await crud_users.exists(db=db, username=username)
+    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username)
     if not db_user:
         raise NotFoundException("User not found")
 
+    # Bumped before the row is deleted, so that workers reload (and no longer find) the user.
+    await bump_security_version(db, db_user["id"])
     await crud_users.db_delete(db=db, username=username)
+    await invalidate_user(db_user)
     await blacklist_token(token=token, db=db)
     return {"message": "User deleted from the database"}
 
@@ -192,11 +236,44 @@ async def read_user_rate_limits(
     return db_user
 
 
+@router.get("/user/{username}/rate_limits/usage", dependencies=[Depends(get_current_superuser)])
+async def read_user_rate_limit_usage(
+    request: Request, username: str, db: Annotated[AsyncSession, Depends(async_get_db)]
+) -> list[RateLimitUsage]:
+    """Quota left of the user on every rate limited route, read from the live counters in one Redis round trip."""
+    db_user: dict | None = await crud_users.get(db=db, username=username, schema_to_select=UserRead)
+    if db_user is None:
+        raise NotFoundException("User not found")
+
+    await rules.ensure_loaded(db)
+    applied_rules: dict[str, RateLimitRule] = {}
+    for template in RouteIndex(request.app.router.routes).templates:
+        rule = rules.lookup(db_user["tier_id"], template) if db_user["tier_id"] is not None else None
+        applied_rules[template] = rule or DEFAULT_RULE
+
+    usage = await read_usage(
+        db_user["id"], [(path, rule.limit, rule.period, rule.algorithm) for path, rule in applied_rules.items()]
+    )
+
+    return [
+        RateLimitUsage(
+            path=path,
+            limit=rule.limit,
+            period=rule.period,
+            algorithm=rule.algorithm,
+            remaining=result.remaining,
+            reset_after=result.reset_after,
+        )
+        for (path, rule), result in zip(applied_rules.items(), usage)
+    ]
+
+
 @router.get("/user/{username}/tier")
+@cache_control("public")
 async def read_user_tier(
     request: Request, username: str, db: Annotated[AsyncSession, Depends(async_get_db)]
 ) -> dict | None:
-    db_user = await crud_users.get(db=db, username=username, schema_to_select=UserRead)
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
     if db_user is None:
         raise NotFoundException("User not found")
 
@@ -229,4 +306,6 @@ async def patch_user_tier(
         raise NotFoundException("Tier not found")
 
     await crud_users.update(db=db, object=values, username=username)
+    await invalidate_user(db_user)
+    await bump_security_version(db, db_user["id"])
     return {"message": f"User {db_user['name']} Tier updated"}
@@ -1,9 +1,13 @@
 import os
 from enum import Enum
+from typing import Annotated
 
+from pydantic import Field
 from pydantic_settings import BaseSettings
 from starlette.config import Config
 
+from ..schemas.rate_limit import RateLimitAlgorithm, rate_limit_algorithm
+
 current_file_dir = os.path.dirname(os.path.realpath(__file__))
 env_path = os.path.join(current_file_dir, "..", "..", ".env")
 config = Config(env_path)
@@ -23,6 +27,27 @@ class CryptSettings(BaseSettings):
     ALGORITHM: str = config("ALGORITHM", default="HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=30)
     REFRESH_TOKEN_EXPIRE_DAYS: int = config("REFRESH_TOKEN_EXPIRE_DAYS", default=7)
+    PASSWORD_HASH_WORKERS: int = config("PASSWORD_HASH_WORKERS", default=4)
+    PASSWORD_HASH_MAX_QUEUE: int = config("PASSWORD_HASH_MAX_QUEUE", default=64)
+    PASSWORD_HASH_ROUNDS: int | None = config("PASSWORD_HASH_ROUNDS", cast=int, default=None)
+    PASSWORD_HASH_BUDGET_MS: int = config("PASSWORD_HASH_BUDGET_MS", default=250)
+    PASSWORD_HASH_MIN_ROUNDS: int = config("PASSWORD_HASH_MIN_ROUNDS", default=10)
+    PASSWORD_HASH_MAX_ROUNDS: int = config("PASSWORD_HASH_MAX_ROUNDS", default=16)
+    PASSWORD_REHASH_ON_LOGIN: bool = config("PASSWORD_REHASH_ON_LOGIN", default=True)
+    DECODED_TOKEN_CACHE_MAX_ENTRIES: int = config("DECODED_TOKEN_CACHE_MAX_ENTRIES", default=10000)
+    JWT_KEYS_DIR: str | None = config("JWT_KEYS_DIR", default=None)
+    JWT_ACTIVE_KID: str | None = config("JWT_ACTIVE_KID", default=None)
+    JWKS_MAX_AGE: int = config("JWKS_MAX_AGE", default=86400)
+
+
+class TokenBlacklistSettings(BaseSettings):
+    TOKEN_BLACKLIST_BLOOM_ERROR_RATE: float = config("TOKEN_BLACKLIST_BLOOM_ERROR_RATE", default=0.001)
+    TOKEN_BLACKLIST_REBUILD_INTERVAL: int = config("TOKEN_BLACKLIST_REBUILD_INTERVAL", default=30)
+    TOKEN_BLACKLIST_PURGE_ENABLED: bool = config("TOKEN_BLACKLIST_PURGE_ENABLED", default=True)
+    TOKEN_BLACKLIST_PURGE_INTERVAL_MINUTES: Annotated[int, Field(ge=1, le=60)] = config(
+        "TOKEN_BLACKLIST_PURGE_INTERVAL_MINUTES", default=60
+    )
+    TOKEN_BLACKLIST_PURGE_BATCH_SIZE: int = config("TOKEN_BLACKLIST_PURGE_BATCH_SIZE", default=1000)
 
 
 class DatabaseSettings(BaseSettings):
@@ -74,6 +99,30 @@ class RedisCacheSettings(BaseSettings):
     REDIS_CACHE_HOST: str = config("REDIS_CACHE_HOST", default="localhost")
     REDIS_CACHE_PORT: int = config("REDIS_CACHE_PORT", default=6379)
     REDIS_CACHE_URL: str = f"redis://{REDIS_CACHE_HOST}:{REDIS_CACHE_PORT}"
+    CACHE_SERIALIZER: str = config("CACHE_SERIALIZER", default="json")
+    CACHE_COMPRESSION: str = config("CACHE_COMPRESSION", default="none")
+    CACHE_COMPRESSION_MIN_SIZE: int = config("CACHE_COMPRESSION_MIN_SIZE", default=1024)
+    CACHE_METRICS_FLUSH_INTERVAL: int = config("CACHE_METRICS_FLUSH_INTERVAL", default=10)
+    CACHE_REDIS_TIMEOUT_MS: int = config("CACHE_REDIS_TIMEOUT_MS", default=100)
+    USER_CACHE_ENABLED: bool = config("USER_CACHE_ENABLED", default=True)
+    USER_CACHE_EXPIRATION: int = config("USER_CACHE_EXPIRATION", default=300)
+    USER_CACHE_NEGATIVE_EXPIRATION: int = config("USER_CACHE_NEGATIVE_EXPIRATION", default=30)
+
+
+class LocalCacheSettings(BaseSettings):
+    LOCAL_CACHE_ENABLED: bool = config("LOCAL_CACHE_ENABLED", default=False)
+    LOCAL_CACHE_MAX_ENTRIES: int = config("LOCAL_CACHE_MAX_ENTRIES", default=1024)
+    LOCAL_CACHE_MAX_BYTES: int = config("LOCAL_CACHE_MAX_BYTES", default=32 * 1024 * 1024)
+    LOCAL_CACHE_EXPIRATION: int = config("LOCAL_CACHE_EXPIRATION", default=5)
+
+
+class CacheWarmingSettings(BaseSettings):
+    CACHE_WARMING_ENABLED: bool = config("CACHE_WARMING_ENABLED", default=True)
+    CACHE_WARMING_TOP_KEYS: int = config("CACHE_WARMING_TOP_KEYS", default=100)
+    CACHE_WARMING_CONCURRENCY: int = config("CACHE_WARMING_CONCURRENCY", default=4)
+    CACHE_WARMING_INTERVAL_MINUTES: Annotated[int, Field(ge=1, le=60)] = config(
+        "CACHE_WARMING_INTERVAL_MINUTES", default=15
+    )
 
 
 class ClientSideCacheSettings(BaseSettings):
@@ -89,11 +138,27 @@ class RedisRateLimiterSettings(BaseSettings):
     REDIS_RATE_LIMIT_HOST: str = config("REDIS_RATE_LIMIT_HOST", default="localhost")
     REDIS_RATE_LIMIT_PORT: int = config("REDIS_RATE_LIMIT_PORT", default=6379)
     REDIS_RATE_LIMIT_URL: str = f"redis://{REDIS_RATE_LIMIT_HOST}:{REDIS_RATE_LIMIT_PORT}"
+    RATE_LIMIT_PRINCIPAL_TTL: int = config("RATE_LIMIT_PRINCIPAL_TTL", default=60)
+    RATE_LIMIT_RULES_RECONCILE_INTERVAL: int = config("RATE_LIMIT_RULES_RECONCILE_INTERVAL", default=300)
+    RATE_LIMIT_HYBRID_ENABLED: bool = config("RATE_LIMIT_HYBRID_ENABLED", default=False)
+    RATE_LIMIT_HYBRID_FLUSH_INTERVAL_MS: int = config("RATE_LIMIT_HYBRID_FLUSH_INTERVAL_MS", default=100)
+    RATE_LIMIT_HYBRID_FLUSH_REQUESTS: int = config("RATE_LIMIT_HYBRID_FLUSH_REQUESTS", default=50)
+    RATE_LIMIT_HYBRID_LEASE_FRACTION: float = config("RATE_LIMIT_HYBRID_LEASE_FRACTION", default=0.1)
+    RATE_LIMIT_REDIS_TIMEOUT_MS: int = config("RATE_LIMIT_REDIS_TIMEOUT_MS", default=50)
+    RATE_LIMIT_FAILURE_MODE: str = config("RATE_LIMIT_FAILURE_MODE", default="open")
 
 
 class DefaultRateLimitSettings(BaseSettings):
     DEFAULT_RATE_LIMIT_LIMIT: int = config("DEFAULT_RATE_LIMIT_LIMIT", default=10)
     DEFAULT_RATE_LIMIT_PERIOD: int = config("DEFAULT_RATE_LIMIT_PERIOD", default=3600)
+    DEFAULT_RATE_LIMIT_ALGORITHM: RateLimitAlgorithm = config(
+        "DEFAULT_RATE_LIMIT_ALGORITHM", cast=rate_limit_algorithm, default="fixed_window"
+    )
+
+
+class CircuitBreakerSettings(BaseSettings):
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = config("CIRCUIT_BREAKER_FAILURE_THRESHOLD", default=5)
+    CIRCUIT_BREAKER_RESET_TIMEOUT: int = config("CIRCUIT_BREAKER_RESET_TIMEOUT", default=10)
 
 
 class GenAIModelSettings(BaseSettings):
@@ -114,13 +179,17 @@ class Settings(
     AppSettings,
     PostgresSettings,
     CryptSettings,
+    TokenBlacklistSettings,
     FirstUserSettings,
     TestSettings,
     RedisCacheSettings,
+    LocalCacheSettings,
+    CacheWarmingSettings,
     ClientSideCacheSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
     DefaultRateLimitSettings,
+    CircuitBreakerSettings,
     GenAIModelSettings,
     EnvironmentSettings,
 ):
@@ -57,6 +57,15 @@ class TokenData(BaseModel):
     username_or_email: str
     is_anonymous: bool = False
     device_uuid: str | None = None
+    # 'refresh' for refresh tokens, None for access tokens
+    token_type: str | None = None
+    # user claims, missing from the tokens minted before they were introduced
+    user_id: int | None = None
+    uuid: str | None = None
+    username: str | None = None
+    tier_id: int | None = None
+    is_superuser: bool = False
+    security_version: int | None = None
 
 
 class AnonymousSession(BaseModel):
@@ -76,7 +85,7 @@ class AnonymousSessionResponse(Token):
 
 
 class TokenBlacklistBase(BaseModel):
-    token: str
+    token_hash: str
     expires_at: datetime
 
 
@@ -1,53 +1,380 @@
+import asyncio
+import os
+import time
+import uuid as uuid_pkg
+from collections import OrderedDict
+from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
-from typing import Any, Literal
+from typing import Any, Literal, TypedDict, TypeVar
 
+import anyio
 import bcrypt
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+from redis.exceptions import RedisError
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import Scope
 
-from ..crud.crud_users import crud_users
 from .config import settings
 from .db.crud_token_blacklist import crud_token_blacklist
+from .db.database import local_session
+from .exceptions.http_exceptions import ServiceUnavailableException
 from .schemas import TokenBlacklistCreate, TokenData
+from .utils.token_blacklist import add_to_blacklist, is_blacklisted, on_blacklisted, token_digest
+from .utils import cache
+from .utils.user_cache import get_user
+from .utils.user_versions import is_stale, record_version
 
 from ..core.logger import logging
+from ..crud.crud_users import crud_users
+from ..models.user import User
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+REFRESH_TOKEN_TYPE = "refresh"
+DEFAULT_BCRYPT_ROUNDS = 12
+BCRYPT_ROUNDS_KEY = "password_hash:rounds"
+BCRYPT_ROUNDS_EXPIRATION = 24 * 60 * 60
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
+T = TypeVar("T")
+
+
+class PasswordHasher:
+    """Runs bcrypt in worker threads, at most `workers` at a time, so that hashing never blocks the event loop.
+
+    bcrypt releases the GIL while it hashes, so the threads run in parallel with the event loop. Calls beyond
+    `workers` wait for a thread; once `max_queue` calls are waiting, new calls fail fast with a 503 instead of
+    piling up behind a burst of logins.
+
+    Parameters
+    ----------
+    workers: int
+        Maximum number of concurrent bcrypt calls.
+    max_queue: int
+        Maximum number of calls waiting for a thread.
+    rounds: int
+        bcrypt cost of new hashes, usually set by `calibrate_password_hashing`.
+    """
+
+    def __init__(self, workers: int, max_queue: int, rounds: int = DEFAULT_BCRYPT_ROUNDS) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.in_flight = 0
+        self.rejected = 0
+        self._limiter: anyio.CapacityLimiter | None = None
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        # Created on first use, as it must be bound to the running event loop.
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.workers)
+        return self._limiter
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run `func(*args)` in a worker thread.
+
+        Raises
+        ------
+        ServiceUnavailableException: If `max_queue` calls are already waiting for a thread.
+        """
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            logging.warning(f"Password hashing queue is full ({self.max_queue} waiting), rejecting the request.")
+            raise ServiceUnavailableException("Too many password checks in progress. Try again later.")
+
+        self.in_flight += 1
+        try:
+            return await anyio.to_thread.run_sync(func, *args, limiter=self.limiter)
+        finally:
+            self.in_flight -= 1
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    rounds=settings.PASSWORD_HASH_ROUNDS or DEFAULT_BCRYPT_ROUNDS,
+)
+
+_rehashing: set[int] = set()
+_background_tasks: set[asyncio.Task] = set()
+
+
+def calibrate_bcrypt_rounds(budget_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """Return the highest bcrypt cost in `[min_rounds, max_rounds]` hashing within `budget_ms` on this machine.
+
+    Each extra round doubles the hashing time, so costs are timed from `min_rounds` up and the search stops as soon
+    as the next one would exceed the budget. `min_rounds` is returned even if it is over budget. Blocking.
+    """
+    rounds = min_rounds
+    for candidate in range(min_rounds, max_rounds + 1):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=candidate))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms > budget_ms and candidate > min_rounds:
+            break
+
+        rounds = candidate
+        if elapsed_ms * 2 > budget_ms:
+            break
+
+    return rounds
+
+
+async def calibrate_password_hashing(budget_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """Set the bcrypt cost of `password_hasher` to the highest one meeting the per-hash latency budget.
+
+    The first worker to calibrate shares its result in Redis for a day, and the other workers adopt it: costs
+    measured separately would differ slightly, and users would be rehashed back and forth at every login.
+    """
+    shared_rounds = None
+    if cache.client is not None:
+        try:
+            shared_rounds = await cache.client.get(BCRYPT_ROUNDS_KEY)
+        except RedisError as e:
+            logging.warning(f"Could not read the shared bcrypt cost: {e!r}")
+
+    if shared_rounds is None:
+        rounds = await anyio.to_thread.run_sync(calibrate_bcrypt_rounds, budget_ms, min_rounds, max_rounds)
+        if cache.client is not None:
+            try:
+                await cache.client.set(BCRYPT_ROUNDS_KEY, rounds, nx=True, ex=BCRYPT_ROUNDS_EXPIRATION)
+                shared_rounds = await cache.client.get(BCRYPT_ROUNDS_KEY)
+            except RedisError as e:
+                logging.warning(f"Could not share the bcrypt cost: {e!r}")
+
+    if shared_rounds is not None:
+        rounds = int(shared_rounds)
+
+    password_hasher.rounds = rounds
+    logging.info(f"Hashing passwords with bcrypt cost {rounds} (budget {budget_ms}ms per hash).")
+    return rounds
+
 
 async def verify_password(plain_password: str, hashed_password: str) -> bool:
-    correct_password: bool = bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+    correct_password: bool = await password_hasher.run(
+        bcrypt.checkpw, plain_password.encode(), hashed_password.encode()
+    )
     return correct_password
 
 
-def get_password_hash(password: str) -> str:
-    hashed_password: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+def hash_password(password: str) -> str:
+    """Hash a password in the calling thread. Blocking: use `get_password_hash` from the event loop."""
+    hashed_password: str = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=password_hasher.rounds)).decode()
     return hashed_password
 
 
-async def authenticate_user(identifier: str, password: str, db: AsyncSession) -> dict[str, Any] | Literal[False]:
+def bcrypt_rounds(hashed_password: str) -> int:
+    """Return the cost of a bcrypt hash, e.g. 12 for '$2b$12$...'."""
+    return int(hashed_password.split("$")[2])
+
+
+def _schedule_rehash(user: dict[str, Any], password: str) -> None:
+    """Replace the hash of a user with one at the current cost, in the background, unless already in progress.
+
+    `user` is the row `authenticate_user` read from the database: its hash is only replaced if it did not change
+    meanwhile. Failures, e.g. a full hashing queue, are logged and the rehash is tried again at the next login.
+    """
+    if user["id"] in _rehashing:
+        return
+
+    async def _run() -> None:
+        try:
+            hashed_password = await get_password_hash(password)
+            async with local_session() as db:
+                await db.execute(
+                    update(User)
+                    .where(User.id == user["id"], User.hashed_password == user["hashed_password"])
+                    .values(hashed_password=hashed_password)
+                )
+                await db.commit()
+        except Exception as e:
+            logging.warning(f"Could not rehash the password of user {user['id']}: {e!r}")
+        finally:
+            _rehashing.discard(user["id"])
+
+    _rehashing.add(user["id"])
+    task = asyncio.create_task(_run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def drain_rehashes() -> None:
+    """Wait for the rehashes scheduled by `authenticate_user` to finish. Call it at shutdown."""
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.run(hash_password, password)
+
+
+class IdentifierFilter(TypedDict, total=False):
+    """The user field a login identifier is looked up by, as keyword arguments of `get_user` and `crud_users.get`."""
+
+    inn: str
+    email: str
+    username: str
+
+
+def identifier_filter(identifier: str) -> IdentifierFilter:
     if identifier.isdigit():  # Проверка на ИНН
-        db_user = await crud_users.get(db=db, inn=identifier, is_deleted=False)
+        return {"inn": identifier}
     elif "@" in identifier:  # Проверка на email
-        db_user = await crud_users.get(db=db, email=identifier, is_deleted=False)
+        return {"email": identifier}
     else:  # Считаем что это username
-        db_user = await crud_users.get(db=db, username=identifier, is_deleted=False)
+        return {"username": identifier}
+
 
-    if not db_user:
+async def get_user_by_identifier(identifier: str, db: AsyncSession) -> dict[str, Any] | None:
+    return await get_user(db, **identifier_filter(identifier))
+
+
+async def authenticate_user(identifier: str, password: str, db: AsyncSession) -> dict[str, Any] | Literal[False]:
+    # Read from the database: the password hash is not in the user cache.
+    db_user = await crud_users.get(db=db, is_deleted=False, **identifier_filter(identifier))
+    if not isinstance(db_user, dict):
         return False
 
     elif not await verify_password(password, db_user.get("hashed_password")):
         return False
 
+    if settings.PASSWORD_REHASH_ON_LOGIN and bcrypt_rounds(db_user["hashed_password"]) != password_hasher.rounds:
+        _schedule_rehash(db_user, password)
+
     return db_user
 
 
+def access_token_claims(user: Any) -> dict[str, Any]:
+    """Return the claims of an access token for a user (a dict or a `User`).
+
+    The claims let `resolve_principal` authenticate the user without a database lookup for as long as their
+    security version (see `user_versions.bump_security_version`) does not change.
+    """
+    get = user.get if isinstance(user, dict) else lambda field: getattr(user, field)
+    return {
+        "sub": str(get("username") or get("inn")),
+        "uid": get("id"),
+        "uuid": str(get("uuid")) if get("uuid") is not None else None,
+        "username": get("username"),
+        "tier_id": get("tier_id"),
+        "is_superuser": get("is_superuser"),
+        "sv": get("security_version"),
+    }
+
+
+class SigningKeys:
+    """Key pairs signing and verifying tokens with an asymmetric algorithm, each identified by a key ID (`kid`).
+
+    Tokens are signed with the private key `active_kid`, whose ID goes in their header, and verified with the key
+    their header names. Other services verify them with the public keys published by `jwks`, without calling this
+    service. Several keys are valid at once, so keys rotate without invalidating any token: add the new key pair,
+    wait `JWKS_MAX_AGE` for downstream caches to fetch it, make it `JWT_ACTIVE_KID`, and remove the former key once
+    the last token it signed expired (`REFRESH_TOKEN_EXPIRE_DAYS`).
+
+    Parameters
+    ----------
+    algorithm: str
+        One of `ASYMMETRIC_ALGORITHMS`.
+    pems: dict[str, str]
+        PEM encoded keys by key ID. Retired keys may be public keys only.
+    active_kid: str
+        ID of the private key that signs new tokens.
+    """
+
+    def __init__(self, algorithm: str, pems: dict[str, str], active_kid: str) -> None:
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"'{algorithm}' is not an asymmetric algorithm, expected one of {ASYMMETRIC_ALGORITHMS}.")
+        if active_kid not in pems or "PRIVATE KEY" not in pems[active_kid]:
+            raise ValueError(f"No private key '{active_kid}' to sign tokens with.")
+
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self._signing_key = jwk.construct(pems[active_kid], algorithm)
+        self._public_keys: dict[str, Key] = {
+            kid: jwk.construct(pem, algorithm).public_key() for kid, pem in pems.items()
+        }
+
+    @classmethod
+    def from_directory(cls, algorithm: str, keys_dir: str, active_kid: str | None) -> "SigningKeys":
+        """Load every `<kid>.pem` file of `keys_dir`. `active_kid` may be omitted if there is one private key.
+
+        Keys are created with e.g. `openssl genpkey -algorithm RSA -pkeyopt rsa_keygen_bits:2048 -out <kid>.pem`
+        for RS256, or `openssl ecparam -name prime256v1 -genkey -noout -out <kid>.pem` for ES256.
+        """
+        pems = {}
+        for filename in sorted(os.listdir(keys_dir)):
+            kid, extension = os.path.splitext(filename)
+            if extension == ".pem":
+                with open(os.path.join(keys_dir, filename)) as pem_file:
+                    pems[kid] = pem_file.read()
+
+        if active_kid is None:
+            private_kids = [kid for kid, pem in pems.items() if "PRIVATE KEY" in pem]
+            if len(private_kids) != 1:
+                raise ValueError(f"Set JWT_ACTIVE_KID to one of the private keys of {keys_dir}: {private_kids}.")
+            active_kid = private_kids[0]
+
+        return cls(algorithm, pems, active_kid)
+
+    def sign(self, claims: dict[str, Any]) -> str:
+        encoded_jwt: str = jwt.encode(
+            claims, self._signing_key, algorithm=self.algorithm, headers={"kid": self.active_kid}
+        )
+        return encoded_jwt
+
+    def verify(self, token: str) -> dict[str, Any]:
+        """Return the claims of the token, or raise `JWTError` if it is not signed by one of the keys or expired."""
+        key = self._public_keys.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise JWTError("Unknown signing key.")
+
+        payload: dict[str, Any] = jwt.decode(token, key, algorithms=[self.algorithm])
+        return payload
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        """Return the public keys as a JSON Web Key Set (RFC 7517)."""
+        return {
+            "keys": [
+                {**key.to_dict(), "kid": kid, "use": "sig"} for kid, key in sorted(self._public_keys.items())
+            ]
+        }
+
+
+signing_keys: SigningKeys | None = None
+if ALGORITHM in ASYMMETRIC_ALGORITHMS:
+    if settings.JWT_KEYS_DIR is None:
+        raise ValueError(f"JWT_KEYS_DIR must be set to sign tokens with {ALGORITHM}.")
+    signing_keys = SigningKeys.from_directory(ALGORITHM, settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID)
+
+
+def encode_token(claims: dict[str, Any]) -> str:
+    """Sign the claims with the active key pair, or with `SECRET_KEY` for the HMAC algorithms."""
+    if signing_keys is not None:
+        return signing_keys.sign(claims)
+
+    encoded_jwt: str = jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def decode_claims(token: str) -> dict[str, Any]:
+    """Return the claims of a token whose signature and expiration are valid, or raise `JWTError`."""
+    if signing_keys is not None:
+        return signing_keys.verify(token)
+
+    payload: dict[str, Any] = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    return payload
+
+
 async def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -55,8 +382,7 @@ async def create_access_token(data: dict[str, Any], expires_delta: timedelta | N
     else:
         expire = datetime.now(UTC).replace(tzinfo=None) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt: str = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return encode_token(to_encode)
 
 
 async def create_refresh_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
@@ -65,9 +391,8 @@ async def create_refresh_token(data: dict[str, Any], expires_delta: timedelta |
         expire = datetime.now(UTC).replace(tzinfo=None) + expires_delta
     else:
         expire = datetime.now(UTC).replace(tzinfo=None) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
-    encoded_jwt: str = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update({"exp": expire, "type": REFRESH_TOKEN_TYPE})
+    return encode_token(to_encode)
 
 
 async def create_anonymous_token(device_uuid: str) -> tuple[str, datetime]:
@@ -97,32 +422,196 @@ async def verify_token(token: str, db: AsyncSession) -> TokenData | None:
     TokenData | None
         TokenData instance if the token is valid, None otherwise.
     """
-    is_blacklisted = await crud_token_blacklist.exists(db, token=token)
-    if is_blacklisted:
+    if await is_blacklisted(token, db):
         return None
 
+    return decode_token(token)
+
+
+class DecodedTokenCache:
+    """Bounded LRU cache of the `TokenData` of verified tokens, keyed by token digest.
+
+    An entry expires with its token (`exp` claim) and is dropped as soon as the token is blacklisted, by this
+    worker or by another one (see `on_blacklisted`).
+
+    Parameters
+    ----------
+    max_entries: int
+        Maximum number of cached tokens. 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, TokenData]] = OrderedDict()
+
+    def get(self, digest: str) -> TokenData | None:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+
+        expires_at, token_data = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            return None
+
+        self._entries.move_to_end(digest)
+        return token_data
+
+    def set(self, digest: str, expires_at: float, token_data: TokenData) -> None:
+        if self.max_entries <= 0:
+            return
+
+        self._entries[digest] = (expires_at, token_data)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, digest: str) -> None:
+        self._entries.pop(digest, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+decoded_tokens = DecodedTokenCache(max_entries=settings.DECODED_TOKEN_CACHE_MAX_ENTRIES)
+on_blacklisted(decoded_tokens.discard)
+
+
+def decode_token(token: str) -> TokenData | None:
+    """Decode a JWT token and return TokenData if its signature and expiration are valid.
+
+    Unlike `verify_token`, the blacklist is not checked. Verified tokens are remembered in `decoded_tokens`
+    until they expire, so repeated requests with the same token skip the signature check.
+
+    Parameters
+    ----------
+    token: str
+        The JWT token to be decoded.
+
+    Returns
+    -------
+    TokenData | None
+        TokenData instance if the token is valid, None otherwise.
+    """
+    digest = token_digest(token)
+    token_data = decoded_tokens.get(digest)
+    if token_data is not None:
+        return token_data
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_claims(token)
         logging.debug(f"Token payload: {payload}")
-        username_or_email: str = payload.get("sub")
-        if username_or_email is None:
+        username_or_email = payload.get("sub")
+        if not isinstance(username_or_email, str):
             return None
 
         # Anonymous user support
         if username_or_email.startswith("anonymous:"):
-            return TokenData(
+            token_data = TokenData(
                 username_or_email=username_or_email,
                 is_anonymous=True,
                 device_uuid=username_or_email.split(":", 1)[1]
             )
-
-        return TokenData(username_or_email=username_or_email, is_anonymous=False)
+        else:
+            token_data = TokenData(
+                username_or_email=username_or_email,
+                is_anonymous=False,
+                token_type=payload.get("type"),
+                user_id=payload.get("uid"),
+                uuid=payload.get("uuid"),
+                username=payload.get("username"),
+                tier_id=payload.get("tier_id"),
+                is_superuser=payload.get("is_superuser", False),
+                security_version=payload.get("sv"),
+            )
 
     except JWTError:
         return None
 
+    if "exp" in payload:
+        decoded_tokens.set(digest, payload["exp"], token_data)
+    return token_data
+
+
+class Principal:
+    """The caller of a request, resolved once from its bearer token and kept in the request state.
+
+    The token is decoded when the principal is created; the blacklist check and the user lookup, which need the
+    database, run on the first call to `resolve_principal` and are reused by every later call in the request.
+    """
+
+    def __init__(self, token: str | None, host: str | None = None) -> None:
+        self.token = token
+        self.host = host
+        self.token_data = decode_token(token) if token else None
+        self.user: dict[str, Any] | None = None
+        self.resolved = False
+
+
+def get_principal(scope: Scope) -> Principal:
+    """Return the principal of the request with the given ASGI scope, creating it on first use."""
+    state = scope.setdefault("state", {})
+    principal: Principal | None = state.get("principal")
+    if principal is None:
+        headers = dict(scope.get("headers") or [])
+        scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+        client = scope.get("client")
+        principal = Principal(
+            token=token if scheme.lower() == "bearer" and token else None, host=client[0] if client else None
+        )
+        state["principal"] = principal
+    return principal
+
+
+def claims_user(token_data: TokenData) -> dict[str, Any]:
+    """Return the user described by the claims of a token, with the fields the dependencies rely on."""
+    return {
+        "id": token_data.user_id,
+        "uuid": uuid_pkg.UUID(token_data.uuid) if token_data.uuid else None,
+        "username": token_data.username,
+        "tier_id": token_data.tier_id,
+        "is_superuser": token_data.is_superuser,
+        "security_version": token_data.security_version,
+    }
+
+
+async def resolve_principal(principal: Principal, db: AsyncSession) -> dict[str, Any] | None:
+    """Return the user authenticated by the principal's token, looked up at most once per principal.
+
+    Tokens carrying up-to-date user claims are resolved from the claims alone (see `claims_user`). The user is
+    loaded (see `user_cache.get_user`) if their security version changed since the token was minted, or may have
+    changed because this worker is not in sync with the published versions, and for tokens minted without claims.
+
+    Returns None if the token is missing, invalid, blacklisted or a refresh token, or if it belongs to no user.
+    """
+    if principal.resolved:
+        return principal.user
+
+    token_data = principal.token_data
+    if (
+        principal.token is not None
+        and token_data is not None
+        and not token_data.is_anonymous
+        and token_data.token_type != REFRESH_TOKEN_TYPE
+    ):
+        if not await is_blacklisted(principal.token, db):
+            if token_data.user_id is None:
+                principal.user = await get_user_by_identifier(token_data.username_or_email, db)
+            elif is_stale(token_data.user_id, token_data.security_version):
+                principal.user = await get_user(db, id=token_data.user_id)
+                if principal.user is not None:
+                    record_version(principal.user["id"], principal.user["security_version"])
+            else:
+                principal.user = claims_user(token_data)
+
+    principal.resolved = True
+    return principal.user
+
 
 async def blacklist_token(token: str, db: AsyncSession) -> None:
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    expires_at = datetime.fromtimestamp(payload.get("exp"))
-    await crud_token_blacklist.create(db, object=TokenBlacklistCreate(**{"token": token, "expires_at": expires_at}))
+    payload = decode_claims(token)
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=UTC)
+    await crud_token_blacklist.create(
+        db, object=TokenBlacklistCreate(token_hash=token_digest(token), expires_at=expires_at)
+    )
+    await add_to_blacklist(token, payload["exp"])
@@ -1,3 +1,4 @@
+import asyncio
 from collections.abc import AsyncGenerator, Callable
 from contextlib import _AsyncGeneratorContextManager, asynccontextmanager
 from typing import Any
@@ -12,21 +13,25 @@ from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from starlette.middleware.cors import CORSMiddleware
 
-from ..api.dependencies import get_current_superuser
 from ..middleware.client_cache_middleware import ClientCacheMiddleware
+from ..middleware.rate_limit_middleware import RateLimitMiddleware
 from .config import (
     AppSettings,
     ClientSideCacheSettings,
+    CryptSettings,
     DatabaseSettings,
     EnvironmentOption,
     EnvironmentSettings,
+    LocalCacheSettings,
     RedisCacheSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
     settings,
 )
+from . import security
 from .db.database import Base, async_engine as engine
-from .utils import cache, queue, rate_limit
+from .utils import cache, metrics, queue, rate_limit, rate_limit_rules, token_blacklist, user_versions
+from .utils.circuit_breaker import CircuitBreaker
 from ..models import *
 
 # -------------- database --------------
@@ -39,12 +44,58 @@ async def create_tables() -> None:
 async def create_redis_cache_pool() -> None:
     cache.pool = redis.ConnectionPool.from_url(settings.REDIS_CACHE_URL)
     cache.client = redis.Redis.from_pool(cache.pool)  # type: ignore
+    cache.codec = cache.CacheCodec(
+        serializer=settings.CACHE_SERIALIZER,
+        compressor=settings.CACHE_COMPRESSION,
+        compress_min_size=settings.CACHE_COMPRESSION_MIN_SIZE,
+    )
+    cache.breaker = CircuitBreaker(
+        "cache",
+        call_timeout=settings.CACHE_REDIS_TIMEOUT_MS / 1000,
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+    )
 
 
 async def close_redis_cache_pool() -> None:
     await cache.client.aclose()  # type: ignore
 
 
+async def _cancel_task(task: asyncio.Task) -> None:
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+# -------------- metrics --------------
+async def create_metrics_flusher() -> asyncio.Task:
+    return asyncio.create_task(
+        metrics.flush_periodically(
+            [cache.metrics, cache.hot_keys],
+            cache.client,  # type: ignore
+            cache.breaker,
+            settings.CACHE_METRICS_FLUSH_INTERVAL,
+        )
+    )
+
+
+# -------------- local cache --------------
+async def create_local_cache() -> asyncio.Task:
+    cache.local_cache = cache.LocalCache(
+        max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+        max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+        expiration=settings.LOCAL_CACHE_EXPIRATION,
+    )
+    return asyncio.create_task(cache.listen_for_invalidations())
+
+
+async def close_local_cache(listener: asyncio.Task) -> None:
+    await _cancel_task(listener)
+    cache.local_cache = None
+
+
 # -------------- queue --------------
 async def create_redis_queue_pool() -> None:
     queue.pool = await create_pool(RedisSettings(host=settings.REDIS_QUEUE_HOST, port=settings.REDIS_QUEUE_PORT))
@@ -58,12 +109,71 @@ async def close_redis_queue_pool() -> None:
 async def create_redis_rate_limit_pool() -> None:
     rate_limit.pool = redis.ConnectionPool.from_url(settings.REDIS_RATE_LIMIT_URL)
     rate_limit.client = redis.Redis.from_pool(rate_limit.pool)  # type: ignore
+    rate_limit.breaker = CircuitBreaker(
+        "rate_limit",
+        call_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT_MS / 1000,  # type: ignore
+        failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+    )
+    if settings.RATE_LIMIT_FAILURE_MODE not in rate_limit.FAILURE_MODES:  # type: ignore
+        raise ValueError(
+            f"Unknown RATE_LIMIT_FAILURE_MODE '{settings.RATE_LIMIT_FAILURE_MODE}', "  # type: ignore
+            f"expected one of {rate_limit.FAILURE_MODES}."
+        )
+    rate_limit.failure_mode = settings.RATE_LIMIT_FAILURE_MODE  # type: ignore
 
 
 async def close_redis_rate_limit_pool() -> None:
     await rate_limit.client.aclose()  # type: ignore
 
 
+async def create_hybrid_rate_limiter() -> asyncio.Task:
+    rate_limit.hybrid = rate_limit.HybridLimiter(
+        flush_interval=settings.RATE_LIMIT_HYBRID_FLUSH_INTERVAL_MS / 1000,  # type: ignore
+        flush_requests=settings.RATE_LIMIT_HYBRID_FLUSH_REQUESTS,  # type: ignore
+        lease_fraction=settings.RATE_LIMIT_HYBRID_LEASE_FRACTION,  # type: ignore
+    )
+    return asyncio.create_task(rate_limit.hybrid.flush_periodically())
+
+
+async def close_hybrid_rate_limiter(flusher: asyncio.Task) -> None:
+    await _cancel_task(flusher)
+    rate_limit.hybrid = None
+
+
+async def create_rate_limit_rules() -> list[asyncio.Task]:
+    await rate_limit_rules.reload_rules()
+    return [
+        asyncio.create_task(rate_limit_rules.listen_for_rule_changes()),
+        asyncio.create_task(
+            rate_limit_rules.reconcile_periodically(settings.RATE_LIMIT_RULES_RECONCILE_INTERVAL)  # type: ignore
+        ),
+    ]
+
+
+# -------------- token blacklist --------------
+async def create_token_blacklist() -> list[asyncio.Task]:
+    return [
+        asyncio.create_task(token_blacklist.listen_for_blacklisted_tokens()),
+        asyncio.create_task(token_blacklist.rebuild_periodically(settings.TOKEN_BLACKLIST_REBUILD_INTERVAL)),
+    ]
+
+
+# -------------- user security versions --------------
+async def create_user_versions_listener() -> asyncio.Task:
+    return asyncio.create_task(user_versions.listen_for_version_changes())
+
+
+# -------------- password hashing --------------
+async def calibrate_password_hashing() -> None:
+    if settings.PASSWORD_HASH_ROUNDS is not None:
+        return
+
+    await security.calibrate_password_hashing(
+        settings.PASSWORD_HASH_BUDGET_MS, settings.PASSWORD_HASH_MIN_ROUNDS, settings.PASSWORD_HASH_MAX_ROUNDS
+    )
+
+
 # -------------- application --------------
 async def set_threadpool_tokens(number_of_tokens: int = 100) -> None:
     limiter = anyio.to_thread.current_default_thread_limiter()
@@ -74,6 +184,7 @@ def lifespan_factory(
     settings: (
         DatabaseSettings
         | RedisCacheSettings
+        | LocalCacheSettings
         | AppSettings
         | ClientSideCacheSettings
         | RedisQueueSettings
@@ -91,17 +202,65 @@ def lifespan_factory(
         if isinstance(settings, DatabaseSettings) and create_tables_on_start:
             await create_tables()
 
+        metrics_flusher = None
         if isinstance(settings, RedisCacheSettings):
             await create_redis_cache_pool()
+            metrics_flusher = await create_metrics_flusher()
+
+        if isinstance(settings, CryptSettings):
+            await calibrate_password_hashing()
+
+        token_blacklist_tasks = []
+        if isinstance(settings, RedisCacheSettings) and isinstance(settings, DatabaseSettings):
+            token_blacklist_tasks = await create_token_blacklist()
+
+        user_versions_listener = None
+        if isinstance(settings, RedisCacheSettings) and isinstance(settings, DatabaseSettings):
+            user_versions_listener = await create_user_versions_listener()
+
+        local_cache_listener = None
+        if (
+            isinstance(settings, RedisCacheSettings)
+            and isinstance(settings, LocalCacheSettings)
+            and settings.LOCAL_CACHE_ENABLED
+        ):
+            local_cache_listener = await create_local_cache()
 
         if isinstance(settings, RedisQueueSettings):
             await create_redis_queue_pool()
 
+        rate_limit_rules_tasks = []
+        hybrid_rate_limit_flusher = None
         if isinstance(settings, RedisRateLimiterSettings):
             await create_redis_rate_limit_pool()
+            if isinstance(settings, DatabaseSettings):
+                rate_limit_rules_tasks = await create_rate_limit_rules()
+            if settings.RATE_LIMIT_HYBRID_ENABLED:
+                hybrid_rate_limit_flusher = await create_hybrid_rate_limiter()
 
         yield
 
+        if isinstance(settings, CryptSettings):
+            await security.drain_rehashes()
+
+        if hybrid_rate_limit_flusher is not None:
+            await close_hybrid_rate_limiter(hybrid_rate_limit_flusher)
+
+        for task in rate_limit_rules_tasks:
+            await _cancel_task(task)
+
+        if local_cache_listener is not None:
+            await close_local_cache(local_cache_listener)
+
+        if user_versions_listener is not None:
+            await _cancel_task(user_versions_listener)
+
+        for task in token_blacklist_tasks:
+            await _cancel_task(task)
+
+        if metrics_flusher is not None:
+            await _cancel_task(metrics_flusher)
+
         if isinstance(settings, RedisCacheSettings):
             await close_redis_cache_pool()
 
@@ -120,6 +279,7 @@ def create_application(
     settings: (
         DatabaseSettings
         | RedisCacheSettings
+        | LocalCacheSettings
         | AppSettings
         | ClientSideCacheSettings
         | RedisQueueSettings
@@ -145,10 +305,13 @@ def create_application(
 
         - AppSettings: Configures basic app metadata like name, description, contact, and license info.
         - DatabaseSettings: Adds event handlers for initializing database tables during startup.
-        - RedisCacheSettings: Sets up event handlers for creating and closing a Redis cache pool.
+        - RedisCacheSettings: Sets up event handlers for creating and closing a Redis cache pool, and for flushing
+          the cache metrics to it.
+        - LocalCacheSettings: Sets up the optional in-process cache in front of Redis and its invalidation listener.
         - ClientSideCacheSettings: Integrates middleware for client-side caching.
         - RedisQueueSettings: Sets up event handlers for creating and closing a Redis queue pool.
-        - RedisRateLimiterSettings: Sets up event handlers for creating and closing a Redis rate limiter pool.
+        - RedisRateLimiterSettings: Sets up event handlers for creating and closing a Redis rate limiter pool, and
+          the middleware enforcing the rate limits of the endpoints marked with `rate_limited`.
         - EnvironmentSettings: Conditionally sets documentation URLs and integrates custom routes for API documentation
           based on the environment type.
 
@@ -185,12 +348,18 @@ def create_application(
     lifespan = lifespan_factory(settings, create_tables_on_start=create_tables_on_start)
 
     application = FastAPI(lifespan=lifespan, **kwargs)
+    if isinstance(settings, RedisRateLimiterSettings):
+        application.add_middleware(RateLimitMiddleware, principal_ttl=settings.RATE_LIMIT_PRINCIPAL_TTL)
+
     application.add_middleware(
         CORSMiddleware,
         allow_origins = ["*"],
         allow_credentials = True,
         allow_methods = ["*"],
         allow_headers = ["*"],
+        expose_headers = [
+            "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After"
+        ],
     )
     application.include_router(router)
 
@@ -201,6 +370,10 @@ def create_application(
         if settings.ENVIRONMENT != EnvironmentOption.PRODUCTION:
             docs_router = APIRouter()
             if settings.ENVIRONMENT != EnvironmentOption.LOCAL:
+                # Imported here: importing the `api` package loads every route, which the worker, importing this
+                # module for its Redis pools, does not need.
+                from ..api.dependencies import get_current_superuser
+
                 docs_router = APIRouter(dependencies=[Depends(get_current_superuser)])
 
             @docs_router.get("/docs", include_in_schema=False)
@@ -1,17 +1,433 @@
+import asyncio
+import fnmatch
 import functools
+import hashlib
+import importlib
+import inspect
 import json
 import re
-from collections.abc import Callable
-from typing import Any
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from types import ModuleType
+from typing import Any, NamedTuple, cast
 
 from fastapi import Request, Response
 from fastapi.encoders import jsonable_encoder
 from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..db.database import local_session
 from ..exceptions.cache_exceptions import CacheIdentificationInferenceError, InvalidRequestError, MissingClientError
+from ..exceptions.http_exceptions import NotFoundException
+from ..logger import logging
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .metrics import LATENCY_BUCKETS_US, SIZE_BUCKETS_BYTES, Metrics, summarize_histogram
+
+
+def _optional_import(name: str) -> ModuleType | None:
+    """Return the module `name`, or None if the optional dependency providing it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+
+
+orjson = _optional_import("orjson")
+msgpack = _optional_import("msgpack")
+zstandard = _optional_import("zstandard")
+lz4_frame = _optional_import("lz4.frame")
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+TAG_KEY_PREFIX = "cache_tag"
+LOCK_KEY_PREFIX = "cache_lock"
+LOCK_POLL_INTERVAL = 0.05
+HOT_KEYS_KEY = "cache:hot_keys"
+HOT_KEYS_MAX_TRACKED = 1000
+
+# Errors after which a request is served without the cache instead of failing.
+REDIS_UNAVAILABLE_ERRORS = (CircuitOpenError, TimeoutError, RedisError)
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCache:
+    """In-process LRU cache with per-entry expiration, bounded by entry count and total payload size.
+
+    It sits in front of Redis so that the hottest keys are served without a network round trip. Each worker
+    process holds its own instance; entries are evicted across workers through the Redis pub/sub channel
+    `INVALIDATION_CHANNEL` (see `listen_for_invalidations`).
+
+    Parameters
+    ----------
+    max_entries: int
+        Maximum number of keys kept in memory.
+    max_bytes: int
+        Maximum total size, in bytes, of the cached payloads.
+    expiration: int
+        Default time to live, in seconds, of a local entry.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, expiration: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expiration = expiration
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes, expiration: int | None = None) -> None:
+        expiration = self.expiration if expiration is None else expiration
+        if expiration <= 0 or len(value) > self.max_bytes:
+            return
+
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + expiration, value)
+        self.size += len(value)
+
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._remove(key)
+
+    def delete_pattern(self, pattern: str) -> None:
+        for key in [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+ENVELOPE_MAGIC = 0xC5
+ENVELOPE_VERSION = 2
+ETAG_DIGEST_SIZE = 8
+
+SERIALIZER_IDS = {"json": 1, "orjson": 1, "msgpack": 2}
+NOT_FOUND_SERIALIZER_ID = 0
+COMPRESSOR_IDS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+_UNDECODABLE = object()
+
+
+def _json_dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return cast(bytes, orjson.dumps(data))
+    return json.dumps(data).encode()
+
+
+def _json_loads(payload: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _compress(compressor_id: int, payload: bytes) -> bytes:
+    # `CacheCodec` only writes with the compressors that are installed.
+    if compressor_id == COMPRESSOR_IDS["zlib"]:
+        return zlib.compress(payload)
+    if compressor_id == COMPRESSOR_IDS["zstd"] and zstandard is not None:
+        return cast(bytes, zstandard.ZstdCompressor().compress(payload))
+    if compressor_id == COMPRESSOR_IDS["lz4"] and lz4_frame is not None:
+        return cast(bytes, lz4_frame.compress(payload))
+    return payload
+
+
+def _decompress(compressor_id: int, payload: bytes) -> bytes | None:
+    if compressor_id == COMPRESSOR_IDS["none"]:
+        return payload
+    if compressor_id == COMPRESSOR_IDS["zlib"]:
+        return zlib.decompress(payload)
+    if compressor_id == COMPRESSOR_IDS["zstd"] and zstandard is not None:
+        return cast(bytes, zstandard.ZstdDecompressor().decompress(payload))
+    if compressor_id == COMPRESSOR_IDS["lz4"] and lz4_frame is not None:
+        return cast(bytes, lz4_frame.decompress(payload))
+    return None
+
+
+def _etag_digest(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=ETAG_DIGEST_SIZE).digest()
+
+
+def _format_etag(digest: bytes) -> str:
+    return f'"{digest.hex()}"'
+
+
+def compute_etag(body: bytes) -> str:
+    """Compute a strong ETag for a response body.
+
+    Parameters
+    ----------
+    body: bytes
+        The response body.
+
+    Returns
+    -------
+    str: The quoted entity tag.
+    """
+    return _format_etag(_etag_digest(body))
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an `If-None-Match` request header against an ETag, using the weak comparison of RFC 9110.
+
+    Parameters
+    ----------
+    if_none_match: str | None
+        The value of the `If-None-Match` header, if any.
+    etag: str
+        The current quoted entity tag of the resource.
+
+    Returns
+    -------
+    bool: Whether the client copy is still current and a 304 can be sent.
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class CachedNotFound(NamedTuple):
+    """A remembered `NotFoundException` outcome (negative cache entry)."""
+
+    detail: str
+
+
+class EncodedValue(NamedTuple):
+    envelope: bytes
+    payload: bytes
+    etag: str
+
+
+class CacheCodec:
+    """Encodes cached values into versioned envelopes and decodes them back.
+
+    An envelope is a 4 byte header (magic byte, envelope version, serializer id, compressor id), followed since
+    version 2 by an 8 byte digest of the uncompressed payload used as its ETag, then the payload. Readers
+    understand every envelope version, serializer and compressor they have the library for, whatever the codec
+    configured for writing, so a new codec can be rolled out without flushing the cache. Values written before
+    envelopes existed (plain JSON) are still read. Values that cannot be decoded are treated as cache misses.
+
+    Parameters
+    ----------
+    serializer: str
+        One of 'json', 'orjson' (both write JSON) or 'msgpack'.
+    compressor: str
+        One of 'none', 'zlib', 'zstd' or 'lz4'.
+    compress_min_size: int
+        Payloads smaller than this many bytes are stored uncompressed.
+    """
+
+    def __init__(self, serializer: str = "json", compressor: str = "none", compress_min_size: int = 1024) -> None:
+        if serializer not in SERIALIZER_IDS:
+            raise ValueError(f"Unknown cache serializer '{serializer}'.")
+        if compressor not in COMPRESSOR_IDS:
+            raise ValueError(f"Unknown cache compressor '{compressor}'.")
+        if (serializer == "orjson" and orjson is None) or (serializer == "msgpack" and msgpack is None):
+            raise ValueError(f"Cache serializer '{serializer}' is not installed.")
+        if (compressor == "zstd" and zstandard is None) or (compressor == "lz4" and lz4_frame is None):
+            raise ValueError(f"Cache compressor '{compressor}' is not installed.")
+
+        self.serializer = serializer
+        self.compressor = compressor
+        self.compress_min_size = compress_min_size
+
+    def encode(self, data: Any, json_body: bool = False) -> EncodedValue:
+        """Serialize and, above the size threshold, compress `data` (already passed through `jsonable_encoder`).
+
+        Parameters
+        ----------
+        data: Any
+            The JSON compatible value to encode.
+        json_body: bool, default False
+            Force JSON serialization, for values served as raw response bodies.
+
+        Returns
+        -------
+        EncodedValue: The envelope, the uncompressed payload and its ETag.
+        """
+        if self.serializer == "msgpack" and msgpack is not None and not json_body:
+            serializer_id, payload = SERIALIZER_IDS["msgpack"], msgpack.packb(data)
+        elif self.serializer == "json":
+            serializer_id, payload = SERIALIZER_IDS["json"], json.dumps(data).encode()
+        else:
+            serializer_id, payload = SERIALIZER_IDS["json"], _json_dumps(data)
+
+        compressor_id = COMPRESSOR_IDS["none"]
+        if self.compressor != "none" and len(payload) >= self.compress_min_size:
+            compressor_id = COMPRESSOR_IDS[self.compressor]
+
+        digest = _etag_digest(payload)
+        header = bytes((ENVELOPE_MAGIC, ENVELOPE_VERSION, serializer_id, compressor_id)) + digest
+        return EncodedValue(header + _compress(compressor_id, payload), payload, _format_etag(digest))
+
+    def encode_not_found(self, detail: str) -> bytes:
+        """Encode a negative cache entry remembering a `NotFoundException` with the given detail."""
+        payload = detail.encode()
+        header = bytes((ENVELOPE_MAGIC, ENVELOPE_VERSION, NOT_FOUND_SERIALIZER_ID, COMPRESSOR_IDS["none"]))
+        return header + _etag_digest(payload) + payload
+
+    def _unwrap(self, blob: bytes) -> tuple[int, bytes, bytes | None] | None:
+        if not blob or blob[0] != ENVELOPE_MAGIC:
+            return SERIALIZER_IDS["json"], blob, None
+
+        if len(blob) < 4 or blob[1] not in (1, 2):
+            return None
+
+        header_size, digest = 4, None
+        if blob[1] == 2:
+            header_size += ETAG_DIGEST_SIZE
+            digest = blob[4:header_size]
+
+        try:
+            payload = _decompress(blob[3], blob[header_size:])
+        except Exception:
+            return None
+
+        if payload is None:
+            return None
+        return blob[2], payload, digest
+
+    def decode(self, blob: bytes) -> Any:
+        """Decode an envelope into the cached value, or `_UNDECODABLE`."""
+        unwrapped = self._unwrap(blob)
+        if unwrapped is None:
+            return _UNDECODABLE
+
+        serializer_id, payload, _ = unwrapped
+        if serializer_id == NOT_FOUND_SERIALIZER_ID:
+            return CachedNotFound(payload.decode())
+        if serializer_id == SERIALIZER_IDS["json"]:
+            return _json_loads(payload)
+        if serializer_id == SERIALIZER_IDS["msgpack"] and msgpack is not None:
+            return msgpack.unpackb(payload)
+        return _UNDECODABLE
+
+    def decode_json_body(self, blob: bytes) -> tuple[bytes, str] | CachedNotFound | Any:
+        """Decode an envelope into a JSON response body and its ETag, a `CachedNotFound`, or `_UNDECODABLE`.
+
+        The ETag stored in the envelope is used as is; it is only computed for envelopes older than version 2.
+        """
+        unwrapped = self._unwrap(blob)
+        if unwrapped is None:
+            return _UNDECODABLE
+
+        serializer_id, payload, digest = unwrapped
+        if serializer_id == NOT_FOUND_SERIALIZER_ID:
+            return CachedNotFound(payload.decode())
+        if serializer_id != SERIALIZER_IDS["json"]:
+            data = self.decode(blob)
+            if data is _UNDECODABLE:
+                return _UNDECODABLE
+            payload, digest = _json_dumps(data), None
+
+        return payload, _format_etag(digest) if digest is not None else compute_etag(payload)
+
+
+class HotKeys:
+    """Lookup counts of cached calls, kept in memory and periodically added up in a Redis sorted set.
+
+    Each member identifies a call of a cached endpoint by the name of its warmer (see `warm`) and its plain
+    keyword arguments, so that the cache warming job of the worker can recompute the most requested keys.
+
+    Parameters
+    ----------
+    max_tracked: int
+        Maximum number of calls kept in Redis (and counted locally between two flushes).
+    """
+
+    def __init__(self, max_tracked: int = HOT_KEYS_MAX_TRACKED) -> None:
+        self.max_tracked = max_tracked
+        self._counts: dict[str, int] = {}
+
+    def record(self, name: str, kwargs: dict[str, Any]) -> None:
+        plain_kwargs = {k: v for k, v in kwargs.items() if isinstance(v, str | int | float | bool)}
+        member = json.dumps({"name": name, "kwargs": plain_kwargs}, sort_keys=True)
+        if member in self._counts or len(self._counts) < self.max_tracked:
+            self._counts[member] = self._counts.get(member, 0) + 1
+
+    async def flush(self, client: Redis, breaker: CircuitBreaker) -> None:
+        """Add the local counts to the totals in Redis, keeping only the `max_tracked` most requested calls."""
+        counts, self._counts = self._counts, {}
+        if not counts:
+            return
+
+        pipe = client.pipeline(transaction=False)
+        for member, amount in counts.items():
+            pipe.zincrby(HOT_KEYS_KEY, amount, member)
+        pipe.zremrangebyrank(HOT_KEYS_KEY, 0, -self.max_tracked - 1)
+
+        try:
+            await breaker.call(pipe.execute())
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Could not flush hot cache keys: {e}")
+
+    async def top(self, client: Redis, breaker: CircuitBreaker, count: int) -> list[tuple[str, dict[str, Any]]]:
+        """Return the warmer name and keyword arguments of the `count` most requested calls."""
+        members = await breaker.call(client.zrevrange(HOT_KEYS_KEY, 0, count - 1))
+        calls = []
+        for member in members:
+            call = json.loads(member)
+            calls.append((call["name"], call["kwargs"]))
+        return calls
+
+    async def decay(self, client: Redis, breaker: CircuitBreaker, factor: float = 0.5) -> None:
+        """Scale down all counts, so that keys that stopped being requested eventually leave the top."""
+        await breaker.call(client.zunionstore(HOT_KEYS_KEY, {HOT_KEYS_KEY: factor}))
+
 
 pool: ConnectionPool | None = None
 client: Redis | None = None
+local_cache: LocalCache | None = None
+codec = CacheCodec()
+metrics = Metrics("cache")
+breaker = CircuitBreaker("cache")
+hot_keys = HotKeys()
+
+_in_flight: dict[str, asyncio.Future] = {}
+_background_tasks: set[asyncio.Task] = set()
+_warmers: dict[str, Callable[[AsyncSession, dict[str, Any], int], Awaitable[bool]]] = {}
+_static_warm_calls: list[tuple[str, dict[str, Any]]] = []
+_warming: ContextVar[bool] = ContextVar("cache_warming", default=False)
 
 
 def _infer_resource_id(kwargs: dict[str, Any], resource_id_type: type | tuple[type, ...]) -> int | str:
@@ -176,9 +592,582 @@ async def _delete_keys_by_pattern(pattern: str) -> None:
 
     cursor = -1
     while cursor != 0:
-        cursor, keys = await client.scan(cursor, match=pattern, count=100)
+        cursor, keys = await breaker.call(client.scan(cursor, match=pattern, count=100))
         if keys:
-            await client.delete(*keys)
+            await breaker.call(client.delete(*keys))
+
+
+def _tag_key(tag: str) -> str:
+    return f"{TAG_KEY_PREFIX}:{tag}"
+
+
+def _format_tags(tags: list[str], kwargs: dict[str, Any]) -> list[str]:
+    """Format tag templates using keyword arguments.
+
+    Parameters
+    ----------
+    tags: List[str]
+        Tag templates, e.g. '{username}_posts'.
+    kwargs: Dict[str, Any]
+        A dictionary of keyword arguments.
+
+    Returns
+    -------
+    List[str]: The formatted tags.
+    """
+    return [_format_prefix(tag, kwargs) for tag in tags]
+
+
+async def _set_tagged(key: str, value: str | bytes, expiration: int, tags: list[str]) -> None:
+    """Store a value and register its key under the given tags in a single pipelined call.
+
+    Each tag is a Redis set holding the keys written under it. The set expires together with the
+    longest-lived key registered in it, so it never outlives the data it points to by more than one write.
+
+    Parameters
+    ----------
+    key: str
+        The cache key.
+    value: str | bytes
+        The serialized value.
+    expiration: int
+        The expiration time for the cached data in seconds.
+    tags: List[str]
+        Formatted tags the key is registered under.
+    """
+    if client is None:
+        raise MissingClientError
+
+    pipe = client.pipeline(transaction=False)
+    pipe.set(key, value, ex=expiration)
+    for tag in tags:
+        tag_key = _tag_key(tag)
+        pipe.sadd(tag_key, key)
+        pipe.expire(tag_key, expiration, nx=True)
+        pipe.expire(tag_key, expiration, gt=True)
+    await pipe.execute()
+
+
+async def _delete_keys_and_tags(keys: list[str], tags: list[str]) -> list[str]:
+    """Delete exact keys and every key registered under the given tags.
+
+    Tag members are read in one pipelined call and deleted, together with `keys` and the tag sets
+    themselves, in a second one; no keyspace scan is involved.
+
+    Parameters
+    ----------
+    keys: List[str]
+        Exact cache keys to delete.
+    tags: List[str]
+        Formatted tags whose keys are deleted.
+
+    Returns
+    -------
+    List[str]: Every cache key that was deleted (excluding the tag sets).
+    """
+    if client is None:
+        raise MissingClientError
+
+    to_delete = list(keys)
+    if tags:
+        pipe = client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.smembers(_tag_key(tag))
+        for members in await pipe.execute():
+            to_delete.extend(member.decode() for member in members)
+
+    tag_keys = [_tag_key(tag) for tag in tags]
+    if to_delete or tag_keys:
+        await client.delete(*to_delete, *tag_keys)
+
+    return to_delete
+
+
+async def invalidate_tags(*tags: str) -> None:
+    """Delete every cache key registered under the given (formatted) tags, e.g. from plain code paths.
+
+    Parameters
+    ----------
+    *tags: str
+        Formatted tags, e.g. 'alice_posts'.
+    """
+    try:
+        deleted_keys = await breaker.call(_delete_keys_and_tags([], list(tags)))
+        await _publish_invalidation(deleted_keys, [])
+    except REDIS_UNAVAILABLE_ERRORS as e:
+        logger.warning(f"Could not invalidate cache tags {list(tags)}: {e!r}")
+
+
+async def invalidate_keys(*keys: str) -> None:
+    """Delete the given cache keys, e.g. negative entries once the missing resource is created.
+
+    Parameters
+    ----------
+    *keys: str
+        Exact cache keys, e.g. 'user:alice'.
+    """
+    try:
+        await breaker.call(_delete_keys_and_tags(list(keys), []))
+        await _publish_invalidation(list(keys), [])
+    except REDIS_UNAVAILABLE_ERRORS as e:
+        if local_cache is not None:
+            local_cache.delete(*keys)
+        logger.warning(f"Could not invalidate cache keys {list(keys)}: {e!r}")
+
+
+async def cache_not_found(key: str, detail: str, expiration: int, tags: list[str] | None = None) -> None:
+    """Remember that a lookup raised `NotFoundException`, for code paths not using the `cache` decorator.
+
+    Parameters
+    ----------
+    key: str
+        The cache key of the lookup.
+    detail: str
+        The detail of the `NotFoundException` to raise again on the next lookups.
+    expiration: int
+        How long, in seconds, the outcome is remembered. Keep it short: the resource may be created elsewhere.
+    tags: List[str] | None, optional
+        Formatted tags to register the key under.
+    """
+    try:
+        await breaker.call(_set_tagged(key, codec.encode_not_found(detail), expiration, tags or []))
+    except REDIS_UNAVAILABLE_ERRORS as e:
+        logger.warning(f"Could not cache not found outcome of {key}: {e!r}")
+
+
+async def get_cached_not_found(key: str) -> str | None:
+    """Return the detail of a remembered `NotFoundException` for `key`, or None if none is cached.
+
+    Parameters
+    ----------
+    key: str
+        The cache key of the lookup.
+    """
+    if client is None:
+        raise MissingClientError
+
+    try:
+        cached_data = await breaker.call(client.get(key))
+    except REDIS_UNAVAILABLE_ERRORS:
+        return None
+    if not cached_data:
+        return None
+
+    cached_value = codec.decode(cached_data)
+    return cached_value.detail if isinstance(cached_value, CachedNotFound) else None
+
+
+async def _publish_invalidation(keys: list[str], patterns: list[str]) -> None:
+    """Evict keys and patterns from the local cache of this worker and notify the other workers.
+
+    Parameters
+    ----------
+    keys: List[str]
+        Exact cache keys that were deleted from Redis.
+    patterns: List[str]
+        Glob patterns of cache keys that were deleted from Redis.
+    """
+    if local_cache is None:
+        return
+
+    local_cache.delete(*keys)
+    for pattern in patterns:
+        local_cache.delete_pattern(pattern)
+
+    if client is None:
+        raise MissingClientError
+
+    await breaker.call(client.publish(INVALIDATION_CHANNEL, json.dumps({"keys": keys, "patterns": patterns})))
+
+
+def _apply_invalidation(message: dict[str, Any]) -> None:
+    if local_cache is None or message.get("type") != "message":
+        return
+
+    try:
+        payload = json.loads(message["data"])
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring malformed cache invalidation message: {message['data']!r}")
+        return
+
+    local_cache.delete(*payload.get("keys", []))
+    for pattern in payload.get("patterns", []):
+        local_cache.delete_pattern(pattern)
+
+
+async def listen_for_invalidations() -> None:
+    """Keep the local cache of this worker consistent with invalidations published by other workers.
+
+    Runs until cancelled. If the subscription drops, the local cache is cleared (messages may have been missed)
+    and the subscription is re-established.
+    """
+    if client is None:
+        raise MissingClientError
+
+    while True:
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                _apply_invalidation(message)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Cache invalidation subscription lost: {e}")
+            if local_cache is not None:
+                local_cache.clear()
+            await asyncio.sleep(1)
+
+        finally:
+            await pubsub.aclose()
+
+
+async def _get_cached(
+    key: str, key_prefix: str, local_expiration: int, stale_while_revalidate: int
+) -> tuple[bytes | None, bool]:
+    """Read a cached value from the local cache, falling back to Redis.
+
+    Parameters
+    ----------
+    key: str
+        The cache key.
+    key_prefix: str
+        The `key_prefix` template of the key, used to label metrics.
+    local_expiration: int
+        Time to live of the local entry written on a Redis hit.
+    stale_while_revalidate: int
+        Length, in seconds, of the window at the end of the Redis TTL during which a value is served but
+        considered stale.
+
+    Returns
+    -------
+    Tuple[bytes | None, bool]: The cached value, if any, and whether it is stale.
+    """
+    if client is None:
+        raise MissingClientError
+
+    if local_cache is not None:
+        local_value = local_cache.get(key)
+        if local_value is not None:
+            metrics.incr(key_prefix, "local_hits")
+            return local_value, False
+
+    with metrics.timer(key_prefix, "read_latency_us"):
+        if stale_while_revalidate:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            value, ttl = await breaker.call(pipe.execute())
+            is_stale = value is not None and 0 <= ttl <= stale_while_revalidate
+        else:
+            value, is_stale = await breaker.call(client.get(key)), False
+
+    if value and not is_stale and local_cache is not None:
+        local_cache.set(key, value, local_expiration)
+
+    return value, is_stale
+
+
+async def _single_flight(key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Coalesce concurrent loads of the same key within this process.
+
+    The first caller starts `load` as a task; callers arriving while it runs await the same task instead of
+    starting their own. The task is shielded so that a cancelled caller does not abort the load for the others.
+
+    Parameters
+    ----------
+    key: str
+        The cache key being loaded.
+    load: Callable[[], Awaitable[Any]]
+        Coroutine function computing (and caching) the value.
+
+    Returns
+    -------
+    Any: The loaded value.
+    """
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(load())
+        _in_flight[key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+    return await asyncio.shield(future)
+
+
+async def _load_with_lock(
+    key: str, lock_timeout: float, load: Callable[[], Awaitable[Any]], decode: Callable[[bytes], Any]
+) -> Any:
+    """Coalesce loads of the same key across workers with a Redis lock.
+
+    The worker that acquires the lock runs `load`; the others poll the cache key until the value shows up or
+    `lock_timeout` elapses, in which case they load it themselves.
+
+    Parameters
+    ----------
+    key: str
+        The cache key being loaded.
+    lock_timeout: float
+        Lifetime of the lock, and maximum time spent waiting for another worker, in seconds.
+    load: Callable[[], Awaitable[Any]]
+        Coroutine function computing (and caching) the value.
+    decode: Callable[[bytes], Any]
+        Turns a value written by another worker into what `load` returns, or `_UNDECODABLE`.
+
+    Returns
+    -------
+    Any: The loaded value.
+    """
+    if client is None:
+        raise MissingClientError
+
+    lock_key = f"{LOCK_KEY_PREFIX}:{key}"
+    token = uuid.uuid4().hex
+    try:
+        acquired = await breaker.call(client.set(lock_key, token, nx=True, px=int(lock_timeout * 1000)))
+    except REDIS_UNAVAILABLE_ERRORS:
+        return await load()
+
+    if acquired:
+        try:
+            return await load()
+        finally:
+            try:
+                await breaker.call(cast(Awaitable[int], client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)))
+            except REDIS_UNAVAILABLE_ERRORS:
+                pass
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        try:
+            cached_data = await breaker.call(client.get(key))
+        except REDIS_UNAVAILABLE_ERRORS:
+            break
+        if cached_data:
+            value = decode(cached_data)
+            if value is not _UNDECODABLE:
+                return value
+
+    return await load()
+
+
+def _schedule_refresh(key: str, refresh: Callable[[AsyncSession], Awaitable[Any]]) -> None:
+    """Refresh a stale key in the background, unless a load of that key is already running.
+
+    The refresh runs after the request that triggered it has finished, so it gets its own database session.
+    """
+    if key in _in_flight:
+        return
+
+    async def _run() -> None:
+        try:
+            async with local_session() as db:
+                await _single_flight(key, lambda: refresh(db))
+        except Exception as e:
+            logger.warning(f"Background refresh of cache key {key} failed: {e}")
+
+    task = asyncio.create_task(_run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _warmer_name(func: Callable) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def static_warm_calls() -> list[tuple[str, dict[str, Any]]]:
+    """Return the warmer name and keyword arguments of the calls declared with `warm_kwargs`."""
+    return list(_static_warm_calls)
+
+
+async def warm(name: str, kwargs: dict[str, Any], db: AsyncSession, min_ttl: int = 0) -> bool:
+    """Recompute and store the cached value of a call of a cached endpoint.
+
+    Parameters
+    ----------
+    name: str
+        The warmer name of the endpoint, as returned by `static_warm_calls` or `HotKeys.top`.
+    kwargs: Dict[str, Any]
+        Keyword arguments of the call, besides the request and the database session; defaults are applied.
+    db: AsyncSession
+        The database session passed to the endpoint.
+    min_ttl: int, default 0
+        Keys that are cached for more than `min_ttl` seconds are left as they are.
+
+    Returns
+    -------
+    bool: Whether the value was recomputed.
+
+    Raises
+    ------
+    KeyError: If no cached endpoint is registered under `name`.
+    """
+    return await _warmers[name](db, kwargs, min_ttl)
+
+
+class _CachePolicy(NamedTuple):
+    """Options of a `cache` decorated endpoint that drive how its GET requests are served."""
+
+    key_prefix: str
+    expiration: int
+    local_expiration: int | None
+    stale_while_revalidate: int
+    lock_timeout: float | None
+    raw_response: bool
+    negative_expiration: int | None
+
+    def local_ttl(self) -> int:
+        if self.local_expiration is not None:
+            return min(self.local_expiration, self.expiration)
+        if local_cache is not None:
+            return min(local_cache.expiration, self.expiration)
+        return 0
+
+    def decode(self, cached_data: bytes) -> Any:
+        return codec.decode_json_body(cached_data) if self.raw_response else codec.decode(cached_data)
+
+    def respond(self, request: Request, value: Any) -> Any:
+        if isinstance(value, CachedNotFound):
+            raise NotFoundException(value.detail)
+
+        if not self.raw_response:
+            return value
+
+        body, etag = value
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            metrics.incr(self.key_prefix, "not_modified")
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+async def _compute(
+    policy: _CachePolicy,
+    key: str,
+    tags: list[str],
+    call: Callable[[dict[str, Any]], Awaitable[Any]],
+    call_kwargs: dict[str, Any],
+) -> Any:
+    """Call a cached endpoint and store its result, or its `NotFoundException` with `negative_expiration`.
+
+    Returns
+    -------
+    Any: What `_CachePolicy.respond` expects, i.e. the result, or its body and ETag with `raw_response`.
+    """
+    try:
+        result = await call(call_kwargs)
+    except NotFoundException as e:
+        if policy.negative_expiration is not None:
+            metrics.incr(policy.key_prefix, "negative_writes")
+            await cache_not_found(key, str(e.detail), policy.negative_expiration, tags)
+        raise
+
+    serialized_data, payload, etag = codec.encode(jsonable_encoder(result), json_body=policy.raw_response)
+    metrics.incr(policy.key_prefix, "raw_bytes", len(payload))
+    metrics.incr(policy.key_prefix, "stored_bytes", len(serialized_data))
+    metrics.observe(policy.key_prefix, "payload_bytes", len(serialized_data), SIZE_BUCKETS_BYTES)
+    try:
+        with metrics.timer(policy.key_prefix, "write_latency_us"):
+            await breaker.call(
+                _set_tagged(key, serialized_data, policy.expiration + policy.stale_while_revalidate, tags)
+            )
+    except REDIS_UNAVAILABLE_ERRORS:
+        metrics.incr(policy.key_prefix, "write_errors")
+    else:
+        if local_cache is not None:
+            local_cache.set(key, serialized_data, policy.local_ttl())
+
+    return (payload, etag) if policy.raw_response else result
+
+
+async def _serve_cached(
+    policy: _CachePolicy,
+    request: Request,
+    name: str,
+    key: str,
+    tags: list[str],
+    call: Callable[[dict[str, Any]], Awaitable[Any]],
+    kwargs: dict[str, Any],
+) -> Any:
+    """Serve a GET request of a cached endpoint from the cache, calling the endpoint on misses.
+
+    Stale values are served while a background task refreshes them. Misses are loaded once per worker, or once
+    across workers with `lock_timeout`. While Redis is unavailable the endpoint is called without the cache.
+    Only calls that returned a value count towards `hot_keys`, so that warming skips lookups of missing resources.
+    """
+    if _warming.get():
+        return await _compute(policy, key, tags, call, kwargs)
+
+    try:
+        cached_data, is_stale = await _get_cached(
+            key, policy.key_prefix, policy.local_ttl(), policy.stale_while_revalidate
+        )
+    except REDIS_UNAVAILABLE_ERRORS:
+        metrics.incr(policy.key_prefix, "bypassed")
+        return await call(kwargs)
+    cached_value = policy.decode(cached_data) if cached_data else _UNDECODABLE
+    if isinstance(cached_value, CachedNotFound):
+        metrics.incr(policy.key_prefix, "negative_hits")
+        return policy.respond(request, cached_value)
+
+    if cached_value is not _UNDECODABLE:
+        metrics.incr(policy.key_prefix, "hits")
+        hot_keys.record(name, kwargs)
+        if is_stale:
+            metrics.incr(policy.key_prefix, "stale_hits")
+
+            async def _refresh(db: AsyncSession) -> Any:
+                refresh_kwargs = {k: db if isinstance(v, AsyncSession) else v for k, v in kwargs.items()}
+                return await _compute(policy, key, tags, call, refresh_kwargs)
+
+            _schedule_refresh(key, _refresh)
+        return policy.respond(request, cached_value)
+
+    metrics.incr(policy.key_prefix, "misses")
+
+    async def _load() -> Any:
+        if policy.lock_timeout is not None:
+            return await _load_with_lock(
+                key, policy.lock_timeout, lambda: _compute(policy, key, tags, call, kwargs), policy.decode
+            )
+        return await _compute(policy, key, tags, call, kwargs)
+
+    value = await _single_flight(key, _load)
+    if not isinstance(value, CachedNotFound):
+        hot_keys.record(name, kwargs)
+    return policy.respond(request, value)
+
+
+async def _invalidate_after_write(key_prefix: str, keys: list[str], tags: list[str], patterns: list[str]) -> None:
+    """Drop the keys written by a cached endpoint, in Redis and in the local caches of every worker.
+
+    Parameters
+    ----------
+    key_prefix: str
+        The `key_prefix` template of the endpoint, used to label metrics.
+    keys: List[str]
+        Keys to delete.
+    tags: List[str]
+        Tags whose keys are deleted.
+    patterns: List[str]
+        Patterns of keys to delete, scanning the keyspace.
+    """
+    try:
+        invalidated_keys = await breaker.call(_delete_keys_and_tags(keys, tags))
+        for pattern in patterns:
+            await _delete_keys_by_pattern(pattern)
+
+        await _publish_invalidation(invalidated_keys, patterns)
+    except REDIS_UNAVAILABLE_ERRORS as e:
+        if local_cache is not None:
+            local_cache.delete(*keys)
+        logger.warning(f"Could not invalidate cache keys {keys}: {e!r}")
+        metrics.incr(key_prefix, "invalidation_errors")
+        return
+
+    metrics.incr(key_prefix, "invalidations")
+    metrics.incr(key_prefix, "invalidated_keys", len(invalidated_keys))
 
 
 def cache(
@@ -188,6 +1177,15 @@ def cache(
     resource_id_type: type | tuple[type, ...] = int,
     to_invalidate_extra: dict[str, Any] | None = None,
     pattern_to_invalidate_extra: list[str] | None = None,
+    local_expiration: int | None = None,
+    tags: list[str] | None = None,
+    tags_to_invalidate: list[str] | None = None,
+    stale_while_revalidate: int = 0,
+    lock_timeout: float | None = None,
+    raw_response: bool = False,
+    negative_expiration: int | None = None,
+    static_key: bool = False,
+    warm_kwargs: list[dict[str, Any]] | None = None,
 ) -> Callable:
     """Cache decorator for FastAPI endpoints.
 
@@ -213,6 +1211,37 @@ def cache(
     pattern_to_invalidate_extra: List[str] | None, optional
         A list of string patterns for cache keys that should be invalidated when the decorated function is called.
         This allows for bulk invalidation of cache keys based on a matching pattern.
+    local_expiration: int | None, optional
+        Time to live, in seconds, of the entry in the in-process cache that is consulted before Redis.
+        Defaults to `LOCAL_CACHE_EXPIRATION` (capped by `expiration`); 0 skips the in-process cache for this endpoint.
+        Only used when the in-process cache is enabled (`LOCAL_CACHE_ENABLED`).
+    tags: List[str] | None, optional
+        Templates of tags the cache key is registered under when it is written on GET requests, e.g.
+        '{username}_posts'. Tagged keys can be invalidated together without scanning the keyspace.
+    tags_to_invalidate: List[str] | None, optional
+        Templates of tags whose keys are invalidated when the decorated function is called with a method
+        other than GET. Prefer this over `pattern_to_invalidate_extra`, which is kept as a fallback.
+    stale_while_revalidate: int, optional
+        Number of seconds after `expiration` during which the stale value is still served while a single
+        background task recomputes it. Defaults to 0 (disabled).
+    lock_timeout: float | None, optional
+        When set, a cache miss takes a Redis lock so that only one worker recomputes the value; the others wait
+        up to `lock_timeout` seconds for it. Concurrent misses within one worker are always coalesced.
+    raw_response: bool, default False
+        Return the cached JSON body bytes directly as a `Response` instead of a decoded object, skipping
+        `response_model` validation and re-encoding on both hits and misses. Only use it on endpoints whose return
+        value is already shaped like their `response_model` (e.g. fetched with `schema_to_select`). Responses carry
+        the ETag stored with the value, and requests whose `If-None-Match` matches it get an empty 304.
+    negative_expiration: int | None, optional
+        When set, a `NotFoundException` raised by the decorated function is remembered for this many seconds and
+        raised again without calling it. Clear the entry (`invalidate_keys`, `invalidate_tags`) when the missing
+        resource is created.
+    static_key: bool, default False
+        Use the formatted `key_prefix` alone as the cache key, for endpoints without a resource ID (e.g. full lists).
+    warm_kwargs: List[Dict[str, Any]] | None, optional
+        Keyword arguments (besides the request and the database session) of calls recomputed by every cache
+        warming run of the worker, whether they are requested or not. Other calls of cached GET endpoints are
+        warmed when they are among the most requested ones.
 
     Returns
     -------
@@ -278,58 +1307,151 @@ def cache(
     Note
     ----
     - resource_id_type is used only if resource_id is not passed.
-    - `to_invalidate_extra` and `pattern_to_invalidate_extra` are used for cache invalidation on methods other than GET.
+    - `to_invalidate_extra`, `tags_to_invalidate` and `pattern_to_invalidate_extra` are used for cache invalidation
+      on methods other than GET.
     - Using `pattern_to_invalidate_extra` can be resource-intensive on large datasets. Use it judiciously and
       consider the potential impact on Redis performance.
+    - When the in-process cache is enabled, a local entry may outlive its Redis key by at most its local
+      expiration if an invalidation message is lost.
+    - Redis calls go through `breaker`: while Redis fails, times out or the breaker is open, GET requests are
+      served by the endpoint without the cache, and failed invalidations are logged; the affected keys then
+      expire with their TTL.
     """
 
+    policy = _CachePolicy(
+        key_prefix=key_prefix,
+        expiration=expiration,
+        local_expiration=local_expiration,
+        stale_while_revalidate=stale_while_revalidate,
+        lock_timeout=lock_timeout,
+        raw_response=raw_response,
+        negative_expiration=negative_expiration,
+    )
+
     def wrapper(func: Callable) -> Callable:
-        @functools.wraps(func)
-        async def inner(request: Request, *args: Any, **kwargs: Any) -> Response:
-            if client is None:
-                raise MissingClientError
+        name = _warmer_name(func)
+        signature = inspect.signature(func)
+
+        def _cache_key(kwargs: dict[str, Any]) -> str:
+            formatted_key_prefix = _format_prefix(key_prefix, kwargs)
+            if static_key:
+                return formatted_key_prefix
 
             if resource_id_name:
                 resource_id = kwargs[resource_id_name]
             else:
                 resource_id = _infer_resource_id(kwargs=kwargs, resource_id_type=resource_id_type)
+            return f"{formatted_key_prefix}:{resource_id}"
 
-            formatted_key_prefix = _format_prefix(key_prefix, kwargs)
-            cache_key = f"{formatted_key_prefix}:{resource_id}"
+        @functools.wraps(func)
+        async def inner(request: Request, *args: Any, **kwargs: Any) -> Response:
+            if client is None:
+                raise MissingClientError
+
+            cache_key = _cache_key(kwargs)
             if request.method == "GET":
-                if to_invalidate_extra is not None or pattern_to_invalidate_extra is not None:
+                if (
+                    to_invalidate_extra is not None
+                    or pattern_to_invalidate_extra is not None
+                    or tags_to_invalidate is not None
+                ):
                     raise InvalidRequestError
 
-                cached_data = await client.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data.decode())
+                async def _call(call_kwargs: dict[str, Any]) -> Any:
+                    return await func(request, *args, **call_kwargs)
 
-            result = await func(request, *args, **kwargs)
+                tags_to_set = _format_tags(tags or [], kwargs)
+                return await _serve_cached(policy, request, name, cache_key, tags_to_set, _call, kwargs)
 
-            if request.method == "GET":
-                serializable_data = jsonable_encoder(result)
-                serialized_data = json.dumps(serializable_data)
-
-                await client.set(cache_key, serialized_data)
-                await client.expire(cache_key, expiration)
+            result = await func(request, *args, **kwargs)
 
-                serialized_data = json.loads(serialized_data)
+            formatted_extra = _format_extra_data(to_invalidate_extra or {}, kwargs)
+            await _invalidate_after_write(
+                key_prefix,
+                [cache_key, *(f"{prefix}:{id}" for prefix, id in formatted_extra.items())],
+                _format_tags(tags_to_invalidate or [], kwargs),
+                [_format_prefix(pattern, kwargs) + "*" for pattern in pattern_to_invalidate_extra or []],
+            )
+            return result
 
-            else:
-                await client.delete(cache_key)
-                if to_invalidate_extra is not None:
-                    formatted_extra = _format_extra_data(to_invalidate_extra, kwargs)
-                    for prefix, id in formatted_extra.items():
-                        extra_cache_key = f"{prefix}:{id}"
-                        await client.delete(extra_cache_key)
-
-                if pattern_to_invalidate_extra is not None:
-                    for pattern in pattern_to_invalidate_extra:
-                        formatted_pattern = _format_prefix(pattern, kwargs)
-                        await _delete_keys_by_pattern(formatted_pattern + "*")
+        async def _warm(db: AsyncSession, call_kwargs: dict[str, Any], min_ttl: int) -> bool:
+            if client is None:
+                raise MissingClientError
 
-            return result
+            request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+            bound = signature.bind_partial(request, **call_kwargs)
+            bound.apply_defaults()
+            kwargs = {k: v for k, v in bound.arguments.items() if k != "request"}
+            if "db" in signature.parameters:
+                kwargs["db"] = db
+
+            key = _cache_key(kwargs)
+            pipe = client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            cached_data, ttl = await breaker.call(pipe.execute())
+            if cached_data and isinstance(policy.decode(cached_data), CachedNotFound):
+                return False
+            if min_ttl > 0 and ttl > min_ttl:
+                return False
+
+            token = _warming.set(True)
+            try:
+                await inner(request, **kwargs)
+            except NotFoundException:
+                # The resource was deleted since the call was recorded: there is nothing to warm.
+                return False
+            finally:
+                _warming.reset(token)
+
+            metrics.incr(key_prefix, "warmed")
+            return True
+
+        _warmers[name] = _warm
+        _static_warm_calls.extend((name, dict(call_kwargs)) for call_kwargs in warm_kwargs or [])
 
         return inner
 
     return wrapper
+
+
+async def metrics_report() -> dict[str, dict[str, Any]]:
+    """Summarize the cache metrics of all workers per `key_prefix` template.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]: For each `key_prefix` template, hit/miss counts and ratio, invalidation counts,
+    requests served without the cache and failed writes and invalidations while Redis was unavailable,
+    Redis read and write latency histograms (microseconds), stored payload size histogram (bytes) and the
+    fraction of bytes saved by the codec.
+    """
+    if client is None:
+        raise MissingClientError
+
+    report: dict[str, dict[str, Any]] = {}
+    for key_prefix, values in (await metrics.collect(client, breaker)).items():
+        hits, misses = values.get("hits", 0), values.get("misses", 0)
+        raw_bytes, stored_bytes = values.get("raw_bytes", 0), values.get("stored_bytes", 0)
+        report[key_prefix] = {
+            "hits": hits,
+            "local_hits": values.get("local_hits", 0),
+            "stale_hits": values.get("stale_hits", 0),
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "negative_hits": values.get("negative_hits", 0),
+            "negative_writes": values.get("negative_writes", 0),
+            "warmed": values.get("warmed", 0),
+            "invalidations": values.get("invalidations", 0),
+            "invalidated_keys": values.get("invalidated_keys", 0),
+            "bypassed": values.get("bypassed", 0),
+            "write_errors": values.get("write_errors", 0),
+            "invalidation_errors": values.get("invalidation_errors", 0),
+            "read_latency_us": summarize_histogram(values, "read_latency_us", LATENCY_BUCKETS_US),
+            "write_latency_us": summarize_histogram(values, "write_latency_us", LATENCY_BUCKETS_US),
+            "payload_bytes": summarize_histogram(values, "payload_bytes", SIZE_BUCKETS_BYTES),
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "savings_ratio": round(1 - stored_bytes / raw_bytes, 4) if raw_bytes else None,
+        }
+
+    return report
@@ -0,0 +1,99 @@
+"""Cached reads served by the API endpoints and recomputed by the cache warming job of the worker.
+
+Decorating a function with `cache` registers its warmer, so the worker only needs to import this module, not the
+API routes (and every dependency they pull in), to warm the cached endpoints. Each read takes the request first, as
+`cache` requires, and is called by its endpoint with keyword arguments only, from which the cache key is built.
+"""
+
+from typing import Any
+
+from fastapi import Request
+from fastcrud.paginated import compute_offset, paginated_response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...crud.crud_posts import crud_posts
+from ...crud.crud_tier import crud_tiers
+from ...crud.pased_data.grant import crud_grant
+from ...schemas.post import PostRead
+from ...schemas.tier import TierRead
+from ...schemas.user import UserRead
+from ..exceptions.http_exceptions import NotFoundException
+from .cache import cache
+from .user_cache import get_user
+
+
+@cache(
+    key_prefix="tiers:page_{page}",
+    resource_id_name="items_per_page",
+    tags=["tiers"],
+    raw_response=True,
+    warm_kwargs=[{"page": 1, "items_per_page": 10}],
+)
+async def read_tiers(request: Request, db: AsyncSession, page: int = 1, items_per_page: int = 10) -> dict:
+    tiers_data = await crud_tiers.get_multi(
+        db=db, offset=compute_offset(page, items_per_page), limit=items_per_page, schema_to_select=TierRead
+    )
+
+    response: dict[str, Any] = paginated_response(crud_data=tiers_data, page=page, items_per_page=items_per_page)
+    return response
+
+
+@cache(key_prefix="tier", resource_id_name="name", raw_response=True, negative_expiration=30)
+async def read_tier(request: Request, name: str, db: AsyncSession) -> dict:
+    db_tier: TierRead | None = await crud_tiers.get(db=db, schema_to_select=TierRead, name=name)
+    if db_tier is None:
+        raise NotFoundException("Tier not found")
+
+    return db_tier
+
+
+@cache(
+    key_prefix="{username}_posts:page_{page}:items_per_page:{items_per_page}",
+    resource_id_name="username",
+    expiration=60,
+    tags=["{username}_posts"],
+    stale_while_revalidate=30,
+    lock_timeout=2,
+    raw_response=True,
+    negative_expiration=30,
+)
+async def read_posts(
+    request: Request, username: str, db: AsyncSession, page: int = 1, items_per_page: int = 10
+) -> dict:
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
+    if not db_user:
+        raise NotFoundException("User not found")
+
+    posts_data = await crud_posts.get_multi(
+        db=db,
+        offset=compute_offset(page, items_per_page),
+        limit=items_per_page,
+        schema_to_select=PostRead,
+        created_by_user_id=db_user["id"],
+        is_deleted=False,
+    )
+
+    response: dict[str, Any] = paginated_response(crud_data=posts_data, page=page, items_per_page=items_per_page)
+    return response
+
+
+@cache(key_prefix="{username}_post_cache", resource_id_name="id", raw_response=True, negative_expiration=30)
+async def read_post(request: Request, username: str, id: int, db: AsyncSession) -> dict:
+    db_user = await get_user(db, schema_to_select=UserRead, username=username)
+    if db_user is None:
+        raise NotFoundException("User not found")
+
+    db_post: PostRead | None = await crud_posts.get(
+        db=db, schema_to_select=PostRead, id=id, created_by_user_id=db_user["id"], is_deleted=False
+    )
+    if db_post is None:
+        raise NotFoundException("Post not found")
+
+    return db_post
+
+
+# Grants are written by the parser, outside of this API, so no write invalidates the cached list: it is only kept
+# for a minute (see `get_grants`).
+@cache(key_prefix="grants", static_key=True, expiration=60)
+async def read_grants(request: Request, db: AsyncSession) -> Any:
+    return await crud_grant.get_multi(db)
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections.abc import Awaitable
+from typing import Any, TypeVar
+
+from ..logger import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Per-call timeout and circuit breaker in front of a dependency such as a Redis instance.
+
+    Every call gets `call_timeout` seconds. After `failure_threshold` consecutive failures (errors or timeouts)
+    the breaker opens and calls fail immediately with `CircuitOpenError` for `reset_timeout` seconds; then a
+    single probe call is let through, which closes the breaker if it succeeds and opens it again otherwise.
+
+    Parameters
+    ----------
+    name: str
+        Name of the protected dependency, used in logs and in `snapshot`.
+    call_timeout: float, optional
+        Maximum duration of a call, in seconds. Defaults to 0.1.
+    failure_threshold: int, optional
+        Number of consecutive failures that opens the breaker. Defaults to 5.
+    reset_timeout: float, optional
+        Time, in seconds, before an open breaker lets a probe call through. Defaults to 10.
+    """
+
+    def __init__(
+        self, name: str, call_timeout: float = 0.1, failure_threshold: int = 5, reset_timeout: float = 10
+    ) -> None:
+        self.name = name
+        self.call_timeout = call_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.times_opened = 0
+        self.rejected_calls = 0
+        self.timed_out_calls = 0
+        self._probe_in_flight = False
+
+    def _allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN and self.opened_at is not None:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = HALF_OPEN
+
+        if self._probe_in_flight:
+            return False
+
+        self._probe_in_flight = True
+        return True
+
+    def _record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Circuit breaker '{self.name}' closed.")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def _record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"Circuit breaker '{self.name}' opened after {self.consecutive_failures} failures.")
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable` within the call timeout, or raise `CircuitOpenError` without awaiting it.
+
+        Raises
+        ------
+        CircuitOpenError: If the breaker is open.
+        TimeoutError: If the call took longer than `call_timeout`.
+        Exception: Any error raised by the call.
+        """
+        if not self._allow():
+            self.rejected_calls += 1
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise CircuitOpenError(f"Circuit breaker '{self.name}' is open.")
+
+        try:
+            result = await asyncio.wait_for(awaitable, timeout=self.call_timeout)
+        except TimeoutError:
+            self.timed_out_calls += 1
+            self._record_failure()
+            raise
+        except Exception:
+            self._record_failure()
+            raise
+        except BaseException:
+            self._probe_in_flight = False
+            raise
+
+        self._record_success()
+        return result
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 3) if self.opened_at is not None else None,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected_calls,
+            "timed_out_calls": self.timed_out_calls,
+            "call_timeout": self.call_timeout,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+        }
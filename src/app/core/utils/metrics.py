@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Protocol, cast
+
+from redis.asyncio import Redis
+
+from ..logger import logging
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS_US = (250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 1000000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Metrics:
+    """Labelled counters and histograms kept in memory and periodically added up in Redis.
+
+    Every worker process counts locally (no I/O on the request path) and `flush` moves the counts to Redis with a
+    single pipelined call, so `collect` returns totals across all workers. Histograms are stored as cumulative
+    counters named `{name}_le_{bucket}`, plus `{name}_count` and `{name}_sum`. Redis calls go through the circuit
+    breaker of the client they are given.
+
+    Parameters
+    ----------
+    namespace: str
+        Prefix of the Redis keys holding the totals, e.g. 'cache'.
+    """
+
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def incr(self, label: str, name: str, amount: int = 1) -> None:
+        counters = self._counters.setdefault(label, {})
+        counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, label: str, name: str, value: int, buckets: tuple[int, ...]) -> None:
+        for bucket in buckets:
+            if value <= bucket:
+                self.incr(label, f"{name}_le_{bucket}")
+        self.incr(label, f"{name}_count")
+        self.incr(label, f"{name}_sum", value)
+
+    @contextmanager
+    def timer(self, label: str, name: str) -> Iterator[None]:
+        """Observe the duration of the block, in microseconds, in the `name` latency histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label, name, int((time.perf_counter() - start) * 1_000_000), LATENCY_BUCKETS_US)
+
+    def snapshot(self) -> dict[str, dict[str, int]]:
+        return {label: dict(counters) for label, counters in self._counters.items()}
+
+    def _labels_key(self) -> str:
+        return f"metrics:{self.namespace}:labels"
+
+    def _label_key(self, label: str) -> str:
+        return f"metrics:{self.namespace}:{label}"
+
+    async def _labels(self, client: Redis, breaker: CircuitBreaker) -> list[str]:
+        labels = await breaker.call(cast(Awaitable[set[bytes]], client.smembers(self._labels_key())))
+        return sorted(label.decode() for label in labels)
+
+    async def flush(self, client: Redis, breaker: CircuitBreaker) -> None:
+        """Add the local counts to the totals in Redis and reset them."""
+        counters, self._counters = self._counters, {}
+        if not counters:
+            return
+
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd(self._labels_key(), *counters)
+        for label, values in counters.items():
+            for name, amount in values.items():
+                pipe.hincrby(self._label_key(label), name, amount)
+
+        try:
+            await breaker.call(pipe.execute())
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Could not flush {self.namespace} metrics: {e}")
+            for label, values in counters.items():
+                for name, amount in values.items():
+                    self.incr(label, name, amount)
+
+    async def collect(self, client: Redis, breaker: CircuitBreaker) -> dict[str, dict[str, int]]:
+        """Return the totals across workers, including the counts of this worker not flushed yet."""
+        labels = await self._labels(client, breaker)
+        pipe = client.pipeline(transaction=False)
+        for label in labels:
+            pipe.hgetall(self._label_key(label))
+
+        totals: dict[str, dict[str, int]] = {}
+        for label, values in zip(labels, await breaker.call(pipe.execute())):
+            totals[label] = {name.decode(): int(amount) for name, amount in values.items()}
+
+        for label, values in self.snapshot().items():
+            label_totals = totals.setdefault(label, {})
+            for name, amount in values.items():
+                label_totals[name] = label_totals.get(name, 0) + amount
+
+        return totals
+
+    async def reset(self, client: Redis, breaker: CircuitBreaker) -> None:
+        labels = await self._labels(client, breaker)
+        await breaker.call(client.delete(self._labels_key(), *(self._label_key(label) for label in labels)))
+        self._counters = {}
+
+
+def summarize_histogram(values: dict[str, int], name: str, buckets: tuple[int, ...]) -> dict[str, object]:
+    """Turn the `{name}_*` counters of a histogram into a count, a mean and per bucket counts."""
+    count = values.get(f"{name}_count", 0)
+    return {
+        "count": count,
+        "mean": round(values.get(f"{name}_sum", 0) / count, 2) if count else None,
+        "buckets": {f"le_{bucket}": values.get(f"{name}_le_{bucket}", 0) for bucket in buckets},
+    }
+
+
+class Flushable(Protocol):
+    async def flush(self, client: Redis, breaker: CircuitBreaker) -> None: ...
+
+
+async def flush_periodically(
+    metrics: Sequence[Flushable], client: Redis, breaker: CircuitBreaker, interval: float
+) -> None:
+    """Flush the given metrics to Redis every `interval` seconds until cancelled, then flush one last time."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            for item in metrics:
+                await item.flush(client, breaker)
+    finally:
+        for item in metrics:
+            await item.flush(client, breaker)
@@ -1,38 +1,452 @@
+import asyncio
+import math
+import time
+from collections.abc import Sequence
 from datetime import UTC, datetime
+from typing import Any, NamedTuple
 
 from redis.asyncio import ConnectionPool, Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...core.logger import logging
 from ...schemas.rate_limit import sanitize_path
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
 pool: ConnectionPool | None = None
 client: Redis | None = None
 
+FIXED_WINDOW = "fixed_window"
+SLIDING_WINDOW = "sliding_window"
+GCRA = "gcra"
+ALGORITHMS = (FIXED_WINDOW, SLIDING_WINDOW, GCRA)
 
-async def is_rate_limited(db: AsyncSession, user_id: int, path: str, limit: int, period: int) -> bool:
+# What `check_rate_limit` does when Redis is unavailable: admit every request, or enforce the limit with
+# per-worker fixed window counters.
+FAIL_OPEN = "open"
+FAIL_LOCAL = "local"
+FAILURE_MODES = (FAIL_OPEN, FAIL_LOCAL)
+
+breaker = CircuitBreaker("rate_limit", call_timeout=0.05)
+failure_mode = FAIL_OPEN
+
+_LOCAL_COUNTERS_MAX = 10000
+_local_counters: dict[str, tuple[float, int]] = {}
+
+# Every script decides and updates the state of one key in a single call and returns
+# {limited (0/1), remaining requests, milliseconds until the limit resets (or until the next allowed request)}.
+# ARGV[1] is the limit and ARGV[2] the period in milliseconds; the sliding window and GCRA scripts read the
+# clock of the Redis server so that all workers share the same time.
+
+_FIXED_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+local ttl = redis.call('PTTL', KEYS[1])
+if count > limit then
+    return {1, 0, ttl}
+end
+return {0, limit - count, ttl}
+"""
+
+_SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window = math.floor(now / period)
+local elapsed = now - window * period
+
+local state = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+local last_window = tonumber(state[1])
+if last_window == window - 1 then
+    previous, current = current, 0
+elseif last_window ~= window then
+    previous, current = 0, 0
+end
+
+local weighted = previous * (period - elapsed) / period + current
+local limited = weighted + 1 > limit
+if not limited then
+    current = current + 1
+end
+redis.call('HSET', KEYS[1], 'window', window, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], 2 * period)
+
+if limited then
+    -- Wait until the weight of the previous window leaves room for one request, in this window if the current
+    -- count does, otherwise in the next one, where the current count becomes the previous one.
+    local retry_after
+    if limit - current >= 1 then
+        retry_after = math.ceil(period * (1 - (limit - current - 1) / previous)) - elapsed
+    else
+        retry_after = period - elapsed + math.ceil(period * (1 - (limit - 1) / current))
+    end
+    return {1, 0, retry_after}
+end
+return {0, math.floor(limit - weighted - 1), period - elapsed}
+"""
+
+_GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local emission_interval = period / limit
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+
+local tat = math.max(tonumber(redis.call('GET', KEYS[1])) or now, now)
+local new_tat = tat + emission_interval
+local allow_at = new_tat - period
+if allow_at > now then
+    return {1, 0, math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {0, math.floor((now - allow_at) / emission_interval), math.ceil(new_tat - now)}
+"""
+
+# Adds the requests admitted locally by a worker to the fixed window counter and returns
+# {requests left in the window, milliseconds until the window ends}. ARGV: consumed, limit, period in milliseconds.
+_HYBRID_SYNC_SCRIPT = """
+local consumed = tonumber(ARGV[1])
+local count = redis.call('INCRBY', KEYS[1], consumed)
+if count == consumed then
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+end
+return {math.max(tonumber(ARGV[2]) - count, 0), redis.call('PTTL', KEYS[1])}
+"""
+
+_SCRIPTS = {FIXED_WINDOW: _FIXED_WINDOW_SCRIPT, SLIDING_WINDOW: _SLIDING_WINDOW_SCRIPT, GCRA: _GCRA_SCRIPT}
+_registered_scripts: dict[str, AsyncScript] = {}
+_HYBRID = "hybrid"
+
+
+class RateLimitResult(NamedTuple):
+    limited: bool
+    remaining: int
+    reset_after: float
+
+
+def _script(algorithm: str) -> AsyncScript:
+    """Return the script of `algorithm` registered on the current client (run with EVALSHA, loaded on demand)."""
     if client is None:
-        logger.error("Redis client is not initialized.")
         raise Exception("Redis client is not initialized.")
 
-    current_timestamp = int(datetime.now(UTC).timestamp())
-    window_start = current_timestamp - (current_timestamp % period)
+    script = _registered_scripts.get(algorithm)
+    if script is None or script.registered_client is not client:
+        script = client.register_script(_HYBRID_SYNC_SCRIPT if algorithm == _HYBRID else _SCRIPTS[algorithm])
+        _registered_scripts[algorithm] = script
+    return script
+
+
+class LocalBucket:
+    """Requests a worker may admit for one fixed window key before asking Redis again.
+
+    `allowance` is a lease on the requests left in the window as of the last sync; `pending` counts the
+    requests admitted locally that were not added to the Redis counter yet.
+    """
+
+    __slots__ = ("limit", "period", "allowance", "remaining", "pending", "expires_at")
+
+    def __init__(self, limit: int, period: int) -> None:
+        self.limit = limit
+        self.period = period
+        self.allowance = 0
+        self.remaining = limit
+        self.pending = 0
+        self.expires_at = time.monotonic() + period
+
+
+class HybridLimiter:
+    """Fixed window rate limiting against worker-local token buckets, reconciled with Redis in batches.
+
+    Requests are admitted from the local allowance of their key without any I/O. The allowance is leased from the
+    requests left in the global window: when it runs out, the worker adds its pending count to the Redis counter
+    and gets a new lease in one call. Pending counts of all keys are also flushed in a single pipeline every
+    `flush_interval` seconds, or as soon as a key has `flush_requests` pending requests. Once a sync finds the
+    window exhausted, its requests are limited locally until the window ends, without calling Redis.
+
+    Leases are not reserved in Redis, so a window can admit up to one lease per worker more than its limit; the
+    lease size (`lease_fraction` of the limit, at least 1) bounds that over-admission.
+
+    Parameters
+    ----------
+    flush_interval: float
+        Maximum time, in seconds, between two flushes of the pending counts.
+    flush_requests: int
+        Number of pending requests of a key that triggers an early flush.
+    lease_fraction: float
+        Fraction of the limit a worker may admit between two syncs of a key.
+    """
+
+    def __init__(self, flush_interval: float, flush_requests: int, lease_fraction: float) -> None:
+        self.flush_interval = flush_interval
+        self.flush_requests = flush_requests
+        self.lease_fraction = lease_fraction
+        self.buckets: dict[str, LocalBucket] = {}
+        self._flush_needed = asyncio.Event()
+
+    def _apply(self, bucket: LocalBucket, remaining: int, ttl_ms: int) -> None:
+        lease = max(1, int(bucket.limit * self.lease_fraction))
+        bucket.remaining = max(remaining - bucket.pending, 0)
+        bucket.allowance = min(lease, bucket.remaining)
+        bucket.expires_at = time.monotonic() + max(ttl_ms, 0) / 1000
+
+    async def _sync(self, key: str, bucket: LocalBucket) -> None:
+        consumed, bucket.pending = bucket.pending, 0
+        try:
+            remaining, ttl_ms = await breaker.call(
+                _script(_HYBRID)(keys=[key], args=[consumed, bucket.limit, bucket.period * 1000])
+            )
+        except Exception:
+            bucket.pending += consumed
+            raise
+        self._apply(bucket, remaining, ttl_ms)
+
+    async def check(self, key: str, limit: int, period: int) -> RateLimitResult:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = LocalBucket(limit, period)
+
+        # A window that was exhausted at the last sync stays exhausted until it ends: only renew spent leases.
+        if bucket.allowance <= 0 and (bucket.remaining > 0 or bucket.expires_at <= time.monotonic()):
+            await self._sync(key, bucket)
+
+        reset_after = max(bucket.expires_at - time.monotonic(), 0)
+        if bucket.allowance <= 0:
+            return RateLimitResult(limited=True, remaining=0, reset_after=reset_after)
+
+        bucket.allowance -= 1
+        bucket.remaining -= 1
+        bucket.pending += 1
+        if bucket.pending >= self.flush_requests:
+            self._flush_needed.set()
+
+        return RateLimitResult(limited=False, remaining=bucket.remaining, reset_after=reset_after)
+
+    async def flush(self) -> None:
+        """Add the pending counts of every key to Redis in one pipeline and refresh their leases."""
+        if client is None:
+            raise Exception("Redis client is not initialized.")
+
+        now = time.monotonic()
+        for key in [key for key, bucket in self.buckets.items() if bucket.expires_at <= now and not bucket.pending]:
+            del self.buckets[key]
 
+        pending = [(key, bucket, bucket.pending) for key, bucket in self.buckets.items() if bucket.pending]
+        if not pending:
+            return
+
+        script = _script(_HYBRID)
+        pipe = client.pipeline(transaction=False)
+        for key, bucket, consumed in pending:
+            bucket.pending -= consumed
+            await script(keys=[key], args=[consumed, bucket.limit, bucket.period * 1000], client=pipe)
+
+        try:
+            results = await breaker.call(pipe.execute())
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Could not flush local rate limit counts: {e}")
+            for _, bucket, consumed in pending:
+                bucket.pending += consumed
+            return
+
+        for (_, bucket, _), (remaining, ttl_ms) in zip(pending, results):
+            self._apply(bucket, remaining, ttl_ms)
+
+    async def flush_periodically(self) -> None:
+        """Flush every `flush_interval` seconds, or early when a key has enough pending requests, until cancelled."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+                except TimeoutError:
+                    pass
+                self._flush_needed.clear()
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+hybrid: HybridLimiter | None = None
+
+
+def rate_limit_key(user_id: int | str, path: str, period: int, algorithm: str = FIXED_WINDOW) -> str:
     sanitized_path = sanitize_path(path)
-    key = f"ratelimit:{user_id}:{sanitized_path}:{window_start}"
+    if algorithm == FIXED_WINDOW:
+        current_timestamp = int(datetime.now(UTC).timestamp())
+        window_start = current_timestamp - (current_timestamp % period)
+        return f"ratelimit:{user_id}:{sanitized_path}:{window_start}"
+    return f"ratelimit:{algorithm}:{user_id}:{sanitized_path}:{period}"
 
-    try:
-        current_count = await client.incr(key)
-        if current_count == 1:
-            await client.expire(key, period)
 
-        if current_count > limit:
-            return True
+def _check_locally(user_id: int | str, path: str, limit: int, period: int) -> RateLimitResult:
+    """Count a request against a fixed window counter of this worker, used while Redis is unavailable."""
+    now = time.monotonic()
+    key = f"{user_id}:{sanitize_path(path)}:{period}"
+    window_end, count = _local_counters.get(key, (0.0, 0))
+    if window_end <= now:
+        if len(_local_counters) >= _LOCAL_COUNTERS_MAX:
+            for expired in [k for k, (end, _) in _local_counters.items() if end <= now]:
+                del _local_counters[expired]
+        window_end, count = now + period, 0
+
+    if len(_local_counters) < _LOCAL_COUNTERS_MAX or key in _local_counters:
+        _local_counters[key] = (window_end, count + 1)
 
+    reset_after = window_end - now
+    if count + 1 > limit:
+        return RateLimitResult(limited=True, remaining=0, reset_after=reset_after)
+    return RateLimitResult(limited=False, remaining=limit - count - 1, reset_after=reset_after)
+
+
+async def check_rate_limit(
+    user_id: int | str, path: str, limit: int, period: int, algorithm: str = FIXED_WINDOW
+) -> RateLimitResult:
+    """Count a request against a rate limit and decide whether it is allowed, in a single Redis call.
+
+    Parameters
+    ----------
+    user_id: int | str
+        The user ID, or the client host for anonymous requests.
+    path: str
+        The request path.
+    limit: int
+        Maximum number of requests per period.
+    period: int
+        Length of the period, in seconds.
+    algorithm: str, default 'fixed_window'
+        'fixed_window' (a counter per period, allows bursts of up to twice the limit across window edges),
+        'sliding_window' (the previous window's count weighted by its overlap with the last period) or
+        'gcra' (generic cell rate algorithm: requests are spread over the period, with bursts of up to `limit`).
+        When the hybrid mode is enabled (`RATE_LIMIT_HYBRID_ENABLED`), 'fixed_window' limits are checked against
+        local token buckets (see `HybridLimiter`).
+
+    Returns
+    -------
+    RateLimitResult: Whether the request is limited, the requests left and the seconds until the limit resets
+    (or, for a limited request, until the next one is allowed).
+
+    Note
+    ----
+        Redis calls go through `breaker`. When one fails or times out, or while the breaker is open, the request
+        is admitted (`failure_mode` 'open') or counted against a fixed window counter of this worker ('local').
+    """
+    if algorithm not in _SCRIPTS:
+        raise ValueError(f"Unknown rate limit algorithm '{algorithm}', expected one of {ALGORITHMS}.")
+
+    key = rate_limit_key(user_id, path, period, algorithm)
+    try:
+        if hybrid is not None and algorithm == FIXED_WINDOW:
+            return await hybrid.check(key, limit, period)
+
+        limited, remaining, reset_after_ms = await breaker.call(
+            _script(algorithm)(keys=[key], args=[limit, period * 1000])
+        )
+    except (CircuitOpenError, TimeoutError, RedisError) as e:
+        if not isinstance(e, CircuitOpenError):
+            logger.warning(
+                f"Rate limit check for user {user_id} on path {path} failed ({e!r}), failing {failure_mode}."
+            )
+        if failure_mode == FAIL_LOCAL:
+            return _check_locally(user_id, path, limit, period)
+        return RateLimitResult(limited=False, remaining=limit, reset_after=period)
     except Exception as e:
         logger.exception(f"Error checking rate limit for user {user_id} on path {path}: {e}")
         raise e
 
-    return False
+    return RateLimitResult(limited=bool(limited), remaining=int(remaining), reset_after=max(reset_after_ms, 0) / 1000)
+
+
+def _usage(
+    limit: int, period: int, algorithm: str, state: Any, now_ms: float, pending: int = 0
+) -> RateLimitResult:
+    """Rebuild the quota left from the raw state of a key, as the scripts would see it for the next request."""
+    period_ms = period * 1000
+    if algorithm == SLIDING_WINDOW:
+        last_window, current, previous = (float(value) if value is not None else None for value in state)
+        window = now_ms // period_ms
+        elapsed = now_ms - window * period_ms
+        if last_window == window - 1:
+            previous, current = current, 0
+        elif last_window != window:
+            previous, current = 0, 0
+        weighted = (previous or 0) * (period_ms - elapsed) / period_ms + (current or 0)
+        remaining, reset_after_ms = math.floor(limit - weighted), period_ms - elapsed
+    elif algorithm == GCRA:
+        emission_interval = period_ms / limit
+        tat = max(float(state) if state is not None else now_ms, now_ms)
+        remaining, reset_after_ms = math.floor((now_ms - (tat - period_ms)) / emission_interval), tat - now_ms
+    else:
+        # Fixed window keys are named after the clock of this worker (see `rate_limit_key`), not the server's.
+        now = int(time.time())
+        remaining, reset_after_ms = limit - int(state or 0) - pending, (period - now % period) * 1000
+
+    remaining = min(max(remaining, 0), limit)
+    return RateLimitResult(limited=remaining == 0, remaining=remaining, reset_after=max(reset_after_ms, 0) / 1000)
+
+
+async def read_usage(user_id: int | str, limits: Sequence[tuple[str, int, int, str]]) -> list[RateLimitResult]:
+    """Read the quota left of a user for several rate limits, without counting a request, in one round trip.
+
+    The string counters (fixed window and GCRA) are read with a single `MGET`, pipelined with the server time
+    and one `HMGET` per sliding window hash.
+
+    Parameters
+    ----------
+    user_id: int | str
+        The user ID, or the client host for anonymous requests.
+    limits: Sequence[Tuple[str, int, int, str]]
+        The `(path, limit, period, algorithm)` of each rate limit.
+
+    Returns
+    -------
+    List[RateLimitResult]: For each rate limit, whether the next request would be limited, the requests left
+    and the seconds until the limit resets. Fixed window counts include the requests admitted by the local
+    buckets of this worker in hybrid mode, but not those of the other workers.
+    """
+    if client is None:
+        raise Exception("Redis client is not initialized.")
+
+    keys = [rate_limit_key(user_id, path, period, algorithm) for path, _, period, algorithm in limits]
+    counters = [i for i, (_, _, _, algorithm) in enumerate(limits) if algorithm != SLIDING_WINDOW]
+    hashes = [i for i, (_, _, _, algorithm) in enumerate(limits) if algorithm == SLIDING_WINDOW]
+
+    pipe = client.pipeline(transaction=False)
+    pipe.time()
+    if counters:
+        pipe.mget([keys[i] for i in counters])
+    for i in hashes:
+        pipe.hmget(keys[i], ["window", "current", "previous"])
+    server_time, *replies = await breaker.call(pipe.execute())
+
+    states: dict[int, Any] = {}
+    if counters:
+        states.update(zip(counters, replies.pop(0)))
+    states.update(zip(hashes, replies))
+
+    now_ms = server_time[0] * 1000 + server_time[1] / 1000
+    usage = []
+    for i, (_, limit, period, algorithm) in enumerate(limits):
+        bucket = hybrid.buckets.get(keys[i]) if hybrid is not None and algorithm == FIXED_WINDOW else None
+        usage.append(_usage(limit, period, algorithm, states[i], now_ms, bucket.pending if bucket else 0))
+    return usage
+
+
+async def is_rate_limited(
+    db: AsyncSession, user_id: int, path: str, limit: int, period: int, algorithm: str = FIXED_WINDOW
+) -> bool:
+    if client is None:
+        logger.error("Redis client is not initialized.")
+        raise Exception("Redis client is not initialized.")
+
+    result = await check_rate_limit(user_id=user_id, path=path, limit=limit, period=period, algorithm=algorithm)
+    return result.limited
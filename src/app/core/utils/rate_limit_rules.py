@@ -0,0 +1,187 @@
+import asyncio
+import time
+from typing import Any, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.logger import logging
+from ...models.rate_limit import RateLimit
+from ...models.tier import Tier
+from ...schemas.rate_limit import RateLimitAlgorithm
+from ..db.database import local_session
+from . import cache, rate_limit
+
+logger = logging.getLogger(__name__)
+
+RULES_VERSION_KEY = "ratelimit:rules:version"
+RULES_CHANNEL = "ratelimit:rules"
+
+
+class RateLimitRule(NamedTuple):
+    limit: int
+    period: int
+    algorithm: RateLimitAlgorithm
+
+
+DEFAULT_RULE = RateLimitRule(
+    limit=settings.DEFAULT_RATE_LIMIT_LIMIT,
+    period=settings.DEFAULT_RATE_LIMIT_PERIOD,
+    algorithm=settings.DEFAULT_RATE_LIMIT_ALGORITHM,
+)
+
+
+class RuleTable:
+    """In-process copy of the tiers and their rate limits, keyed by `(tier_id, path)`.
+
+    The table is tagged with the version counter stored in Redis under `RULES_VERSION_KEY`. Write endpoints bump
+    that counter (see `bump_rules_version`), which also notifies every worker on `RULES_CHANNEL` so that they
+    reload the table; `reconcile_periodically` reloads it anyway every few minutes in case a message was lost or
+    the rules were changed outside of the API.
+    """
+
+    def __init__(self) -> None:
+        self.version: int | None = None
+        self.loaded_at: float | None = None
+        self._tiers: dict[int, str] = {}
+        self._rules: dict[tuple[int, str], RateLimitRule] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def tier_name(self, tier_id: int) -> str | None:
+        return self._tiers.get(tier_id)
+
+    def lookup(self, tier_id: int, path: str) -> RateLimitRule | None:
+        return self._rules.get((tier_id, path))
+
+    def resolve(self, tier_id: int | None, path: str) -> RateLimitRule:
+        """Return the rule of the tier for the (sanitized) path, or the default rule."""
+        if tier_id is None:
+            return DEFAULT_RULE
+
+        tier_name = self.tier_name(tier_id)
+        if tier_name is None:
+            logger.warning(f"Tier {tier_id} does not exist. Applying default rate limit.")
+            return DEFAULT_RULE
+
+        rule = self.lookup(tier_id, path)
+        if rule is None:
+            logger.warning(
+                f"Tier '{tier_name}' has no specific rate limit for path '{path}'. Applying default rate limit."
+            )
+            return DEFAULT_RULE
+
+        return rule
+
+    async def load(self, db: AsyncSession, version: int | None = None) -> None:
+        """Replace the table with the tiers and rate limits stored in the database.
+
+        `version` should be read before the database, so that a bump racing with the load triggers another one.
+        """
+        async with self._lock:
+            tiers = await db.execute(select(Tier.id, Tier.name))
+            rate_limits = await db.execute(
+                select(RateLimit.tier_id, RateLimit.path, RateLimit.limit, RateLimit.period, RateLimit.algorithm)
+            )
+
+            self._tiers = dict(tiers.tuples().all())
+            self._rules = {
+                (tier_id, path): RateLimitRule(limit=limit, period=period, algorithm=algorithm)
+                for tier_id, path, limit, period, algorithm in rate_limits.all()
+            }
+            self.version = version
+            self.loaded_at = time.monotonic()
+
+        logger.info(f"Loaded {len(self._rules)} rate limit rules for {len(self._tiers)} tiers (version {version}).")
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if not self.loaded:
+            await self.load(db, await _get_version())
+
+
+rules = RuleTable()
+
+
+async def _get_version() -> int | None:
+    if rate_limit.client is None:
+        return None
+
+    version = await rate_limit.client.get(RULES_VERSION_KEY)
+    return int(version) if version is not None else 0
+
+
+async def reload_rules() -> None:
+    """Reload the rule table with a fresh database session."""
+    version = await _get_version()
+    async with local_session() as db:
+        await rules.load(db, version)
+
+
+async def bump_rules_version() -> None:
+    """Mark the rules as changed, so that every worker reloads its table. Call it after the change is committed."""
+    if rate_limit.client is None:
+        logger.warning("Rate limit rules changed but the Redis client is not initialized; reloading locally.")
+        await reload_rules()
+        return
+
+    try:
+        version = await rate_limit.breaker.call(rate_limit.client.incr(RULES_VERSION_KEY))
+        await rate_limit.breaker.call(rate_limit.client.publish(RULES_CHANNEL, version))
+    except cache.REDIS_UNAVAILABLE_ERRORS as e:
+        # The other workers pick the change up at their next reconciliation.
+        logger.warning(f"Could not publish the rate limit rules change, reloading locally: {e!r}")
+        async with local_session() as db:
+            await rules.load(db)
+
+
+async def _on_message(message: dict[str, Any]) -> None:
+    if message.get("type") != "message":
+        return
+
+    try:
+        version = int(message["data"])
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring malformed rate limit rules message: {message['data']!r}")
+        return
+
+    if rules.version is None or version > rules.version:
+        await reload_rules()
+
+
+async def listen_for_rule_changes() -> None:
+    """Reload the rule table whenever another worker publishes a new version. Runs until cancelled."""
+    if rate_limit.client is None:
+        raise Exception("Redis client is not initialized.")
+
+    while True:
+        pubsub = rate_limit.client.pubsub()
+        try:
+            await pubsub.subscribe(RULES_CHANNEL)
+            if await _get_version() != rules.version:
+                await reload_rules()
+            async for message in pubsub.listen():
+                await _on_message(message)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Rate limit rules subscription lost: {e}")
+            await asyncio.sleep(1)
+
+        finally:
+            await pubsub.aclose()
+
+
+async def reconcile_periodically(interval: float) -> None:
+    """Reload the rule table from the database every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reload_rules()
+        except Exception as e:
+            logger.warning(f"Could not reconcile rate limit rules: {e}")
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from redis.asyncio.client import Pipeline
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..db.crud_token_blacklist import crud_token_blacklist
+from ..db.database import local_session
+from ..db.token_blacklist import TokenBlacklist
+from ..exceptions.cache_exceptions import MissingClientError
+from ..logger import logging
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_KEY_PREFIX = "token_blacklist"
+INDEX_KEY = "token_blacklist:index"
+RESTORED_KEY = "token_blacklist:restored"
+CHANNEL = "token_blacklist:added"
+MIN_CAPACITY = 1024
+
+_blacklisted_callbacks: list[Callable[[str], None]] = []
+
+
+def token_digest(token: str) -> str:
+    """Return the fixed-size ID of a token under which it is blacklisted."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def on_blacklisted(callback: Callable[[str], None]) -> None:
+    """Call `callback` with the digest of every token blacklisted by this worker or published by another one."""
+    _blacklisted_callbacks.append(callback)
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded rate of false positives.
+
+    Parameters
+    ----------
+    capacity: int
+        Number of items the filter is sized for.
+    error_rate: float
+        False positive rate once `capacity` items were added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class BlacklistFilter:
+    """In-process Bloom filter of the blacklisted token IDs.
+
+    A token that is not in the filter is certainly not blacklisted, so the common case needs no network call;
+    only the rare filter hits (blacklisted tokens and false positives) are checked against Redis. Tokens
+    blacklisted by other workers are added as they are published on `CHANNEL`, and the filter is rebuilt every few
+    seconds from `INDEX_KEY`, which also drops expired tokens. The database, the source of truth, is only read by
+    the first rebuild of the worker and after Redis lost its data (`RESTORED_KEY` is missing), to write the
+    tokens Redis lacks back to it. Tokens blacklisted while Redis was unavailable are kept in `pending` (with their
+    expiration) until a rebuild writes them to Redis.
+    """
+
+    def __init__(self) -> None:
+        self.bloom: BloomFilter | None = None
+        self.built_at: float | None = None
+        self.pending: dict[str, float] = {}
+        self._added_during_rebuild: list[str] | None = None
+
+    def remember(self, digest: str) -> None:
+        if self.bloom is not None:
+            self.bloom.add(digest)
+        if self._added_during_rebuild is not None:
+            self._added_during_rebuild.append(digest)
+
+    def might_contain(self, digest: str) -> bool:
+        return self.bloom is None or digest in self.bloom
+
+    async def rebuild(self) -> None:
+        """Replace the filter with the unexpired token IDs of `INDEX_KEY`.
+
+        The index is restored from the database first if this is the first rebuild or if Redis lost it, and the
+        `pending` tokens are written to it.
+        """
+        if cache.client is None:
+            raise MissingClientError
+
+        pending = dict(self.pending)
+        self._added_during_rebuild = []
+        try:
+            if self.built_at is None or not await cache.breaker.call(cache.client.exists(RESTORED_KEY)):
+                await _restore_index()
+            if pending:
+                await cache.breaker.call(_store_pipeline(pending).execute())
+
+            pipe = cache.client.pipeline(transaction=False)
+            pipe.zremrangebyscore(INDEX_KEY, "-inf", time.time())
+            pipe.zrange(INDEX_KEY, 0, -1)
+            _, members = await cache.breaker.call(pipe.execute())
+
+            digests = {member.decode() for member in members} | set(self._added_during_rebuild)
+            bloom = BloomFilter(max(2 * len(digests), MIN_CAPACITY), settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE)
+            for digest in digests:
+                bloom.add(digest)
+        finally:
+            self._added_during_rebuild = None
+
+        self.bloom = bloom
+        self.built_at = time.monotonic()
+        for digest in pending:
+            self.pending.pop(digest, None)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def _key(digest: str) -> str:
+    return f"{TOKEN_KEY_PREFIX}:{digest}"
+
+
+async def _unexpired_tokens() -> dict[str, float]:
+    """Return the expiration (a UNIX timestamp) of the blacklisted tokens of the database, by token ID."""
+    async with local_session() as db:
+        result = await db.execute(
+            select(TokenBlacklist.token_hash, TokenBlacklist.expires_at).where(
+                TokenBlacklist.expires_at > datetime.now(UTC)
+            )
+        )
+        return {digest: expires_at.timestamp() for digest, expires_at in result.all()}
+
+
+async def _restore_index() -> None:
+    """Write the unexpired tokens of the database missing from `INDEX_KEY` to Redis, and set `RESTORED_KEY`."""
+    stored = await _unexpired_tokens()
+    indexed = await cache.breaker.call(cache.client.zrange(INDEX_KEY, 0, -1))  # type: ignore
+    missing = stored.keys() - {member.decode() for member in indexed}
+
+    pipe = _store_pipeline({digest: stored[digest] for digest in missing})
+    pipe.set(RESTORED_KEY, 1)
+    await cache.breaker.call(pipe.execute())
+    if missing:
+        logger.info(f"Restored {len(missing)} blacklisted tokens from the database to Redis.")
+
+
+def _store_pipeline(tokens: dict[str, float]) -> Pipeline:
+    """Return a pipeline writing the key of each token with its TTL and adding it to `INDEX_KEY`."""
+    pipe = cache.client.pipeline(transaction=False)  # type: ignore
+    now = time.time()
+    for digest, expires_at in tokens.items():
+        pipe.set(_key(digest), 1, ex=max(1, math.ceil(expires_at - now)))
+        pipe.zadd(INDEX_KEY, {digest: expires_at})
+    return pipe
+
+
+def _blacklisted(digest: str) -> None:
+    blacklist_filter.remember(digest)
+    for callback in _blacklisted_callbacks:
+        callback(digest)
+
+
+async def add_to_blacklist(token: str, expires_at: float) -> None:
+    """Blacklist a token in Redis until its expiration (a UNIX timestamp) and notify the other workers."""
+    digest = token_digest(token)
+    _blacklisted(digest)
+
+    if expires_at <= time.time() or cache.client is None:
+        return
+
+    pipe = _store_pipeline({digest: expires_at})
+    pipe.publish(CHANNEL, digest)
+    try:
+        await cache.breaker.call(pipe.execute())
+    except cache.REDIS_UNAVAILABLE_ERRORS as e:
+        # The next rebuild writes it to Redis; until then this worker rejects it by itself.
+        blacklist_filter.pending[digest] = expires_at
+        logger.warning(f"Could not blacklist token in Redis, it is only blacklisted in the database: {e!r}")
+
+
+async def is_blacklisted(token: str, db: AsyncSession) -> bool:
+    """Whether the token is blacklisted: in-process filter first, then Redis, then the database if Redis fails."""
+    digest = token_digest(token)
+    if not blacklist_filter.might_contain(digest):
+        return False
+
+    if digest in blacklist_filter.pending:
+        return True
+
+    if cache.client is not None:
+        try:
+            return bool(await cache.breaker.call(cache.client.exists(_key(digest))))
+        except cache.REDIS_UNAVAILABLE_ERRORS:
+            pass
+
+    return bool(await crud_token_blacklist.exists(db, token_hash=digest))
+
+
+async def purge_expired(db: AsyncSession, batch_size: int) -> int:
+    """Delete the blacklisted tokens that expired, `batch_size` rows per transaction.
+
+    Expired tokens are rejected by their signature check anyway, so their rows are only dead weight in the
+    unique index. Small batches keep each transaction, and the locks it holds, short.
+
+    Returns
+    -------
+    int: The number of deleted rows.
+    """
+    now = datetime.now(UTC)
+    deleted = 0
+    while True:
+        expired_ids = (
+            select(TokenBlacklist.id).where(TokenBlacklist.expires_at <= now).limit(batch_size).scalar_subquery()
+        )
+        result = await db.execute(delete(TokenBlacklist).where(TokenBlacklist.id.in_(expired_ids)))
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+async def _on_message(message: dict[str, Any]) -> None:
+    if message.get("type") != "message":
+        return
+
+    data = message["data"]
+    _blacklisted(data.decode() if isinstance(data, bytes) else data)
+
+
+async def listen_for_blacklisted_tokens() -> None:
+    """Add the tokens blacklisted by other workers to the filter as they are published. Runs until cancelled."""
+    if cache.client is None:
+        raise MissingClientError
+
+    while True:
+        pubsub = cache.client.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            await blacklist_filter.rebuild()
+            async for message in pubsub.listen():
+                await _on_message(message)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Token blacklist subscription lost: {e!r}")
+            blacklist_filter.bloom = None
+            await asyncio.sleep(1)
+
+        finally:
+            await pubsub.aclose()
+
+
+async def rebuild_periodically(interval: float) -> None:
+    """Rebuild the filter every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await blacklist_filter.rebuild()
+        except Exception as e:
+            logger.warning(f"Could not rebuild the token blacklist filter: {e!r}")
@@ -0,0 +1,168 @@
+import uuid as uuid_pkg
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...crud.crud_users import crud_users
+from ...schemas.user import UserCached
+from ..config import settings
+from ..logger import logging
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "user_profile"
+METRICS_LABEL = "user_profile"
+IDENTIFIER_FIELDS = ("id", "username", "email", "inn")
+
+
+def _key(user_id: int | str) -> str:
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def _alias_key(field: str, value: str) -> str:
+    return f"{KEY_PREFIX}:{field}:{value}"
+
+
+def _alias_keys(user: dict[str, Any]) -> list[str]:
+    return [_alias_key(field, user[field]) for field in IDENTIFIER_FIELDS[1:] if user.get(field)]
+
+
+def _as_dict(user: dict | BaseModel | None) -> dict[str, Any] | None:
+    """Return a user as returned by `crud_users.get`, i.e. a dict unless `return_as_model` is set, as a dict."""
+    return user.model_dump() if isinstance(user, BaseModel) else user
+
+
+def _restore(user: dict[str, Any]) -> dict[str, Any]:
+    """Turn the JSON values of a cached user back into the types `crud_users.get` returns."""
+    if user.get("uuid") is not None:
+        user["uuid"] = uuid_pkg.UUID(user["uuid"])
+    return user
+
+
+async def _read(field: str, value: Any) -> dict[str, Any] | cache.CachedNotFound | None:
+    """Return the cached user whose `field` is `value`, following the alias key unless `field` is 'id'.
+
+    Alias keys of values that matched no user hold a `cache_not_found` marker, returned as `CachedNotFound`.
+    """
+    if cache.client is None:
+        return None
+
+    user_id = value
+    if field != "id":
+        user_id = await cache.breaker.call(cache.client.get(_alias_key(field, value)))
+        if user_id is None:
+            return None
+        if not user_id.isdigit():
+            marker = cache.codec.decode(user_id)
+            return marker if isinstance(marker, cache.CachedNotFound) else None
+        user_id = user_id.decode()
+
+    blob = await cache.breaker.call(cache.client.get(_key(user_id)))
+    if blob is None:
+        return None
+
+    user = cache.codec.decode(blob)
+    # An alias outlives a username or email change until it expires: it then points to a user it no longer matches.
+    if not isinstance(user, dict) or str(user.get(field)) != str(value):
+        return None
+
+    return _restore(user)
+
+
+async def _write(user: dict[str, Any]) -> None:
+    if cache.client is None:
+        return
+
+    expiration = settings.USER_CACHE_EXPIRATION
+    pipe = cache.client.pipeline(transaction=False)
+    pipe.set(_key(user["id"]), cache.codec.encode(jsonable_encoder(user)).envelope, ex=expiration)
+    for alias_key in _alias_keys(user):
+        pipe.set(alias_key, user["id"], ex=expiration)
+    await cache.breaker.call(pipe.execute())
+
+
+async def get_user(
+    db: AsyncSession, schema_to_select: type[BaseModel] | None = None, **identifier: Any
+) -> dict[str, Any] | None:
+    """Return the user that is not deleted with the given `id`, `username`, `email` or `inn`, through the cache.
+
+    Each user is cached once under its ID, and its username, email and INN are alias keys holding the ID, so
+    every lookup reads the same entry and a single invalidation (see `invalidate_user`) covers all of them.
+    Misses and Redis failures fall back to `crud_users.get`. Only the fields of `UserCached` are cached and
+    returned: secrets such as the password hash are never copied to Redis. A username, email or INN that matches
+    no user is remembered for `USER_CACHE_NEGATIVE_EXPIRATION` seconds, until `invalidate_user` is called with it.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        Session used on cache misses.
+    schema_to_select: type[BaseModel] | None
+        Return only the fields of this schema, which must be a subset of `UserCached`.
+    **identifier: Any
+        Exactly one of `id`, `username`, `email` or `inn`.
+
+    Returns
+    -------
+    dict[str, Any] | None: The user, or None if there is no such user.
+    """
+    if len(identifier) != 1 or next(iter(identifier)) not in IDENTIFIER_FIELDS:
+        raise ValueError(f"Users are looked up by exactly one of {', '.join(IDENTIFIER_FIELDS)}.")
+
+    (field, value), = identifier.items()
+    user = None
+    redis_available = settings.USER_CACHE_ENABLED and cache.client is not None
+    if redis_available:
+        try:
+            with cache.metrics.timer(METRICS_LABEL, "read_latency_us"):
+                user = await _read(field, value)
+        except cache.REDIS_UNAVAILABLE_ERRORS:
+            cache.metrics.incr(METRICS_LABEL, "bypassed")
+            redis_available = False
+
+    if isinstance(user, cache.CachedNotFound):
+        cache.metrics.incr(METRICS_LABEL, "negative_hits")
+        return None
+
+    if user is not None:
+        cache.metrics.incr(METRICS_LABEL, "hits")
+    else:
+        user = _as_dict(await crud_users.get(db=db, schema_to_select=UserCached, is_deleted=False, **identifier))
+        if redis_available:
+            cache.metrics.incr(METRICS_LABEL, "misses")
+            if user is not None:
+                try:
+                    await _write(user)
+                except cache.REDIS_UNAVAILABLE_ERRORS:
+                    cache.metrics.incr(METRICS_LABEL, "write_errors")
+            elif field != "id":
+                cache.metrics.incr(METRICS_LABEL, "negative_writes")
+                await cache.cache_not_found(
+                    _alias_key(field, value), "User not found", settings.USER_CACHE_NEGATIVE_EXPIRATION
+                )
+
+    if user is None or schema_to_select is None:
+        return user
+
+    return {name: user[name] for name in schema_to_select.model_fields}
+
+
+async def invalidate_user(*db_users: dict | BaseModel) -> None:
+    """Drop the cached users and their alias keys.
+
+    Call it after every write to a user, with its former values, and with its new values too when its username,
+    email or INN was created or changed, to drop the entries remembering they matched no user.
+    """
+    users = [user for user in map(_as_dict, db_users) if user is not None]
+    if cache.client is None or not users:
+        return
+
+    keys = [key for user in users for key in (_key(user["id"]), *_alias_keys(user))]
+    try:
+        await cache.breaker.call(cache.client.delete(*keys))
+        cache.metrics.incr(METRICS_LABEL, "invalidations")
+    except cache.REDIS_UNAVAILABLE_ERRORS as e:
+        cache.metrics.incr(METRICS_LABEL, "invalidation_errors")
+        logger.warning(f"Could not invalidate cached users {[user['id'] for user in users]}, they stay cached: {e!r}")
@@ -0,0 +1,205 @@
+import asyncio
+import time
+from typing import Any
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.user import User
+from ..db.database import local_session
+from ..exceptions.cache_exceptions import MissingClientError
+from ..logger import logging
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_KEY = "user:security_versions"
+CHANNEL = "user:security_versions"
+PUBLISH_RETRY_INTERVAL = 1
+# Field of `VERSIONS_KEY` marking the hash as seeded from the database, checked every `SEED_CHECK_INTERVAL` seconds.
+SEEDED_FIELD = "seeded"
+SEED_CHECK_INTERVAL = 30
+SEED_BATCH_SIZE = 1000
+
+# Security version of every user whose version was bumped or who was loaded since, as last known by this worker.
+versions: dict[int, int] = {}
+# Whether `versions` is complete: the listener is subscribed and loaded the stored versions.
+synced = False
+# Versions bumped by this worker that could not be published yet, by user ID.
+_unpublished: dict[int, int] = {}
+_retry_task: asyncio.Task | None = None
+
+
+def is_stale(user_id: int, version: int | None) -> bool:
+    """Whether claims minted at `version` no longer describe the user, so the user must be reloaded.
+
+    Users missing from `versions`, e.g. created after it was seeded or deleted from the database, are stale until
+    loaded (see `record_version`). While `versions` is not in sync with the other workers, every user is stale.
+    """
+    if version is None or not synced:
+        return True
+
+    return versions.get(user_id) != version
+
+
+def record_version(user_id: int, version: int) -> None:
+    """Remember the security version of a user loaded from the database, unless a later one is already known."""
+    versions[user_id] = max(version, versions.get(user_id, version))
+
+
+async def bump_security_version(db: AsyncSession, user_id: int) -> int | None:
+    """Increment the security version of a user and notify every worker, invalidating the claims of their tokens.
+
+    Call it whenever a claim changes (username, tier, superuser status) or the user is deleted.
+
+    Returns
+    -------
+    int | None: The new version, or None if the user does not exist.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(security_version=User.security_version + 1)
+        .returning(User.security_version)
+    )
+    version = result.scalar_one_or_none()
+    await db.commit()
+    if version is None:
+        return None
+
+    versions[user_id] = version
+    if cache.client is None:
+        logger.warning("User security version changed but the Redis client is not initialized.")
+        return version
+
+    try:
+        await _publish(user_id, version)
+    except cache.REDIS_UNAVAILABLE_ERRORS as e:
+        logger.warning(f"Could not publish security version {version} of user {user_id}, retrying: {e!r}")
+        _unpublished[user_id] = version
+        _schedule_retry()
+
+    return version
+
+
+async def _publish(user_id: int, version: int) -> None:
+    if cache.client is None:
+        raise MissingClientError
+
+    pipe = cache.client.pipeline(transaction=False)
+    pipe.hset(VERSIONS_KEY, str(user_id), str(version))
+    pipe.publish(CHANNEL, f"{user_id}:{version}")
+    await cache.breaker.call(pipe.execute())
+
+
+def _schedule_retry() -> None:
+    global _retry_task
+    if _retry_task is None or _retry_task.done():
+        _retry_task = asyncio.create_task(_publish_unpublished())
+
+
+async def _publish_unpublished() -> None:
+    """Publish the versions of `_unpublished` until Redis accepts them all."""
+    while _unpublished:
+        await asyncio.sleep(PUBLISH_RETRY_INTERVAL)
+        for user_id, version in list(_unpublished.items()):
+            try:
+                await _publish(user_id, version)
+            except cache.REDIS_UNAVAILABLE_ERRORS:
+                break
+
+            if _unpublished.get(user_id) == version:
+                del _unpublished[user_id]
+
+
+async def _seed_versions() -> None:
+    """Copy the bumped security versions of the database to `VERSIONS_KEY`, then mark the hash as seeded.
+
+    Versions already in the hash were published since and are kept. Users still at version 0 are left out: they
+    are loaded on first use instead.
+    """
+    if cache.client is None:
+        raise MissingClientError
+
+    async with local_session() as db:
+        result = await db.execute(select(User.id, User.security_version).where(User.security_version > 0))
+        rows = result.tuples().all()
+
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        pipe = cache.client.pipeline(transaction=False)
+        for user_id, version in rows[start : start + SEED_BATCH_SIZE]:
+            pipe.hsetnx(VERSIONS_KEY, str(user_id), str(version))
+        await pipe.execute()
+    await cache.client.hset(VERSIONS_KEY, SEEDED_FIELD, "1")  # type: ignore[misc]
+    logger.info(f"Seeded {len(rows)} user security versions from the database.")
+
+
+async def _load_versions() -> None:
+    """Merge the versions of `VERSIONS_KEY` into `versions`, seeding it first if it was never seeded or lost."""
+    if cache.client is None:
+        raise MissingClientError
+
+    stored = await cache.client.hgetall(VERSIONS_KEY)  # type: ignore[misc]
+    if SEEDED_FIELD.encode() not in stored:
+        await _seed_versions()
+        stored = await cache.client.hgetall(VERSIONS_KEY)  # type: ignore[misc]
+
+    for user_id, version in stored.items():
+        if user_id != SEEDED_FIELD.encode():
+            record_version(int(user_id), int(version))
+
+
+async def _on_message(message: dict[str, Any]) -> None:
+    if message.get("type") != "message":
+        return
+
+    try:
+        user_id, version = (int(part) for part in message["data"].split(b":"))
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring malformed security version message: {message['data']!r}")
+        return
+
+    versions[user_id] = max(version, versions.get(user_id, version))
+
+
+async def listen_for_version_changes() -> None:
+    """Keep `versions` up to date with the versions published by every worker. Runs until cancelled.
+
+    `synced` is only set while subscribed, so that versions published while disconnected are never missed, and
+    while `VERSIONS_KEY` is seeded: when the hash is flushed or evicted, it is seeded again from the database.
+    """
+    global synced
+    if cache.client is None:
+        raise MissingClientError
+
+    while True:
+        pubsub = cache.client.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            await _load_versions()
+            synced = True
+            next_check = time.monotonic() + SEED_CHECK_INTERVAL
+            while True:
+                message = await pubsub.get_message(timeout=SEED_CHECK_INTERVAL)
+                if message is not None:
+                    await _on_message(message)
+
+                if time.monotonic() >= next_check:
+                    if not await cache.client.hexists(VERSIONS_KEY, SEEDED_FIELD):  # type: ignore[misc]
+                        logger.warning("User security versions were lost from Redis, seeding them again.")
+                        synced = False
+                        await _load_versions()
+                        synced = True
+                    next_check = time.monotonic() + SEED_CHECK_INTERVAL
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"User security version subscription lost: {e!r}")
+            synced = False
+            await asyncio.sleep(1)
+
+        finally:
+            synced = False
+            await pubsub.aclose()
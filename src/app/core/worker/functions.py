@@ -1,9 +1,15 @@
 import asyncio
 import logging
+from typing import Any
 
 import uvloop
 from arq.worker import Worker
 
+from ..config import settings
+from ..db.database import local_session
+from ..setup import close_redis_cache_pool, create_redis_cache_pool
+from ..utils import cache, cached_reads, token_blacklist  # noqa: F401 - `cached_reads` registers the warmers
+
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -15,10 +21,49 @@ async def sample_background_task(ctx: Worker, name: str) -> str:
     return f"Task {name} is complete!"
 
 
+# -------- cache warming --------
+async def warm_cache(ctx: dict[str, Any]) -> str:
+    """Recompute the cached values that are missing or expire before the next run.
+
+    Warms the calls declared with `warm_kwargs` on cached endpoints plus the `CACHE_WARMING_TOP_KEYS` most
+    requested ones, at most `CACHE_WARMING_CONCURRENCY` at a time so that warming does not swamp the database.
+    """
+    calls = cache.static_warm_calls()
+    for call in await cache.hot_keys.top(cache.client, cache.breaker, settings.CACHE_WARMING_TOP_KEYS):  # type: ignore
+        if call not in calls:
+            calls.append(call)
+
+    semaphore = asyncio.Semaphore(settings.CACHE_WARMING_CONCURRENCY)
+    min_ttl = settings.CACHE_WARMING_INTERVAL_MINUTES * 60
+
+    async def _warm(name: str, kwargs: dict) -> bool:
+        async with semaphore:
+            try:
+                async with local_session() as db:
+                    return await cache.warm(name, kwargs, db, min_ttl)
+            except Exception as e:
+                logging.warning(f"Could not warm cache for {name}({kwargs}): {e}")
+                return False
+
+    warmed = await asyncio.gather(*(_warm(name, kwargs) for name, kwargs in calls))
+    await cache.hot_keys.decay(cache.client, cache.breaker)  # type: ignore
+    return f"Warmed {sum(warmed)} of {len(calls)} cache keys"
+
+
+# -------- token blacklist --------
+async def purge_token_blacklist(ctx: dict[str, Any]) -> str:
+    """Delete the expired rows of the token blacklist, `TOKEN_BLACKLIST_PURGE_BATCH_SIZE` at a time."""
+    async with local_session() as db:
+        deleted = await token_blacklist.purge_expired(db, settings.TOKEN_BLACKLIST_PURGE_BATCH_SIZE)
+    return f"Purged {deleted} expired blacklisted tokens"
+
+
 # -------- base functions --------
 async def startup(ctx: Worker) -> None:
+    await create_redis_cache_pool()
     logging.info("Worker Started")
 
 
 async def shutdown(ctx: Worker) -> None:
+    await close_redis_cache_pool()
     logging.info("Worker end")
@@ -1,14 +1,25 @@
 from arq.connections import RedisSettings
+from arq.cron import cron
 
 from ...core.config import settings
-from .functions import sample_background_task, shutdown, startup
+from .functions import purge_token_blacklist, sample_background_task, shutdown, startup, warm_cache
 
 REDIS_QUEUE_HOST = settings.REDIS_QUEUE_HOST
 REDIS_QUEUE_PORT = settings.REDIS_QUEUE_PORT
 
+CACHE_WARMING_MINUTES = set(range(0, 60, settings.CACHE_WARMING_INTERVAL_MINUTES))
+TOKEN_BLACKLIST_PURGE_MINUTES = set(range(0, 60, settings.TOKEN_BLACKLIST_PURGE_INTERVAL_MINUTES))
+
 
 class WorkerSettings:
     functions = [sample_background_task]
+    cron_jobs = (
+        [cron(warm_cache, minute=CACHE_WARMING_MINUTES, run_at_startup=True)] if settings.CACHE_WARMING_ENABLED else []
+    ) + (
+        [cron(purge_token_blacklist, minute=TOKEN_BLACKLIST_PURGE_MINUTES)]
+        if settings.TOKEN_BLACKLIST_PURGE_ENABLED
+        else []
+    )
     redis_settings = RedisSettings(host=REDIS_QUEUE_HOST, port=REDIS_QUEUE_PORT)
     on_startup = startup
     on_shutdown = shutdown
@@ -1,56 +1,174 @@
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from collections.abc import Callable
+from typing import Any
 
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class ClientCacheMiddleware(BaseHTTPMiddleware):
-    """Middleware to set the `Cache-Control` header for client-side caching on all responses.
+from ..core.utils.cache import compute_etag, etag_matches
+
+CACHE_POLICY_ATTRIBUTE = "__cache_policy__"
+VISIBILITIES = ("public", "private", "no-store")
+
+
+class CachePolicy:
+    """Client-side cache policy of a route, declared with `cache_control`.
 
     Parameters
     ----------
-    app: FastAPI
-        The FastAPI application instance.
-    max_age: int, optional
-        Duration (in seconds) for which the response should be cached. Defaults to 60 seconds.
+    visibility: str
+        'public' (shared caches may store the response), 'private' (only the client may) or 'no-store'.
+    max_age: int | None
+        Duration (in seconds) for which the response may be cached. Defaults to the middleware `max_age`.
+    vary: List[str] | None
+        Request headers the response depends on, sent in the `Vary` header.
+    etag: bool
+        Whether successful GET responses get an `ETag` and conditional requests a 304.
+    """
+
+    def __init__(
+        self, visibility: str = "public", max_age: int | None = None, vary: list[str] | None = None, etag: bool = True
+    ) -> None:
+        if visibility not in VISIBILITIES:
+            raise ValueError(f"Cache visibility must be one of {VISIBILITIES}.")
+
+        self.visibility = visibility
+        self.max_age = max_age
+        self.vary = ", ".join(vary) if vary else None
+        self.etag = etag and visibility != "no-store"
+
+    def cache_control(self, default_max_age: int) -> str:
+        if self.visibility == "no-store":
+            return "no-store"
+        max_age = self.max_age if self.max_age is not None else default_max_age
+        return f"{self.visibility}, max-age={max_age}"
+
+
+def cache_control(
+    visibility: str = "public", max_age: int | None = None, vary: list[str] | None = None, etag: bool = True
+) -> Callable:
+    """Declare the client-side cache policy of an endpoint, applied by `ClientCacheMiddleware`.
 
-    Attributes
+    Example usage
+    -------------
+
+    ```python
+    @router.get("/user/me/", response_model=UserRead)
+    @cache_control("private", max_age=0)
+    async def read_users_me(request: Request, current_user: Annotated[UserRead, Depends(get_current_user)]) -> dict:
+        return current_user
+    ```
+
+    Parameters
     ----------
-    max_age: int
-        Duration (in seconds) for which the response should be cached.
+    visibility: str, default 'public'
+        'public', 'private' or 'no-store'.
+    max_age: int | None, optional
+        Duration (in seconds) for which the response may be cached. Defaults to `CLIENT_CACHE_MAX_AGE`.
+    vary: List[str] | None, optional
+        Request headers the response depends on.
+    etag: bool, default True
+        Whether successful GET responses get an `ETag` and conditional requests a 304.
 
-    Methods
+    Returns
     -------
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        Process the request and set the `Cache-Control` header in the response.
+    Callable
+        A decorator attaching the policy to the endpoint function.
+    """
+    policy = CachePolicy(visibility=visibility, max_age=max_age, vary=vary, etag=etag)
+
+    def decorator(func: Callable) -> Callable:
+        setattr(func, CACHE_POLICY_ATTRIBUTE, policy)
+        return func
+
+    return decorator
+
+
+def get_cache_policy(endpoint: Any) -> CachePolicy | None:
+    return getattr(endpoint, CACHE_POLICY_ATTRIBUTE, None)
+
+
+class ClientCacheMiddleware:
+    """ASGI middleware applying the client-side cache policies declared on routes with `cache_control`.
+
+    Responses of routes with a policy get its `Cache-Control` (and `Vary`) header. Successful GET responses of
+    those routes also get a strong `ETag`, and requests whose `If-None-Match` matches it are answered with an empty
+    304. Routes without a policy are left untouched.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The wrapped ASGI application.
+    max_age: int, optional
+        Default duration (in seconds) for which responses may be cached. Defaults to 60 seconds.
 
     Note
     ----
-        - The `Cache-Control` header instructs clients (e.g., browsers)
-        to cache the response for the specified duration.
+        - The policy is looked up on the endpoint that the router stores in the ASGI scope, so it is only known
+        once the response starts; requests to routes without a policy only pay for that lookup.
+        - Responses that already carry an `ETag` (e.g. from the `cache` decorator) are not buffered nor hashed.
+        - Streamed responses (whose body is sent in several messages) get no `ETag`.
     """
 
-    def __init__(self, app: FastAPI, max_age: int = 60) -> None:
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, max_age: int = 60) -> None:
+        self.app = app
         self.max_age = max_age
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        """Process the request and set the `Cache-Control` header in the response.
-
-        Parameters
-        ----------
-        request: Request
-            The incoming request.
-        call_next: RequestResponseEndpoint
-            The next middleware or route handler in the processing chain.
-
-        Returns
-        -------
-        Response
-            The response object with the `Cache-Control` header set.
-
-        Note
-        ----
-            - This method is automatically called by Starlette for processing the request-response cycle.
-        """
-        response: Response = await call_next(request)
-        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+
+        async def send_with_policy(message: Message) -> None:
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                policy = get_cache_policy(scope.get("endpoint"))
+                if policy is None:
+                    await send(message)
+                    return
+
+                headers = MutableHeaders(scope=message)
+                headers["Cache-Control"] = policy.cache_control(self.max_age)
+                if policy.vary:
+                    headers["Vary"] = policy.vary
+
+                if policy.etag and scope["method"] == "GET" and message["status"] == 200 and "etag" not in headers:
+                    start_message = message
+                    return
+
+                await send(message)
+                return
+
+            if start_message is None:
+                await send(message)
+                return
+
+            if message.get("more_body", False):
+                # A streamed response: pass it through without an ETag rather than buffering all of it.
+                await send(start_message)
+                start_message = None
+                await send(message)
+                return
+
+            await _send_with_etag(scope, send, start_message, message.get("body", b""))
+
+        await self.app(scope, receive, send_with_policy)
+
+
+async def _send_with_etag(scope: Scope, send: Send, start_message: Message, body: bytes) -> None:
+    etag = compute_etag(body)
+    headers = MutableHeaders(scope=start_message)
+    headers["ETag"] = etag
+
+    if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+        start_message["status"] = 304
+        for header in ("content-length", "content-type"):
+            if header in headers:
+                del headers[header]
+        body = b""
+
+    await send(start_message)
+    await send({"type": "http.response.body", "body": body, "more_body": False})
+
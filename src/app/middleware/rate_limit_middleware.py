@@ -0,0 +1,219 @@
+import math
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..core.db.database import local_session
+from ..core.security import Principal, get_principal, resolve_principal
+from ..core.utils.rate_limit import RateLimitResult, check_rate_limit
+from ..core.utils.rate_limit_rules import RateLimitRule, rules
+from ..core.utils.token_blacklist import token_digest
+from ..core.utils.user_versions import is_stale
+from ..schemas.rate_limit import sanitize_path
+
+RATE_LIMITED_ATTRIBUTE = "__rate_limited__"
+
+
+def rate_limited(func: Callable) -> Callable:
+    """Mark an endpoint as rate limited by `RateLimitMiddleware`.
+
+    Example usage
+    -------------
+
+    ```python
+    @router.post("/task", response_model=Job, status_code=201)
+    @rate_limited
+    async def create_task(message: str) -> dict[str, str]:
+        ...
+    ```
+    """
+    setattr(func, RATE_LIMITED_ATTRIBUTE, True)
+    return func
+
+
+def is_rate_limited_endpoint(endpoint: Any) -> bool:
+    return getattr(endpoint, RATE_LIMITED_ATTRIBUTE, False)
+
+
+def quota_headers(rule: RateLimitRule, result: RateLimitResult) -> dict[str, str]:
+    """Return the `RateLimit-*` headers (IETF draft) of the quota left, and `Retry-After` if the request is limited."""
+    reset = str(math.ceil(result.reset_after))
+    headers = {
+        "RateLimit-Limit": str(rule.limit),
+        "RateLimit-Remaining": str(max(result.remaining, 0)),
+        "RateLimit-Reset": reset,
+        "RateLimit-Policy": f"{rule.limit};w={rule.period}",
+    }
+    if result.limited:
+        headers["Retry-After"] = reset
+    return headers
+
+
+class RouteIndex:
+    """The rate limited routes of an application, compiled once into a lookup from request path to route template.
+
+    Routes without path parameters are looked up in a dict; only the rate limited routes with path parameters
+    are matched with their regular expression. The template of a route is sanitized like `RateLimit.path`, e.g.
+    '/api/v1/{username}/post/{id}' becomes 'api_v1_{username}_post_{id}', so that a rule covers every request
+    to the route and rate limit keys are bounded by the number of routes.
+
+    Parameters
+    ----------
+    routes: Iterable[BaseRoute]
+        The routes of the application, e.g. `app.router.routes`.
+    """
+
+    def __init__(self, routes: Iterable[BaseRoute]) -> None:
+        self._static: dict[str, list[tuple[set[str] | None, str]]] = {}
+        self._dynamic: list[tuple[re.Pattern, set[str] | None, str]] = []
+
+        for route in routes:
+            if not is_rate_limited_endpoint(getattr(route, "endpoint", None)):
+                continue
+
+            methods = getattr(route, "methods", None)
+            template = sanitize_path(route.path_format)  # type: ignore
+            if route.param_convertors:  # type: ignore
+                self._dynamic.append((route.path_regex, methods, template))  # type: ignore
+            else:
+                self._static.setdefault(route.path, []).append((methods, template))  # type: ignore
+
+    @property
+    def templates(self) -> list[str]:
+        """The sanitized templates of every rate limited route."""
+        templates = [template for routes in self._static.values() for _, template in routes]
+        templates.extend(template for _, _, template in self._dynamic)
+        return list(dict.fromkeys(templates))
+
+    def match(self, path: str, method: str) -> str | None:
+        """Return the sanitized template of the rate limited route serving the request, if any."""
+        for methods, template in self._static.get(path, ()):
+            if methods is None or method in methods:
+                return template
+
+        for path_regex, methods, template in self._dynamic:
+            if (methods is None or method in methods) and path_regex.match(path):
+                return template
+
+        return None
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing the tier rate limits of the endpoints marked with `rate_limited`.
+
+    The principal of every request is created from its bearer token (decoded once) and stored in the request
+    state, where `get_current_user` and `get_optional_user` reuse it. Requests over their limit are answered
+    with a 429 before reaching the router, so they never open a request database session. Every response of a
+    rate limited route carries the quota left (see `quota_headers`), taken from the same Redis call that
+    counted the request.
+
+    Parameters
+    ----------
+    app: ASGIApp
+        The wrapped ASGI application.
+    principal_ttl: int, optional
+        Duration (in seconds) for which the user ID and tier of a token looked up in the database are remembered,
+        so that repeated requests are limited without another lookup. Defaults to 60 seconds.
+    max_principals: int, optional
+        Maximum number of remembered users. Defaults to 10000.
+
+    Note
+    ----
+        - Rules and rate limit keys use the template of the matched route (see `RouteIndex`), built from the
+        application routes on the first request.
+        - Only rate limited routes are indexed: a request is limited if its path and method match one of them,
+        even if a route registered before it would serve the request.
+        - Tokens carrying up-to-date user claims (see `user_versions.is_stale`) are limited by their `uid` and
+        `tier_id` claims, without a database lookup; the route still checks the blacklist.
+        - Other tokens are looked up (blacklist and user) in a short-lived session, and remembered by user ID, or by
+        token digest for tokens minted without claims; the resolved user is kept in the principal, so the route
+        does not look it up again.
+        - Tier changes of a user apply to rate limiting once their security version is bumped, or after at most
+        `principal_ttl` seconds for remembered users.
+    """
+
+    def __init__(self, app: ASGIApp, principal_ttl: int = 60, max_principals: int = 10000) -> None:
+        self.app = app
+        self.principal_ttl = principal_ttl
+        self.max_principals = max_principals
+        self._principals: OrderedDict[str, tuple[float, int, int | None]] = OrderedDict()
+        self._route_index: RouteIndex | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        principal = get_principal(scope)
+        template = self._match_route(scope)
+        if template is None:
+            await self.app(scope, receive, send)
+            return
+
+        identifier, tier_id = await self._identify(principal)
+        if not rules.loaded:
+            async with local_session() as db:
+                await rules.ensure_loaded(db)
+
+        rule = rules.resolve(tier_id, template)
+        result = await check_rate_limit(
+            user_id=identifier, path=template, limit=rule.limit, period=rule.period, algorithm=rule.algorithm
+        )
+        headers = quota_headers(rule, result)
+        if result.limited:
+            response = JSONResponse({"detail": "Rate limit exceeded."}, status_code=429, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_quota(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
+                for name, value in headers.items():
+                    response_headers.append(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_quota)
+
+    def _match_route(self, scope: Scope) -> str | None:
+        if self._route_index is None:
+            router = getattr(scope.get("app"), "router", None)
+            self._route_index = RouteIndex(getattr(router, "routes", []))
+
+        path, root_path = scope["path"], scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        return self._route_index.match(path, scope["method"])
+
+    async def _identify(self, principal: Principal) -> tuple[int | str, int | None]:
+        """Return the user ID and tier ID of the principal, or its host and no tier if it is not a user."""
+        token_data = principal.token_data
+        if principal.token is None or token_data is None or token_data.is_anonymous:
+            return principal.host or "unknown", None
+
+        if token_data.user_id is not None and not is_stale(token_data.user_id, token_data.security_version):
+            return token_data.user_id, token_data.tier_id
+
+        key = str(token_data.user_id) if token_data.user_id is not None else token_digest(principal.token)
+        remembered = self._principals.get(key)
+        if remembered is not None and remembered[0] > time.monotonic():
+            self._principals.move_to_end(key)
+            return remembered[1], remembered[2]
+
+        async with local_session() as db:
+            user = await resolve_principal(principal, db)
+        if user is None:
+            return principal.host or "unknown", None
+
+        self._principals[key] = (time.monotonic() + self.principal_ttl, user["id"], user["tier_id"])
+        self._principals.move_to_end(key)
+        while len(self._principals) > self.max_principals:
+            self._principals.popitem(last=False)
+
+        return user["id"], user["tier_id"]
@@ -97,6 +97,11 @@ class User(Base):
         default=False,
         nullable=False
     )
+    security_version: Mapped[int] = mapped_column(
+        default=0,
+        server_default="0",
+        nullable=False
+    )
 
     # timestamp fields with defaults
     updated_at: Mapped[datetime | None] = mapped_column(
@@ -1,10 +1,19 @@
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, Literal, cast, get_args
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 from ..core.schemas import TimestampSchema
 
+RateLimitAlgorithm = Literal["fixed_window", "sliding_window", "gcra"]
+
+
+def rate_limit_algorithm(value: str) -> RateLimitAlgorithm:
+    """Return `value` as a `RateLimitAlgorithm`, e.g. when it is read from the environment."""
+    if value not in get_args(RateLimitAlgorithm):
+        raise ValueError(f"Unknown rate limit algorithm '{value}', expected one of {get_args(RateLimitAlgorithm)}.")
+    return cast(RateLimitAlgorithm, value)
+
 
 def sanitize_path(path: str) -> str:
     return path.strip("/").replace("/", "_")
@@ -14,6 +23,7 @@ class RateLimitBase(BaseModel):
     path: Annotated[str, Field(examples=["users"])]
     limit: Annotated[int, Field(examples=[5])]
     period: Annotated[int, Field(examples=[60])]
+    algorithm: Annotated[RateLimitAlgorithm, Field(default="fixed_window", examples=["gcra"])]
 
     @field_validator("path")
     def validate_and_sanitize_path(cls, v: str) -> str:
@@ -31,6 +41,15 @@ class RateLimitRead(RateLimitBase):
     name: str
 
 
+class RateLimitUsage(BaseModel):
+    path: Annotated[str, Field(examples=["api_v1_tasks_task"])]
+    limit: Annotated[int, Field(examples=[5])]
+    period: Annotated[int, Field(examples=[60])]
+    algorithm: RateLimitAlgorithm
+    remaining: Annotated[int, Field(examples=[3])]
+    reset_after: Annotated[float, Field(examples=[42.0])]
+
+
 class RateLimitCreate(RateLimitBase):
     model_config = ConfigDict(extra="forbid")
 
@@ -45,6 +64,7 @@ class RateLimitUpdate(BaseModel):
     path: str | None = Field(default=None)
     limit: int | None = None
     period: int | None = None
+    algorithm: RateLimitAlgorithm | None = None
     name: str | None = None
 
     @field_validator("path")
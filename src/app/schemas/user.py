@@ -74,6 +74,14 @@ class UserRead(BaseModel):
     tier_id: int | None
 
 
+class UserCached(UserRead):
+    """Fields of the users kept in the user cache: what the endpoints and the authentication dependencies read."""
+
+    is_superuser: bool
+    security_version: int
+    is_deleted: bool
+
+
 class UserCreate(UserBase):
     model_config = ConfigDict(extra="forbid")
     password: Annotated[str, Field(pattern=r"^.{8,}|[0-9]+|[A-Z]+|[a-z]+|[^a-zA-Z0-9]+$", examples=["Str1ngst!"])]
@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+import bcrypt
+
+from ..app.core.exceptions.http_exceptions import ServiceUnavailableException
+from ..app.core.security import PasswordHasher
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PASSWORD = b"correct horse battery staple"
+TICK = 0.005
+
+
+async def inline_check(hashed_password: bytes) -> bool:
+    """The former `verify_password`: bcrypt runs on the event loop."""
+    return bcrypt.checkpw(PASSWORD, hashed_password)
+
+
+def pooled_checker(hasher: PasswordHasher) -> Callable[[bytes], Awaitable[bool]]:
+    """The current `verify_password`: bcrypt runs in the bounded thread pool of `hasher`."""
+
+    async def check(hashed_password: bytes) -> bool:
+        return await hasher.run(bcrypt.checkpw, PASSWORD, hashed_password)
+
+    return check
+
+
+async def measure_lag(stop: asyncio.Event) -> list[float]:
+    """Sleep for `TICK` seconds in a loop and record how late each wake-up is, in milliseconds."""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+    return lags
+
+
+async def run(name: str, check: Callable[[bytes], Awaitable[bool]], hashed_password: bytes, logins: int) -> None:
+    """Run `logins` concurrent password checks while measuring the event loop lag, and log both."""
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(TICK)
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(check(hashed_password) for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = sorted(await ticker)
+    rejected = sum(isinstance(outcome, ServiceUnavailableException) for outcome in outcomes)
+    logger.info(
+        f"{name:>8}: {logins} logins in {elapsed:.2f}s ({rejected} rejected), event loop lag "
+        f"p50 {lags[len(lags) // 2]:.1f}ms, p99 {lags[int(len(lags) * 0.99)]:.1f}ms, max {lags[-1]:.1f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the event loop lag of inline and pooled bcrypt checks.")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=64)
+    args = parser.parse_args()
+
+    hashed_password = bcrypt.hashpw(PASSWORD, bcrypt.gensalt(rounds=args.rounds))
+    await run("inline", inline_check, hashed_password, args.logins)
+    await run("pooled", pooled_checker(PasswordHasher(args.workers, args.max_queue)), hashed_password, args.logins)
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+
+import redis.asyncio as redis
+
+from ..app.core.config import settings
+from ..app.core.utils import rate_limit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PATH = "api/v1/benchmark"
+
+
+async def legacy_is_rate_limited(user_id: int, limit: int, period: int) -> bool:
+    """The former scheme: INCR, then EXPIRE on the first request of the window (two round trips)."""
+    current_timestamp = int(datetime.now(UTC).timestamp())
+    window_start = current_timestamp - (current_timestamp % period)
+    key = f"ratelimit:legacy:{user_id}:{PATH}:{window_start}"
+
+    current_count = await rate_limit.client.incr(key)  # type: ignore
+    if current_count == 1:
+        await rate_limit.client.expire(key, period)  # type: ignore
+    return current_count > limit
+
+
+def scripted_checker(algorithm: str, limit: int, period: int) -> Callable[[int], Awaitable[bool]]:
+    """The single EVALSHA scheme of `rate_limit.check_rate_limit` with the given algorithm."""
+
+    async def check(user_id: int) -> bool:
+        result = await rate_limit.check_rate_limit(f"benchmark:{user_id}", PATH, limit, period, algorithm)
+        return result.limited
+
+    return check
+
+
+async def run(
+    name: str, check: Callable[[int], Awaitable[bool]], requests: int, concurrency: int, users: int
+) -> None:
+    """Run `requests` checks spread over `users` users, `concurrency` at a time, and log the throughput."""
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i % users)
+
+    limited = 0
+
+    async def worker() -> None:
+        nonlocal limited
+        while not queue.empty():
+            limited += bool(await check(queue.get_nowait()))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    logger.info(f"{name:>15}: {requests / elapsed:>9.0f} req/s, {limited} of {requests} requests limited")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the throughput of the rate limiting schemes.")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--period", type=int, default=60)
+    args = parser.parse_args()
+
+    rate_limit.pool = redis.ConnectionPool.from_url(settings.REDIS_RATE_LIMIT_URL)
+    rate_limit.client = redis.Redis.from_pool(rate_limit.pool)  # type: ignore
+    try:
+        sizes = (args.requests, args.concurrency, args.users)
+        await run("legacy", lambda user_id: legacy_is_rate_limited(user_id, args.limit, args.period), *sizes)
+        for algorithm in rate_limit.ALGORITHMS:
+            await run(algorithm, scripted_checker(algorithm, args.limit, args.period), *sizes)
+    finally:
+        await rate_limit.client.aclose()  # type: ignore
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
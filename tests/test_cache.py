@@ -0,0 +1,338 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import fakeredis
+import pytest
+from pytest_mock import MockerFixture
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.app.core.exceptions.http_exceptions import NotFoundException
+from src.app.core.utils import cache as cache_module
+from src.app.core.utils.cache import (
+    _UNDECODABLE,
+    CacheCodec,
+    CachedNotFound,
+    HotKeys,
+    LocalCache,
+    _in_flight,
+    _single_flight,
+    _warmer_name,
+    cache,
+    compute_etag,
+    etag_matches,
+)
+from src.app.core.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.app.core.utils.metrics import Metrics, summarize_histogram
+from src.app.middleware.client_cache_middleware import ClientCacheMiddleware, cache_control
+
+
+def test_local_cache_evicts_least_recently_used() -> None:
+    local_cache = LocalCache(max_entries=2, max_bytes=1024, expiration=60)
+    local_cache.set("a", b"1")
+    local_cache.set("b", b"2")
+    local_cache.get("a")
+    local_cache.set("c", b"3")
+
+    assert local_cache.get("a") == b"1"
+    assert local_cache.get("b") is None
+    assert local_cache.get("c") == b"3"
+
+
+def test_local_cache_is_bounded_by_bytes() -> None:
+    local_cache = LocalCache(max_entries=10, max_bytes=8, expiration=60)
+    local_cache.set("a", b"1234")
+    local_cache.set("b", b"5678")
+    local_cache.set("c", b"9")
+
+    assert local_cache.get("a") is None
+    assert local_cache.size <= 8
+
+    local_cache.set("too_big", b"123456789")
+    assert local_cache.get("too_big") is None
+
+
+def test_local_cache_expires_entries() -> None:
+    local_cache = LocalCache(max_entries=10, max_bytes=1024, expiration=60)
+    local_cache.set("a", b"1", expiration=0)
+    local_cache.set("b", b"2", expiration=-1)
+
+    assert local_cache.get("a") is None
+    assert local_cache.get("b") is None
+
+
+def test_local_cache_deletes_by_pattern() -> None:
+    local_cache = LocalCache(max_entries=10, max_bytes=1024, expiration=60)
+    local_cache.set("alice_posts:page_1:items_per_page:10:alice", b"1")
+    local_cache.set("alice_post_cache:1", b"2")
+
+    local_cache.delete_pattern("alice_posts:*")
+
+    assert local_cache.get("alice_posts:page_1:items_per_page:10:alice") is None
+    assert local_cache.get("alice_post_cache:1") == b"2"
+    assert len(local_cache) == 1
+
+
+def test_single_flight_coalesces_concurrent_loads() -> None:
+    calls = 0
+
+    async def load() -> dict[str, int]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    async def run() -> list[dict[str, int]]:
+        return await asyncio.gather(*(_single_flight("key", load) for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert calls == 1
+    assert all(result == {"value": 1} for result in results)
+    assert "key" not in _in_flight
+
+
+def test_circuit_breaker_opens_on_timeouts_and_closes_after_probe() -> None:
+    breaker = CircuitBreaker("test", call_timeout=0.01, failure_threshold=2, reset_timeout=0.05)
+
+    async def call(delay: float) -> str:
+        await asyncio.sleep(delay)
+        return "ok"
+
+    async def run() -> list[str]:
+        outcomes = []
+        for delay in (1, 1, 0, None, 0):
+            if delay is None:
+                await asyncio.sleep(0.06)
+                continue
+            try:
+                outcomes.append(await breaker.call(call(delay)))
+            except TimeoutError:
+                outcomes.append("timeout")
+            except CircuitOpenError:
+                outcomes.append("open")
+        return outcomes
+
+    assert asyncio.run(run()) == ["timeout", "timeout", "open", "ok"]
+    assert breaker.snapshot()["state"] == "closed"
+    assert breaker.snapshot()["times_opened"] == 1
+
+
+def test_codec_round_trip_with_compression() -> None:
+    codec = CacheCodec(compressor="zlib", compress_min_size=64)
+    data = {"data": [{"id": i, "text": "lorem ipsum " * 20} for i in range(10)], "page": 1}
+
+    envelope, payload, etag = codec.encode(data)
+
+    assert len(envelope) < len(payload)
+    assert codec.decode(envelope) == data
+    assert CacheCodec().decode(envelope) == data
+    assert codec.decode_json_body(envelope) == (payload, etag)
+
+
+def test_codec_reads_legacy_json_and_rejects_unknown_versions() -> None:
+    codec = CacheCodec()
+
+    assert codec.decode(b'{"id": 1}') == {"id": 1}
+    assert codec.decode_json_body(b'{"id": 1}') == (b'{"id": 1}', compute_etag(b'{"id": 1}'))
+    assert codec.decode(bytes((0xC5, 99, 1, 0)) + b"{}") is _UNDECODABLE
+
+
+def test_codec_round_trip_not_found_marker() -> None:
+    codec = CacheCodec(compressor="zlib")
+    envelope = codec.encode_not_found("User not found")
+
+    assert codec.decode(envelope) == CachedNotFound("User not found")
+    assert CacheCodec().decode_json_body(envelope) == CachedNotFound("User not found")
+
+
+def test_hot_keys_record_plain_kwargs_up_to_limit() -> None:
+    hot_keys = HotKeys(max_tracked=2)
+    hot_keys.record("read_posts", {"username": "alice", "page": 1, "db": object()})
+    hot_keys.record("read_posts", {"username": "alice", "page": 1, "db": object()})
+    hot_keys.record("read_post", {"username": "alice", "id": 1})
+    hot_keys.record("read_post", {"username": "bob", "id": 2})
+
+    assert hot_keys._counts == {
+        '{"kwargs": {"page": 1, "username": "alice"}, "name": "read_posts"}': 2,
+        '{"kwargs": {"id": 1, "username": "alice"}, "name": "read_post"}': 1,
+    }
+
+
+def test_warming_skips_lookups_of_missing_resources(mocker: MockerFixture) -> None:
+    mocker.patch.object(cache_module, "client", fakeredis.FakeAsyncRedis())
+    mocker.patch.object(cache_module, "breaker", CircuitBreaker("test", call_timeout=1))
+    mocker.patch.object(cache_module, "hot_keys", HotKeys())
+    mocker.patch.dict(cache_module._warmers)
+    existing = {"alice"}
+
+    @cache(key_prefix="profile", resource_id_name="username", negative_expiration=30)
+    async def read_profile(request: Request, username: str) -> dict:
+        if username not in existing:
+            raise NotFoundException("User not found")
+        return {"username": username}
+
+    async def scenario() -> None:
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+        await read_profile(request, username="alice")
+        for _ in range(2):
+            with pytest.raises(NotFoundException):
+                await read_profile(request, username="bob")
+
+        await cache_module.hot_keys.flush(cache_module.client, cache_module.breaker)  # type: ignore
+        assert await cache_module.hot_keys.top(cache_module.client, cache_module.breaker, 10) == [  # type: ignore
+            (_warmer_name(read_profile), {"username": "alice"})
+        ]
+        assert not await cache_module.warm(_warmer_name(read_profile), {"username": "bob"}, db=None)  # type: ignore
+
+        existing.clear()
+        await cache_module.client.delete("profile:alice")  # type: ignore
+        assert not await cache_module.warm(_warmer_name(read_profile), {"username": "alice"}, db=None)  # type: ignore
+
+    asyncio.run(scenario())
+
+
+def test_raw_response_hits_return_the_stored_body_and_etag(mocker: MockerFixture) -> None:
+    mocker.patch.object(cache_module, "client", fakeredis.FakeAsyncRedis())
+    mocker.patch.object(cache_module, "breaker", CircuitBreaker("test", call_timeout=1))
+    mocker.patch.object(cache_module, "local_cache", None)
+    mocker.patch.object(cache_module, "codec", CacheCodec(compressor="zlib", compress_min_size=16))
+    mocker.patch.dict(cache_module._warmers)
+    encode = mocker.spy(cache_module.codec, "encode")
+
+    @cache(key_prefix="page", resource_id_name="id", raw_response=True)
+    async def read_page(request: Request, id: int) -> dict:
+        return {"id": id, "text": "é ünïcode " * 10, "ratio": 0.1}
+
+    async def scenario() -> None:
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+        miss = await read_page(request, id=1)
+        hit = await read_page(request, id=1)
+        assert hit.body == miss.body
+        assert hit.headers["ETag"] == miss.headers["ETag"] == compute_etag(miss.body)
+        assert hit.media_type == "application/json"
+
+        conditional = Request(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": "/",
+                "headers": [(b"if-none-match", miss.headers["ETag"].encode())],
+                "query_string": b"",
+            }
+        )
+        not_modified = await read_page(conditional, id=1)
+        assert (not_modified.status_code, not_modified.body) == (304, b"")
+        assert not_modified.headers["ETag"] == miss.headers["ETag"]
+
+    asyncio.run(scenario())
+    encode.assert_called_once()
+
+
+def test_invalidate_tags_deletes_tagged_keys_and_tag_sets(mocker: MockerFixture) -> None:
+    mocker.patch.object(cache_module, "client", fakeredis.FakeAsyncRedis())
+    mocker.patch.object(cache_module, "breaker", CircuitBreaker("test", call_timeout=1))
+    redis = cache_module.client
+
+    async def scenario() -> None:
+        await cache_module._set_tagged("alice_posts:page_1", b"1", 60, ["alice_posts"])
+        await cache_module._set_tagged("alice_posts:page_2", b"2", 120, ["alice_posts", "posts"])
+        await cache_module._set_tagged("bob_posts:page_1", b"3", 60, ["bob_posts", "posts"])
+        assert await redis.smembers("cache_tag:alice_posts") == {b"alice_posts:page_1", b"alice_posts:page_2"}
+        assert 60 < await redis.ttl("cache_tag:alice_posts") <= 120
+        assert 60 < await redis.ttl("cache_tag:posts") <= 120
+
+        await cache_module.invalidate_tags("alice_posts")
+
+        assert not await redis.exists("alice_posts:page_1", "alice_posts:page_2", "cache_tag:alice_posts")
+        assert await redis.get("bob_posts:page_1") == b"3"
+        assert await redis.smembers("cache_tag:bob_posts") == {b"bob_posts:page_1"}
+
+    asyncio.run(scenario())
+
+
+def test_metrics_histogram_is_cumulative() -> None:
+    metrics = Metrics("test")
+    metrics.observe("{username}_posts", "payload_bytes", 300, (256, 1024))
+    metrics.observe("{username}_posts", "payload_bytes", 100, (256, 1024))
+
+    summary = summarize_histogram(metrics.snapshot()["{username}_posts"], "payload_bytes", (256, 1024))
+
+    assert summary == {"count": 2, "mean": 200.0, "buckets": {"le_256": 1, "le_1024": 2}}
+
+
+def test_etag_matches_if_none_match() -> None:
+    etag = compute_etag(b'{"id": 1}')
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+@cache_control("public", max_age=30)
+async def cached_page(request: Request) -> Response:
+    status_code = 404 if request.path_params["name"] == "missing" else 200
+    return PlainTextResponse(f"page {request.path_params['name']}", status_code=status_code)
+
+
+@cache_control("public", max_age=30)
+async def streamed_page(request: Request) -> Response:
+    async def chunks() -> AsyncIterator[bytes]:
+        yield b"page "
+        yield b"streamed"
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+async def uncached_page(request: Request) -> Response:
+    return PlainTextResponse("page uncached")
+
+
+CLIENT_CACHE_APP = Starlette(
+    routes=[
+        Route("/pages/streamed", streamed_page),
+        Route("/pages/uncached", uncached_page),
+        Route("/pages/{name}", cached_page),
+    ],
+    middleware=[Middleware(ClientCacheMiddleware, max_age=60)],
+)
+
+
+def test_client_cache_middleware_answers_current_copies_with_304() -> None:
+    with TestClient(CLIENT_CACHE_APP) as client:
+        response = client.get("/pages/first")
+        revalidated = client.get("/pages/first", headers={"If-None-Match": response.headers["ETag"]})
+        changed = client.get("/pages/second", headers={"If-None-Match": response.headers["ETag"]})
+
+    assert response.status_code == 200 and response.text == "page first"
+    assert response.headers["ETag"] == compute_etag(b"page first")
+    assert response.headers["Cache-Control"] == "public, max-age=30"
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["ETag"] == response.headers["ETag"]
+    assert "content-length" not in revalidated.headers
+    assert changed.status_code == 200 and changed.headers["ETag"] == compute_etag(b"page second")
+
+
+@pytest.mark.parametrize("path", ["/pages/missing", "/pages/streamed"])
+def test_client_cache_middleware_does_not_tag_errors_nor_streams(path: str) -> None:
+    with TestClient(CLIENT_CACHE_APP) as client:
+        response = client.get(path, headers={"If-None-Match": "*"})
+
+    assert response.status_code in (200, 404) and response.text.startswith("page ")
+    assert response.headers["Cache-Control"] == "public, max-age=30"
+    assert "ETag" not in response.headers
+
+
+def test_client_cache_middleware_ignores_routes_without_policy() -> None:
+    with TestClient(CLIENT_CACHE_APP) as client:
+        response = client.get("/pages/uncached")
+
+    assert response.text == "page uncached"
+    assert "Cache-Control" not in response.headers and "ETag" not in response.headers
+
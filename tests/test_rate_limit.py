@@ -0,0 +1,354 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Generator
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any
+
+import fakeredis
+import pytest
+from pytest_mock import MockerFixture
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.app.core import security
+from src.app.core.utils import rate_limit, rate_limit_rules, user_versions
+from src.app.core.utils.circuit_breaker import CircuitBreaker
+from src.app.core.utils.rate_limit import RateLimitResult
+from src.app.core.utils.rate_limit_rules import RateLimitRule, RuleTable
+from src.app.middleware import rate_limit_middleware
+from src.app.middleware.rate_limit_middleware import RateLimitMiddleware, RouteIndex, quota_headers, rate_limited
+
+
+@pytest.fixture
+def redis_server(mocker: MockerFixture) -> Generator[fakeredis.FakeServer, None, None]:
+    server = fakeredis.FakeServer()
+    mocker.patch.object(rate_limit, "client", fakeredis.FakeAsyncRedis(server=server))
+    mocker.patch.object(rate_limit, "breaker", CircuitBreaker("test", call_timeout=1))
+    mocker.patch.object(rate_limit, "hybrid", None)
+    yield server
+
+
+def test_quota_headers() -> None:
+    rule = RateLimitRule(limit=10, period=60, algorithm="fixed_window")
+
+    assert quota_headers(rule, RateLimitResult(limited=False, remaining=4, reset_after=12.2)) == {
+        "RateLimit-Limit": "10",
+        "RateLimit-Remaining": "4",
+        "RateLimit-Reset": "13",
+        "RateLimit-Policy": "10;w=60",
+    }
+    limited = quota_headers(rule, RateLimitResult(limited=True, remaining=-1, reset_after=0.5))
+    assert limited["RateLimit-Remaining"] == "0"
+    assert limited["Retry-After"] == limited["RateLimit-Reset"] == "1"
+
+
+@rate_limited
+async def limited_endpoint() -> None: ...
+
+
+async def unmarked_endpoint() -> None: ...
+
+
+ROUTES = [
+    Route("/api/v1/tasks", limited_endpoint, methods=["POST"]),
+    Route("/api/v1/tasks", unmarked_endpoint, methods=["GET"]),
+    Route("/api/v1/{username}/post/{id:int}", limited_endpoint, methods=["GET", "PATCH"]),
+    Route("/api/v1/tiers", unmarked_endpoint),
+]
+
+
+def test_route_index_matches_rate_limited_routes() -> None:
+    index = RouteIndex(ROUTES)
+
+    assert index.templates == ["api_v1_tasks", "api_v1_{username}_post_{id}"]
+    assert index.match("/api/v1/tasks", "POST") == "api_v1_tasks"
+    assert index.match("/api/v1/alice/post/3", "PATCH") == "api_v1_{username}_post_{id}"
+    assert index.match("/api/v1/bob/post/12", "GET") == "api_v1_{username}_post_{id}"
+
+
+@pytest.mark.parametrize(
+    ("path", "method"),
+    [
+        ("/api/v1/tasks", "GET"),  # only the POST route is rate limited
+        ("/api/v1/alice/post/3", "DELETE"),
+        ("/api/v1/alice/post/first", "GET"),  # the `int` convertor does not match
+        ("/api/v1/tiers", "GET"),
+        ("/api/v1/unknown", "GET"),
+    ],
+)
+def test_route_index_does_not_match_other_requests(path: str, method: str) -> None:
+    assert RouteIndex(ROUTES).match(path, method) is None
+
+
+class RuleRows:
+    """Session returning the given tiers and rate limits to `RuleTable.load`."""
+
+    def __init__(self, tiers: list[tuple], rate_limits: list[tuple]) -> None:
+        self.tiers = tiers
+        self.rate_limits = rate_limits
+
+    async def execute(self, statement: Any) -> Any:
+        rows = self.tiers if len(statement.selected_columns) == 2 else self.rate_limits
+        return SimpleNamespace(all=lambda: rows, tuples=lambda: SimpleNamespace(all=lambda: rows))
+
+
+@pytest.fixture
+def rule_rows(redis_server: fakeredis.FakeServer, mocker: MockerFixture) -> Generator[RuleRows, None, None]:
+    rows = RuleRows([(1, "free")], [(1, "limited", 2, 60, "fixed_window")])
+
+    @asynccontextmanager
+    async def local_session() -> AsyncIterator[RuleRows]:
+        yield rows
+
+    mocker.patch.object(rate_limit_rules, "local_session", local_session)
+    mocker.patch.object(rate_limit_rules, "rules", RuleTable())
+    yield rows
+
+
+def test_rule_table_resolves_rules_by_tier_and_path(rule_rows: RuleRows) -> None:
+    table = rate_limit_rules.rules
+    asyncio.run(rate_limit_rules.reload_rules())
+
+    assert table.version == 0
+    assert table.tier_name(1) == "free"
+    assert table.lookup(1, "limited") == RateLimitRule(limit=2, period=60, algorithm="fixed_window")
+    assert table.lookup(2, "limited") is None
+    assert table.resolve(1, "limited") == RateLimitRule(limit=2, period=60, algorithm="fixed_window")
+    for tier_id, path in [(None, "limited"), (2, "limited"), (1, "other")]:
+        assert table.resolve(tier_id, path) == rate_limit_rules.DEFAULT_RULE
+
+
+def test_rule_table_reloads_on_published_versions(rule_rows: RuleRows) -> None:
+    table = rate_limit_rules.rules
+    gcra = RateLimitRule(limit=5, period=60, algorithm="gcra")
+
+    async def scenario() -> None:
+        listener = asyncio.create_task(rate_limit_rules.listen_for_rule_changes())
+        while table.version is None:
+            await asyncio.sleep(0.01)
+
+        rule_rows.rate_limits = [(1, "limited", 5, 60, "gcra")]
+        await rate_limit_rules.bump_rules_version()
+        await asyncio.wait_for(wait_for_version(1), timeout=1)
+        assert table.lookup(1, "limited") == gcra
+
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+
+    async def wait_for_version(version: int) -> None:
+        while table.version != version:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+
+
+def test_rule_table_ignores_old_and_malformed_versions(rule_rows: RuleRows, mocker: MockerFixture) -> None:
+    reload_rules = mocker.spy(rate_limit_rules, "reload_rules")
+
+    async def scenario() -> None:
+        await rate_limit_rules.rules.load(rule_rows, version=3)  # type: ignore
+        for data in (b"2", b"3", b"not a version"):
+            await rate_limit_rules._on_message({"type": "message", "data": data})
+        assert reload_rules.call_count == 0
+
+        await rate_limit_rules._on_message({"type": "message", "data": b"4"})
+        assert reload_rules.call_count == 1
+
+    asyncio.run(scenario())
+
+
+USER = {"id": 7, "uuid": None, "username": "userson", "tier_id": 1, "is_superuser": False, "security_version": 0}
+
+
+@rate_limited
+async def limited_page(request: Request) -> PlainTextResponse:
+    return PlainTextResponse("limited")
+
+
+async def open_page(request: Request) -> PlainTextResponse:
+    return PlainTextResponse("open")
+
+
+@pytest.fixture
+def app(redis_server: fakeredis.FakeServer, mocker: MockerFixture) -> Starlette:
+    table = RuleTable()
+    asyncio.run(table.load(RuleRows([(1, "free")], [(1, "limited", 2, 60, "fixed_window")]), version=0))  # type: ignore
+    mocker.patch.object(rate_limit_middleware, "rules", table)
+    mocker.patch.object(user_versions, "versions", {USER["id"]: 0})
+    mocker.patch.object(user_versions, "synced", True)
+    routes = [Route("/limited", limited_page), Route("/open", open_page)]
+    return Starlette(routes=routes, middleware=[Middleware(RateLimitMiddleware)])
+
+
+def bearer(user: dict) -> dict[str, str]:
+    token = asyncio.run(security.create_access_token(security.access_token_claims(user)))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_middleware_answers_requests_over_the_limit_with_429(app: Starlette, mocker: MockerFixture) -> None:
+    resolve_principal = mocker.patch.object(rate_limit_middleware, "resolve_principal")
+    headers = bearer(USER)
+
+    with TestClient(app) as client:
+        responses = [client.get("/limited", headers=headers) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert [response.headers["RateLimit-Remaining"] for response in responses] == ["1", "0", "0"]
+    assert responses[0].text == "limited" and "Retry-After" not in responses[0].headers
+    assert 0 < int(responses[2].headers["Retry-After"]) <= 60
+    # The token carries up-to-date claims: the user and their tier come from it.
+    resolve_principal.assert_not_called()
+
+
+def test_middleware_passes_unmarked_routes_through(app: Starlette, mocker: MockerFixture) -> None:
+    calls = mocker.spy(rate_limit.breaker, "call")
+    headers = bearer(USER)
+
+    with TestClient(app) as client:
+        responses = [client.get("/open", headers=headers) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert all("RateLimit-Limit" not in response.headers for response in responses)
+    assert calls.call_count == 0
+
+
+def test_middleware_remembers_users_looked_up_in_the_database(app: Starlette, mocker: MockerFixture) -> None:
+    mocker.patch.object(rate_limit_middleware, "local_session")
+    resolve_principal = mocker.patch.object(rate_limit_middleware, "resolve_principal", return_value=USER)
+    # Tokens minted before a security version bump are stale.
+    user_versions.versions[USER["id"]] = 1
+
+    with TestClient(app) as client:
+        first = client.get("/limited", headers=bearer(USER))
+        second = client.get("/limited", headers=bearer({**USER, "username": "renamed"}))
+
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert second.headers["RateLimit-Remaining"] == "0"
+    resolve_principal.assert_called_once()
+
+
+@pytest.mark.parametrize("algorithm", rate_limit.ALGORITHMS)
+def test_check_rate_limit_limits_requests_until_the_limit_resets(
+    redis_server: fakeredis.FakeServer, algorithm: str
+) -> None:
+    async def check() -> RateLimitResult:
+        return await rate_limit.check_rate_limit(1, "/api/v1/tasks", limit=3, period=1, algorithm=algorithm)
+
+    async def scenario() -> None:
+        results = [await check() for _ in range(3)]
+        assert [(result.limited, result.remaining) for result in results] == [(False, 2), (False, 1), (False, 0)]
+
+        limited = await check()
+        assert (limited.limited, limited.remaining) == (True, 0)
+        # The sliding window still weighs the full window in the next one, so it can wait longer than a period.
+        assert 0 < limited.reset_after <= (2 if algorithm == "sliding_window" else 1)
+        assert (await rate_limit.check_rate_limit(2, "/api/v1/tasks", 3, 1, algorithm)).limited is False
+
+        await asyncio.sleep(limited.reset_after + 0.05)
+        assert (await check()).limited is False
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("algorithm", rate_limit.ALGORITHMS)
+def test_read_usage_reports_the_quota_left_without_counting(
+    redis_server: fakeredis.FakeServer, algorithm: str
+) -> None:
+    async def scenario() -> None:
+        for _ in range(3):
+            await rate_limit.check_rate_limit(1, "/api/v1/posts", limit=5, period=3600, algorithm=algorithm)
+        await rate_limit.check_rate_limit(1, "/api/v1/tiers", limit=2, period=3600, algorithm=algorithm)
+        await rate_limit.check_rate_limit(1, "/api/v1/tiers", limit=2, period=3600, algorithm=algorithm)
+        limits = [("/api/v1/posts", 5, 3600, algorithm), ("/api/v1/tiers", 2, 3600, algorithm)]
+
+        posts, tiers = await rate_limit.read_usage(1, limits)
+        assert (posts.limited, posts.remaining) == (False, 2)
+        assert (tiers.limited, tiers.remaining) == (True, 0)
+        assert 0 < posts.reset_after <= 3600
+        assert [usage.remaining for usage in await rate_limit.read_usage(1, limits)] == [2, 0]
+
+        result = await rate_limit.check_rate_limit(1, "/api/v1/posts", limit=5, period=3600, algorithm=algorithm)
+        assert (result.limited, result.remaining) == (False, 1)
+
+    asyncio.run(scenario())
+
+
+def test_read_usage_of_unused_keys_is_the_full_quota(redis_server: fakeredis.FakeServer) -> None:
+    limits = [("/api/v1/posts", 5, 60, algorithm) for algorithm in rate_limit.ALGORITHMS]
+
+    usage = asyncio.run(rate_limit.read_usage(2, limits))
+
+    assert [(result.limited, result.remaining) for result in usage] == [(False, 5)] * 3
+
+
+def hybrid_limiter() -> rate_limit.HybridLimiter:
+    return rate_limit.HybridLimiter(flush_interval=60, flush_requests=100, lease_fraction=0.5)
+
+
+def test_hybrid_limiter_admits_leased_requests_without_redis_calls(
+    redis_server: fakeredis.FakeServer, mocker: MockerFixture
+) -> None:
+    calls = mocker.spy(rate_limit.breaker, "call")
+    limiter = hybrid_limiter()
+
+    async def scenario() -> None:
+        results = [await limiter.check("ratelimit:1:posts:0", limit=10, period=60) for _ in range(5)]
+        assert [(result.limited, result.remaining) for result in results] == [(False, n) for n in range(9, 4, -1)]
+        assert limiter.buckets["ratelimit:1:posts:0"].pending == 5
+
+    asyncio.run(scenario())
+    assert calls.call_count == 1
+
+
+def test_hybrid_limiter_flushes_add_the_counts_of_every_worker(redis_server: fakeredis.FakeServer) -> None:
+    first, second = hybrid_limiter(), hybrid_limiter()
+    key = "ratelimit:1:posts:0"
+
+    async def scenario() -> None:
+        for _ in range(3):
+            await first.check(key, limit=10, period=60)
+        for _ in range(2):
+            await second.check(key, limit=10, period=60)
+
+        await first.flush()
+        await second.flush()
+
+        assert int(await rate_limit.client.get(key)) == 5  # type: ignore
+        assert first.buckets[key].pending == second.buckets[key].pending == 0
+        assert second.buckets[key].remaining == 5
+
+    asyncio.run(scenario())
+
+
+def test_hybrid_limiter_limits_exhausted_windows_locally(
+    redis_server: fakeredis.FakeServer, mocker: MockerFixture
+) -> None:
+    first, second = hybrid_limiter(), hybrid_limiter()
+    key = "ratelimit:1:posts:0"
+
+    async def scenario() -> None:
+        for _ in range(2):
+            await first.check(key, limit=4, period=60)
+        await first.flush()
+        for _ in range(2):
+            assert not (await second.check(key, limit=4, period=60)).limited
+
+        calls = mocker.spy(rate_limit.breaker, "call")
+        for _ in range(3):
+            result = await second.check(key, limit=4, period=60)
+            assert (result.limited, result.remaining) == (True, 0)
+            assert 0 < result.reset_after <= 60
+        assert calls.call_count == 0
+
+        # Once the window ends, the next request asks Redis again.
+        second.buckets[key].expires_at = time.monotonic()
+        assert (await second.check(key, limit=4, period=60)).limited
+        assert calls.call_count == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,422 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections.abc import Generator
+from types import SimpleNamespace
+
+import ecdsa
+import fakeredis
+import pytest
+import rsa
+from jose import JWTError, jwt
+from pytest_mock import MockerFixture
+
+from src.app.core import security
+from src.app.core.exceptions.http_exceptions import ServiceUnavailableException
+from src.app.core.utils import cache, user_versions
+from src.app.core.utils.circuit_breaker import CircuitBreaker
+
+USER = {
+    "id": 7,
+    "uuid": uuid.uuid4(),
+    "username": "userson",
+    "inn": None,
+    "tier_id": 1,
+    "is_superuser": False,
+    "security_version": 0,
+}
+
+
+@pytest.fixture
+def synced_versions(mocker: MockerFixture) -> Generator[dict[int, int], None, None]:
+    versions: dict[int, int] = {}
+    mocker.patch.object(user_versions, "versions", versions)
+    mocker.patch.object(user_versions, "synced", True)
+    mocker.patch.object(security, "is_blacklisted", return_value=False)
+    yield versions
+
+
+def resolve(token: str) -> dict | None:
+    return asyncio.run(security.resolve_principal(security.Principal(token), db=None))  # type: ignore
+
+
+def access_token(user: dict) -> str:
+    return asyncio.run(security.create_access_token(security.access_token_claims(user)))
+
+
+def test_resolve_principal_from_claims(synced_versions: dict[int, int], mocker: MockerFixture) -> None:
+    get_user = mocker.patch.object(security, "get_user")
+    synced_versions[USER["id"]] = 0
+
+    user = resolve(access_token(USER))
+
+    get_user.assert_not_called()
+    assert user == {key: USER[key] for key in ("id", "uuid", "username", "tier_id", "is_superuser", "security_version")}
+
+
+def test_resolve_principal_from_claims_without_uuid(synced_versions: dict[int, int]) -> None:
+    synced_versions[USER["id"]] = 0
+
+    user = resolve(access_token({**USER, "uuid": None}))
+
+    assert user is not None and user["uuid"] is None
+
+
+def test_resolve_principal_reloads_stale_user(synced_versions: dict[int, int], mocker: MockerFixture) -> None:
+    get_user = mocker.patch.object(security, "get_user", return_value={**USER, "tier_id": 2, "security_version": 1})
+    synced_versions[USER["id"]] = 1
+
+    user = resolve(access_token(USER))
+
+    get_user.assert_called_once_with(None, id=USER["id"])
+    assert user is not None and user["tier_id"] == 2
+
+
+def test_resolve_principal_loads_users_missing_from_versions_once(
+    synced_versions: dict[int, int], mocker: MockerFixture
+) -> None:
+    get_user = mocker.patch.object(security, "get_user", return_value=USER)
+    token = access_token(USER)
+
+    assert resolve(token) == USER
+    assert resolve(token)["id"] == USER["id"]  # type: ignore
+
+    get_user.assert_called_once_with(None, id=USER["id"])
+    assert synced_versions == {USER["id"]: 0}
+
+
+def test_resolve_principal_rejects_user_deleted_on_another_worker(
+    synced_versions: dict[int, int], mocker: MockerFixture
+) -> None:
+    mocker.patch.object(security, "get_user", return_value=None)
+    token = access_token(USER)
+
+    asyncio.run(user_versions._on_message({"type": "message", "data": f"{USER['id']}:1".encode()}))
+
+    assert resolve(token) is None
+
+
+def test_resolve_principal_reloads_users_while_versions_are_out_of_sync(
+    synced_versions: dict[int, int], mocker: MockerFixture
+) -> None:
+    get_user = mocker.patch.object(security, "get_user", return_value=USER)
+    mocker.patch.object(user_versions, "synced", False)
+
+    resolve(access_token(USER))
+
+    get_user.assert_called_once_with(None, id=USER["id"])
+
+
+def test_resolve_principal_rejects_refresh_tokens(synced_versions: dict[int, int], mocker: MockerFixture) -> None:
+    get_user = mocker.patch.object(security, "get_user", return_value=USER)
+    refresh_token = asyncio.run(security.create_refresh_token({"sub": str(USER["id"])}))
+
+    token_data = security.decode_token(refresh_token)
+    assert token_data is not None and token_data.token_type == security.REFRESH_TOKEN_TYPE
+    assert resolve(refresh_token) is None
+    assert security.decode_token(access_token(USER)).token_type is None  # type: ignore
+    get_user.assert_not_called()
+
+
+@pytest.fixture
+def decoded_tokens(mocker: MockerFixture) -> Generator[security.DecodedTokenCache, None, None]:
+    tokens = security.DecodedTokenCache(max_entries=2)
+    mocker.patch.object(security, "decoded_tokens", tokens)
+    yield tokens
+
+
+def test_decode_token_remembers_verified_tokens_by_digest(
+    decoded_tokens: security.DecodedTokenCache, mocker: MockerFixture
+) -> None:
+    token = access_token(USER)
+    decode_claims = mocker.spy(security, "decode_claims")
+
+    first, second = security.decode_token(token), security.decode_token(token)
+
+    assert first is second and first is not None and first.user_id == USER["id"]
+    decode_claims.assert_called_once_with(token)
+    assert decoded_tokens.get(security.token_digest(token)) is first
+    assert decoded_tokens.get(token) is None
+
+
+def test_decode_token_does_not_remember_invalid_tokens(
+    decoded_tokens: security.DecodedTokenCache, mocker: MockerFixture
+) -> None:
+    forged = jwt.encode({"sub": USER["username"], "exp": 4102444800}, "not the secret key", algorithm="HS256")
+    decode_claims = mocker.spy(security, "decode_claims")
+
+    assert security.decode_token(forged) is None
+    assert security.decode_token(forged) is None
+
+    assert decode_claims.call_count == 2
+    assert decoded_tokens.get(security.token_digest(forged)) is None
+
+
+def test_decoded_token_cache_drops_expired_and_least_recently_used_tokens(
+    decoded_tokens: security.DecodedTokenCache,
+) -> None:
+    token_data = security.TokenData(username_or_email=USER["username"])
+    decoded_tokens.set("a", time.time() + 60, token_data)
+    decoded_tokens.set("expired", time.time() - 1, token_data)
+    assert decoded_tokens.get("expired") is None
+
+    decoded_tokens.set("b", time.time() + 60, token_data)
+    assert decoded_tokens.get("a") is token_data
+    decoded_tokens.set("c", time.time() + 60, token_data)
+    assert decoded_tokens.get("b") is None
+    assert decoded_tokens.get("a") is decoded_tokens.get("c") is token_data
+
+    decoded_tokens.discard("a")
+    assert decoded_tokens.get("a") is None
+
+
+def test_unpublished_security_versions_are_retried(mocker: MockerFixture) -> None:
+    server = fakeredis.FakeServer()
+    mocker.patch.object(cache, "client", fakeredis.FakeAsyncRedis(server=server))
+    mocker.patch.object(cache, "breaker", CircuitBreaker("test", call_timeout=1, failure_threshold=1000))
+    mocker.patch.object(user_versions, "PUBLISH_RETRY_INTERVAL", 0)
+    mocker.patch.object(user_versions, "_unpublished", {USER["id"]: 3})
+
+    async def scenario() -> None:
+        server.connected = False
+        retry = asyncio.create_task(user_versions._publish_unpublished())
+        await asyncio.sleep(0.01)
+        assert not retry.done()
+
+        server.connected = True
+        await asyncio.wait_for(retry, 1)
+        assert await cache.client.hget(user_versions.VERSIONS_KEY, str(USER["id"])) == b"3"  # type: ignore
+
+    asyncio.run(scenario())
+    assert not user_versions._unpublished
+
+
+class VersionRows:
+    """Stands in for `local_session` in `user_versions`: every query returns the `(id, security_version)` rows."""
+
+    def __init__(self, rows: list[tuple[int, int]]) -> None:
+        self.rows = rows
+        self.queries = 0
+
+    def __call__(self) -> "VersionRows":
+        return self
+
+    async def __aenter__(self) -> "VersionRows":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+    async def execute(self, statement: object) -> SimpleNamespace:
+        self.queries += 1
+        return SimpleNamespace(tuples=lambda: SimpleNamespace(all=lambda: self.rows))
+
+
+@pytest.fixture
+def versions_redis(mocker: MockerFixture) -> Generator[VersionRows, None, None]:
+    mocker.patch.object(cache, "client", fakeredis.FakeAsyncRedis())
+    mocker.patch.object(user_versions, "versions", {})
+    mocker.patch.object(user_versions, "synced", False)
+    rows = VersionRows([(7, 4), (8, 2)])
+    mocker.patch.object(user_versions, "local_session", rows)
+    yield rows
+
+
+def test_versions_are_seeded_from_the_database_once(versions_redis: VersionRows) -> None:
+    async def scenario() -> None:
+        # Published before the hash was seeded: newer than the database row read by the seeding worker.
+        await cache.client.hset(user_versions.VERSIONS_KEY, "7", "5")  # type: ignore
+        await user_versions._load_versions()
+        await user_versions._load_versions()
+
+        assert await cache.client.hgetall(user_versions.VERSIONS_KEY) == {  # type: ignore
+            b"7": b"5",
+            b"8": b"2",
+            user_versions.SEEDED_FIELD.encode(): b"1",
+        }
+
+    asyncio.run(scenario())
+    assert versions_redis.queries == 1
+    assert user_versions.versions == {7: 5, 8: 2}
+
+
+def test_lost_versions_are_seeded_again(versions_redis: VersionRows, mocker: MockerFixture) -> None:
+    mocker.patch.object(user_versions, "SEED_CHECK_INTERVAL", 0.01)
+
+    async def scenario() -> None:
+        listener = asyncio.create_task(user_versions.listen_for_version_changes())
+        try:
+            while not user_versions.synced:
+                await asyncio.sleep(0.01)
+            await cache.client.flushall()  # type: ignore
+            while versions_redis.queries < 2 or not user_versions.synced:
+                await asyncio.sleep(0.01)
+
+            assert await cache.client.hexists(user_versions.VERSIONS_KEY, user_versions.SEEDED_FIELD)  # type: ignore
+        finally:
+            listener.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert not user_versions.synced
+
+
+class Clock:
+    """Stands in for `time` in `security`: each bcrypt hash takes `costs[rounds]` milliseconds."""
+
+    def __init__(self, costs: dict[int, float]) -> None:
+        self.costs = costs
+        self.now = 0.0
+        self.timed: list[int] = []
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def hashpw(self, password: bytes, salt: bytes) -> bytes:
+        rounds = int(salt.split(b"$")[2])
+        self.timed.append(rounds)
+        self.now += self.costs[rounds] / 1000
+        return b""
+
+
+@pytest.mark.parametrize(
+    ("costs", "rounds", "timed"),
+    [
+        # Stops before timing a cost whose hash would take twice the last one, over the budget.
+        ({10: 40, 11: 80, 12: 160, 13: 320}, 12, [10, 11, 12]),
+        # Keeps the minimum cost even when it is over budget.
+        ({10: 400, 11: 800}, 10, [10]),
+        # Stops when a cost turns out slower than expected.
+        ({10: 40, 11: 300}, 10, [10, 11]),
+        # Never goes past the maximum cost.
+        ({10: 1, 11: 2, 12: 4, 13: 8}, 13, [10, 11, 12, 13]),
+    ],
+)
+def test_calibrate_bcrypt_rounds(
+    mocker: MockerFixture, costs: dict[int, float], rounds: int, timed: list[int]
+) -> None:
+    clock = Clock(costs)
+    mocker.patch.object(security, "time", clock)
+    mocker.patch.object(security.bcrypt, "hashpw", clock.hashpw)
+
+    assert security.calibrate_bcrypt_rounds(budget_ms=250, min_rounds=10, max_rounds=13) == rounds
+    assert clock.timed == timed
+
+
+class Session:
+    """Records the statements a `local_session` would run."""
+
+    def __init__(self) -> None:
+        self.statements: list = []
+        self.commits = 0
+
+    async def __aenter__(self) -> "Session":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
+    async def execute(self, statement: object) -> None:
+        self.statements.append(statement)
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+def test_rehash_only_replaces_the_hash_it_verified(mocker: MockerFixture) -> None:
+    session = Session()
+    mocker.patch.object(security, "local_session", return_value=session)
+    get_password_hash = mocker.patch.object(security, "get_password_hash", return_value="$2b$13$new")
+    user = {"id": 7, "hashed_password": "$2b$10$old"}
+
+    async def scenario() -> None:
+        security._schedule_rehash(user, "password")
+        security._schedule_rehash(user, "password")
+        await security.drain_rehashes()
+
+    asyncio.run(scenario())
+
+    get_password_hash.assert_called_once_with("password")
+    (statement,) = session.statements
+    assert str(statement).endswith('WHERE "user".id = :id_1 AND "user".hashed_password = :hashed_password_1')
+    assert statement.compile().params == {
+        "hashed_password": "$2b$13$new",
+        "id_1": 7,
+        "hashed_password_1": "$2b$10$old",
+    }
+    assert session.commits == 1 and not security._rehashing
+
+
+def ec_key() -> tuple[str, str]:
+    """Return a new ES256 private key and its public key, PEM encoded."""
+    private_key = ecdsa.SigningKey.generate(curve=ecdsa.NIST256p)
+    return private_key.to_pem().decode(), private_key.get_verifying_key().to_pem().decode()
+
+
+def test_signing_keys_verify_tokens_of_retired_keys() -> None:
+    former_private, former_public = ec_key()
+    new_private, _ = ec_key()
+    before = security.SigningKeys("ES256", {"2025": former_private}, active_kid="2025")
+    # Rotated: the former key only verifies the tokens it signed.
+    after = security.SigningKeys("ES256", {"2025": former_public, "2026": new_private}, active_kid="2026")
+
+    former_token, new_token = before.sign({"sub": "userson"}), after.sign({"sub": "userson"})
+
+    assert jwt.get_unverified_header(new_token)["kid"] == "2026"
+    assert after.verify(former_token) == after.verify(new_token) == {"sub": "userson"}
+    with pytest.raises(JWTError, match="Unknown signing key"):
+        before.verify(new_token)
+    with pytest.raises(ValueError):
+        security.SigningKeys("ES256", {"2025": former_public, "2026": new_private}, active_kid="2025")
+
+
+def test_signing_keys_reject_unknown_and_forged_kids() -> None:
+    private_key, _ = ec_key()
+    other_private_key, _ = ec_key()
+    keys = security.SigningKeys("ES256", {"2026": private_key}, active_kid="2026")
+    other_keys = security.SigningKeys("ES256", {"other": other_private_key}, active_kid="other")
+
+    with pytest.raises(JWTError, match="Unknown signing key"):
+        keys.verify(other_keys.sign({"sub": "userson"}))
+    with pytest.raises(JWTError, match="Unknown signing key"):
+        keys.verify(jwt.encode({"sub": "userson"}, other_private_key, algorithm="ES256"))
+    forged = jwt.encode({"sub": "userson"}, other_private_key, algorithm="ES256", headers={"kid": "2026"})
+    with pytest.raises(JWTError):
+        keys.verify(forged)
+
+
+@pytest.mark.parametrize("algorithm", ["ES256", "RS256"])
+def test_jwks_publishes_public_keys_only(algorithm: str) -> None:
+    if algorithm == "RS256":
+        _, rsa_key = rsa.newkeys(1024)
+        private_key = rsa_key.save_pkcs1().decode()
+    else:
+        private_key, _ = ec_key()
+    keys = security.SigningKeys(algorithm, {"2026": private_key}, active_kid="2026")
+
+    (key,) = keys.jwks()["keys"]
+
+    assert key["kid"] == "2026" and key["use"] == "sig" and key["alg"] == algorithm
+    assert not {"d", "p", "q", "dp", "dq", "qi"} & key.keys()
+
+
+def test_password_hasher_rejects_calls_beyond_workers_and_queue() -> None:
+    hasher = security.PasswordHasher(workers=1, max_queue=2)
+    release = threading.Event()
+
+    async def scenario() -> None:
+        # One call holds the thread and two wait for it.
+        calls = [asyncio.create_task(hasher.run(release.wait)) for _ in range(3)]
+        while hasher.in_flight < 3:
+            await asyncio.sleep(0)
+
+        with pytest.raises(ServiceUnavailableException):
+            await hasher.run(release.wait)
+        assert hasher.rejected == 1
+
+        release.set()
+        assert await asyncio.gather(*calls) == [True] * 3
+        assert hasher.in_flight == 0
+        assert await hasher.run(release.wait)
+
+    asyncio.run(scenario())
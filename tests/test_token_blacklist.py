@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections.abc import Generator
+from datetime import UTC
+from types import SimpleNamespace
+from typing import Any
+
+import fakeredis
+import pytest
+from pytest_mock import MockerFixture
+
+from src.app.core.utils import cache, token_blacklist
+from src.app.core.utils.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def redis_server(mocker: MockerFixture) -> Generator[fakeredis.FakeServer, None, None]:
+    server = fakeredis.FakeServer()
+    mocker.patch.object(cache, "client", fakeredis.FakeAsyncRedis(server=server))
+    mocker.patch.object(cache, "breaker", CircuitBreaker("test", call_timeout=1))
+    mocker.patch.object(token_blacklist, "blacklist_filter", token_blacklist.BlacklistFilter())
+    yield server
+
+
+def test_token_blacklisted_while_redis_is_down_stays_blacklisted(
+    redis_server: fakeredis.FakeServer, mocker: MockerFixture
+) -> None:
+    expires_at = time.time() + 600
+    digest = token_blacklist.token_digest("tok")
+    # The row `blacklist_token` commits before calling `add_to_blacklist`.
+    mocker.patch.object(token_blacklist, "_unexpired_tokens", return_value={digest: expires_at})
+    db_exists = mocker.patch.object(token_blacklist.crud_token_blacklist, "exists", return_value=True)
+
+    async def scenario() -> None:
+        await token_blacklist.blacklist_filter.rebuild()
+
+        redis_server.connected = False
+        await token_blacklist.add_to_blacklist("tok", expires_at)
+        redis_server.connected = True
+
+        assert await token_blacklist.is_blacklisted("tok", db=None)  # type: ignore
+
+        await token_blacklist.blacklist_filter.rebuild()
+        assert not token_blacklist.blacklist_filter.pending
+        assert await cache.client.exists(f"{token_blacklist.TOKEN_KEY_PREFIX}:{digest}")  # type: ignore
+        assert await token_blacklist.is_blacklisted("tok", db=None)  # type: ignore
+
+    asyncio.run(scenario())
+    db_exists.assert_not_called()
+
+
+def test_rebuild_restores_tokens_missing_from_redis_on_other_workers(
+    redis_server: fakeredis.FakeServer, mocker: MockerFixture
+) -> None:
+    digest = token_blacklist.token_digest("tok")
+    mocker.patch.object(token_blacklist, "_unexpired_tokens", return_value={digest: time.time() + 600})
+
+    async def scenario() -> None:
+        # A worker that never saw the token: its filter only learns it from the database.
+        await token_blacklist.blacklist_filter.rebuild()
+        assert await token_blacklist.is_blacklisted("tok", db=None)  # type: ignore
+        assert not await token_blacklist.is_blacklisted("other", db=None)  # type: ignore
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_reads_the_database_only_at_startup_and_after_redis_lost_its_data(
+    redis_server: fakeredis.FakeServer, mocker: MockerFixture
+) -> None:
+    digest = token_blacklist.token_digest("tok")
+    unexpired_tokens = mocker.patch.object(
+        token_blacklist, "_unexpired_tokens", return_value={digest: time.time() + 600}
+    )
+
+    async def scenario() -> None:
+        await token_blacklist.blacklist_filter.rebuild()
+        await token_blacklist.add_to_blacklist("other", time.time() + 600)
+        await token_blacklist.blacklist_filter.rebuild()
+        assert unexpired_tokens.call_count == 1
+        assert await token_blacklist.is_blacklisted("other", db=None)  # type: ignore
+
+        await cache.client.flushall()  # type: ignore
+        await token_blacklist.blacklist_filter.rebuild()
+        assert unexpired_tokens.call_count == 2
+        assert await token_blacklist.is_blacklisted("tok", db=None)  # type: ignore
+
+    asyncio.run(scenario())
+
+
+class Session:
+    """Deletes `rows` expired tokens, at most as many per statement as the statement's batch size."""
+
+    def __init__(self, rows: int) -> None:
+        self.rows = rows
+        self.statements: list = []
+        self.commits = 0
+
+    async def execute(self, statement: Any) -> Any:
+        self.statements.append(statement)
+        rowcount = min(self.rows, statement.compile().params["param_1"])
+        self.rows -= rowcount
+        return SimpleNamespace(rowcount=rowcount)
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+@pytest.mark.parametrize(("rows", "batches"), [(5, 3), (4, 3), (0, 1)])
+def test_purge_expired_deletes_in_batches(rows: int, batches: int) -> None:
+    session = Session(rows)
+
+    assert asyncio.run(token_blacklist.purge_expired(session, batch_size=2)) == rows  # type: ignore
+
+    assert len(session.statements) == session.commits == batches
+    statement = str(session.statements[0])
+    assert statement.startswith("DELETE FROM token_blacklist WHERE token_blacklist.id IN (SELECT token_blacklist.id")
+    assert "WHERE token_blacklist.expires_at <= :expires_at_1" in statement
+    assert session.statements[0].compile().params["expires_at_1"].tzinfo is UTC
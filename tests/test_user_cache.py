@@ -0,0 +1,144 @@
+import asyncio
+import uuid
+from collections.abc import Awaitable, Generator
+from typing import Any
+
+import fakeredis
+import pytest
+from pytest_mock import MockerFixture
+
+from src.app.core.utils import cache, user_cache
+from src.app.core.utils.circuit_breaker import CircuitBreaker
+from src.app.core.utils.metrics import Metrics
+from src.app.schemas.user import UserCached, UserRead
+
+
+class Users:
+    """Stands in for the user table: `crud_users.get` filtered on one column, returning `UserCached` fields."""
+
+    def __init__(self, *users: dict[str, Any]) -> None:
+        self.rows = {user["id"]: user for user in users}
+        self.queries = 0
+
+    async def get(self, db: Any, schema_to_select: type, is_deleted: bool, **identifier: Any) -> dict | None:
+        assert schema_to_select is UserCached and is_deleted is False
+        self.queries += 1
+        ((field, value),) = identifier.items()
+        row = next((row for row in self.rows.values() if row[field] == value), None)
+        return {name: row[name] for name in UserCached.model_fields} if row is not None else None
+
+
+def user_row(**values: Any) -> dict[str, Any]:
+    return {
+        "id": 1,
+        "uuid": uuid.uuid4(),
+        "name": "User Userson",
+        "username": "userson",
+        "email": "user.userson@example.com",
+        "phone": None,
+        "user_type": "INDIVIDUAL",
+        "inn": None,
+        "profile_image_url": "https://www.profileimageurl.com",
+        "tier_id": 1,
+        "is_superuser": False,
+        "security_version": 0,
+        "is_deleted": False,
+        "hashed_password": "$2b$12$secret",
+        **values,
+    }
+
+
+@pytest.fixture
+def redis_server(mocker: MockerFixture) -> Generator[fakeredis.FakeServer, None, None]:
+    server = fakeredis.FakeServer()
+    mocker.patch.object(cache, "client", fakeredis.FakeAsyncRedis(server=server))
+    mocker.patch.object(cache, "breaker", CircuitBreaker("test", call_timeout=1, failure_threshold=1000))
+    mocker.patch.object(cache, "metrics", Metrics("test"))
+    yield server
+
+
+@pytest.fixture
+def users(mocker: MockerFixture) -> Users:
+    users = Users(user_row())
+    mocker.patch.object(user_cache, "crud_users", users)
+    return users
+
+
+def get_user(**identifier: Any) -> Awaitable[dict[str, Any] | None]:
+    return user_cache.get_user(None, **identifier)  # type: ignore
+
+
+def test_aliases_share_one_entry_without_secrets(redis_server: fakeredis.FakeServer, users: Users) -> None:
+    async def scenario() -> None:
+        user = await get_user(username="userson")
+
+        assert user is not None and "hashed_password" not in user
+        assert await get_user(email="user.userson@example.com") == user
+        assert await get_user(id=1) == user
+        assert await user_cache.get_user(None, schema_to_select=UserRead, id=1) == {  # type: ignore
+            name: user[name] for name in UserRead.model_fields
+        }
+        assert b"secret" not in await cache.client.get(user_cache._key(1))  # type: ignore
+
+    asyncio.run(scenario())
+    assert users.queries == 1
+    assert cache.metrics.snapshot()[user_cache.METRICS_LABEL]["hits"] == 3
+
+
+def test_stale_alias_is_a_miss_after_rename(redis_server: fakeredis.FakeServer, users: Users) -> None:
+    async def scenario() -> None:
+        await get_user(username="userson")
+        users.rows[1]["username"] = "userberg"
+        # Only the entry under the ID was refreshed since the rename: the former alias still points to it.
+        await cache.client.delete(user_cache._key(1))  # type: ignore
+        await get_user(id=1)
+
+        assert await get_user(username="userson") is None
+        assert await get_user(username="userberg") is not None
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_user_drops_entry_and_aliases(redis_server: fakeredis.FakeServer, users: Users) -> None:
+    async def scenario() -> None:
+        former = await get_user(username="userson")
+        users.rows[1]["tier_id"] = 2
+
+        await user_cache.invalidate_user(UserCached(**former))  # type: ignore
+
+        assert not await cache.client.keys(f"{user_cache.KEY_PREFIX}:*")  # type: ignore
+        assert (await get_user(email="user.userson@example.com"))["tier_id"] == 2  # type: ignore
+
+    asyncio.run(scenario())
+    assert users.queries == 2
+
+
+def test_redis_down_falls_back_to_the_database(redis_server: fakeredis.FakeServer, users: Users) -> None:
+    redis_server.connected = False
+
+    async def scenario() -> None:
+        assert await get_user(username="userson") is not None
+        assert await get_user(username="userson") is not None
+        await user_cache.invalidate_user(users.rows[1])
+
+    asyncio.run(scenario())
+    assert users.queries == 2
+    counts = cache.metrics.snapshot()[user_cache.METRICS_LABEL]
+    assert counts["bypassed"] == 2 and counts["invalidation_errors"] == 1
+
+
+def test_missing_username_is_remembered_until_invalidated(redis_server: fakeredis.FakeServer, users: Users) -> None:
+    async def scenario() -> None:
+        assert await get_user(username="userberg") is None
+        assert await get_user(username="userberg") is None
+        # Renamed: the new username is invalidated along with the former values.
+        former = await get_user(id=1)
+        users.rows[1]["username"] = "userberg"
+        await user_cache.invalidate_user(former, {"id": 1, "username": "userberg"})  # type: ignore
+
+        assert (await get_user(username="userberg"))["id"] == 1  # type: ignore
+
+    asyncio.run(scenario())
+    assert users.queries == 3
+    counts = cache.metrics.snapshot()[user_cache.METRICS_LABEL]
+    assert counts["negative_writes"] == 1 and counts["negative_hits"] == 1